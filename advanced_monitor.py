@@ -4,52 +4,110 @@ Silent System Monitor - Runs completely hidden
 Save this as monitor_silent.pyw to run without console window
 """
 
+import time
+STARTUP_T0 = time.perf_counter()  # startup times are measured from here
+
 import sys
 import subprocess
 import threading
-import time
 import os
+import importlib
+import argparse
+import signal
+import asyncio
+import functools
+import abc
 import json
+import re
+import io
+import csv
 import sqlite3
 import socket
+import heapq
+import bisect
+import mmap
+import struct
+import hashlib
+import hmac
+import gzip
+import zlib
+import string
+import math
+import random
+import smtplib
+from array import array
+import queue
+from contextlib import contextmanager, suppress
 from datetime import datetime, timedelta
 from pathlib import Path
-from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional, Any
+from dataclasses import dataclass, asdict, field, replace
+from collections import deque, OrderedDict
+from typing import Dict, List, Optional, Any, Tuple, Callable
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import socketserver
+from concurrent.futures import ThreadPoolExecutor
 import urllib.parse
+import urllib.request
+import urllib.error
+from email.message import EmailMessage
+from html import escape as html_escape
 
-# Suppress all output and hide window
+# Suppress all output and hide window (installed by main())
 class NullWriter:
     def write(self, txt): pass
     def flush(self): pass
 
-sys.stdout = NullWriter()
-sys.stderr = NullWriter()
-
-# Auto-install required packages silently
-def install_package(package):
-    """Install package silently"""
-    subprocess.run([sys.executable, "-m", "pip", "install", package, "--quiet"], 
-                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+class LazyModule:
+    """Third-party module imported on first use instead of at startup
 
-def try_import(package, import_name=None):
-    """Try to import package, install silently if not found"""
-    import_name = import_name or package
-    try:
-        return __import__(import_name)
-    except ImportError:
-        install_package(package)
-        return __import__(import_name)
+    Nothing is installed at runtime: when the import fails, ``reason`` says
+    why and the component that needs the module is switched off.
+    """
+    
+    def __init__(self, name: str):
+        self.__dict__.update(_name=name, _module=None, _error=None)
+    
+    def _load(self):
+        if self._module is None:
+            if self._error is not None:
+                raise ImportError(self._error)
+            try:
+                self.__dict__['_module'] = importlib.import_module(self._name)
+            except Exception as e:
+                # GUI packages raise more than ImportError on headless hosts
+                self.__dict__['_error'] = f"{self._name} unavailable ({type(e).__name__}: {e})"
+                raise ImportError(self._error) from e
+        return self._module
+    
+    def available(self) -> bool:
+        """Import now if needed; False when the module cannot be imported"""
+        try:
+            self._load()
+            return True
+        except ImportError:
+            return False
+    
+    @property
+    def reason(self) -> Optional[str]:
+        return self._error
+    
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
 
-# Import with auto-install
-pyautogui = try_import('pyautogui')
-pynput = try_import('pynput')
-psutil = try_import('psutil')
-requests = try_import('requests')
+def missing_dependency(*modules: LazyModule) -> Optional[str]:
+    """Why the first unavailable module cannot be imported, or None"""
+    for module in modules:
+        if not module.available():
+            return module.reason
+    return None
 
-from pynput import mouse, keyboard
+psutil = LazyModule('psutil')  # system metrics
+pyautogui = LazyModule('pyautogui')  # screenshots
+mouse = LazyModule('pynput.mouse')  # input activity
+keyboard = LazyModule('pynput.keyboard')
+np = LazyModule('numpy')  # optional: speeds up the anomaly detector's startup backfill
+pa = LazyModule('pyarrow')  # optional: Parquet export
+pq = LazyModule('pyarrow.parquet')
 
 @dataclass
 class SystemMetrics:
@@ -62,6 +120,15 @@ class SystemMetrics:
     network_recv: int
     processes_count: int
     temperature: Optional[float] = None
+    cpu_per_core: List[float] = field(default_factory=list)
+    network_sent_rate: Optional[float] = None  # bytes/sec
+    network_recv_rate: Optional[float] = None
+    packets_sent_rate: Optional[float] = None  # packets/sec
+    packets_recv_rate: Optional[float] = None
+    interfaces: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    top_processes: List[Dict[str, Any]] = field(default_factory=list)
+    disks: Dict[str, float] = field(default_factory=dict)  # mountpoint -> percent used
+    disk_io: Dict[str, Dict[str, float]] = field(default_factory=dict)
 
 @dataclass
 class Alert:
@@ -71,24 +138,927 @@ class Alert:
     message: str
     timestamp: str
     resolved: bool = False
+    value: Optional[float] = None  # metric value at the transition
+
+# Current on-disk layout; see DatabaseManager.MIGRATIONS
+SCHEMA_VERSION = 9
+
+# Columns of the original metrics table (schema v1-v3)
+BASE_METRIC_COLUMNS = ('cpu_percent', 'memory_percent', 'disk_usage', 'network_sent',
+                       'network_recv', 'processes_count', 'temperature')
+
+# Aggregate network throughput, added in schema v4
+NETWORK_RATE_COLUMNS = ('network_sent_rate', 'network_recv_rate',
+                        'packets_sent_rate', 'packets_recv_rate')
+
+# Numeric metric columns shared by the raw table and the rollup tiers
+METRIC_COLUMNS = BASE_METRIC_COLUMNS + NETWORK_RATE_COLUMNS
+
+# Rollup tiers: (name, table, bucket size in ms)
+ROLLUP_TIERS = (
+    ('1m', 'metrics_1m', 60_000),
+    ('1h', 'metrics_1h', 3_600_000),
+    ('1d', 'metrics_1d', 86_400_000),
+)
+
+def _to_epoch_ms(value) -> int:
+    """Convert an ISO string, datetime or epoch seconds/ms to epoch milliseconds"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    value = float(value)
+    # Anything below ~year 2286 in seconds is treated as seconds
+    return int(value * 1000) if value < 1e10 else int(value)
+
+def _labels_key(labels: Optional[Dict[str, str]]) -> str:
+    """Canonical text form of a label set (stable key order)"""
+    return json.dumps(labels, sort_keys=True, separators=(',', ':')) if labels else ''
+
+def _from_epoch_ms(ms: int) -> str:
+    """Convert epoch milliseconds to a local ISO timestamp"""
+    return datetime.fromtimestamp(ms / 1000).isoformat()
+
+@dataclass
+class DatabaseConfig:
+    """SQLite connection, pragma and raw metrics storage settings"""
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    cache_size_kb: int = 8192
+    busy_timeout_ms: int = 5000
+    mmap_size: int = 0
+    read_pool_size: int = 4
+    # Raw metric rows live in the 'sqlite' metrics table or in compressed 'chunks'
+    metrics_backend: str = "sqlite"
+    chunk_dir: Optional[str] = None  # defaults to <db name>.chunks next to the database
+    chunk_rows: int = 720
+    chunk_seconds: float = 7200
+    # Opt-in lossy rounding before compression, e.g. {'network_sent_rate': 0};
+    # the float noise of byte and packet rates otherwise dominates chunk size
+    chunk_decimals: Dict[str, int] = field(default_factory=dict)
+
+@dataclass
+class RetentionPolicy:
+    """How long each resolution is kept (None keeps it forever)"""
+    raw_hours: float = 48
+    rollup_1m_days: Optional[float] = 14
+    rollup_1h_days: Optional[float] = 400
+    rollup_1d_days: Optional[float] = None
+    # Buckets are only rolled up once they are this old, so queued writes land first
+    settle_seconds: float = 120
+    # Nominal raw sampling period, used to estimate raw point counts
+    raw_interval_seconds: float = 10
+    # Queries may return at most this many points before a coarser tier is used
+    max_points: int = 2000
+    # Rows pushed by agents to a collector (see FleetCollector)
+    fleet_hours: Optional[float] = 48
+    
+    def keep_ms(self, tier: str) -> Optional[int]:
+        """Retention for a tier ('raw', '1m', '1h', '1d', 'fleet') in milliseconds"""
+        if tier == 'raw':
+            return int(self.raw_hours * 3_600_000)
+        if tier == 'fleet':
+            return None if self.fleet_hours is None else int(self.fleet_hours * 3_600_000)
+        days = getattr(self, f'rollup_{tier}_days')
+        return None if days is None else int(days * 86_400_000)
+
+class BitWriter:
+    """Big-endian bit stream builder"""
+    __slots__ = ('value', 'bits')
+    
+    def __init__(self):
+        self.value = 0
+        self.bits = 0
+    
+    def write(self, value: int, nbits: int):
+        self.value = (self.value << nbits) | (value & ((1 << nbits) - 1))
+        self.bits += nbits
+    
+    def getvalue(self) -> bytes:
+        pad = -self.bits % 8
+        return (self.value << pad).to_bytes((self.bits + pad) // 8, 'big')
+
+class BitReader:
+    """Reads a big-endian bit stream written by BitWriter"""
+    __slots__ = ('value', 'left')
+    
+    def __init__(self, data: bytes):
+        self.value = int.from_bytes(data, 'big')
+        self.left = len(data) * 8
+    
+    def read(self, nbits: int) -> int:
+        self.left -= nbits
+        if self.left < 0:
+            raise ValueError("truncated bit stream")
+        return (self.value >> self.left) & ((1 << nbits) - 1)
+
+# Variable-width integers: '0' for zero, else (prefix, prefix bits, payload bits)
+_INT_SIZES = ((0b10, 2, 4), (0b110, 3, 8), (0b1110, 4, 12), (0b11110, 5, 20),
+              (0b111110, 6, 32), (0b111111, 6, 64))
+
+def _write_int(out: BitWriter, n: int):
+    """Write a signed integer as a zigzag value in the smallest size class"""
+    if n == 0:
+        out.write(0, 1)
+        return
+    z = (n << 1) ^ (n >> 63)
+    for prefix, prefix_bits, payload_bits in _INT_SIZES:
+        if z < (1 << payload_bits):
+            out.write((prefix << payload_bits) | z, prefix_bits + payload_bits)
+            return
+    raise OverflowError(n)
+
+def _read_int(reader: BitReader) -> int:
+    if not reader.read(1):
+        return 0
+    size = 0
+    while size < len(_INT_SIZES) - 1 and reader.read(1):
+        size += 1
+    z = reader.read(_INT_SIZES[size][2])
+    return (z >> 1) ^ -(z & 1)
+
+def _encode_ints(out: BitWriter, values: List[int], order: int):
+    """Delta (order 1) or delta-of-delta (order 2) coding of an integer sequence"""
+    prev = prev_delta = 0
+    for i, value in enumerate(values):
+        delta = value - prev
+        _write_int(out, delta - prev_delta if order == 2 and i > 1 else delta)
+        prev, prev_delta = value, delta
+
+def _decode_ints(reader: BitReader, count: int, order: int) -> List[int]:
+    values = []
+    prev = prev_delta = 0
+    for i in range(count):
+        delta = _read_int(reader)
+        if order == 2 and i > 1:
+            delta += prev_delta
+        prev += delta
+        prev_delta = delta
+        values.append(prev)
+    return values
+
+def _encode_xor(out: BitWriter, values: List[float]):
+    """Gorilla XOR coding of float64 values (None is stored as NaN)"""
+    bits = array('Q')
+    bits.frombytes(array('d', [math.nan if v is None else v for v in values]).tobytes())
+    prev = bits[0]
+    out.write(prev, 64)
+    lead = trail = -1
+    for value in bits[1:]:
+        x = value ^ prev
+        prev = value
+        if x == 0:
+            out.write(0, 1)
+            continue
+        cur_lead = min(64 - x.bit_length(), 31)
+        cur_trail = (x & -x).bit_length() - 1
+        if lead >= 0 and cur_lead >= lead and cur_trail >= trail:
+            out.write(0b10, 2)
+            out.write(x >> trail, 64 - lead - trail)
+        else:
+            lead, trail = cur_lead, cur_trail
+            meaningful = 64 - lead - trail
+            out.write((0b11 << 11) | (lead << 6) | (meaningful - 1), 13)
+            out.write(x >> trail, meaningful)
+
+def _decode_xor(reader: BitReader, count: int) -> List[Optional[float]]:
+    bits = array('Q', [reader.read(64)])
+    prev = bits[0]
+    lead = trail = 0
+    for _ in range(count - 1):
+        if reader.read(1):
+            if reader.read(1):
+                lead = reader.read(5)
+                trail = 64 - lead - reader.read(6) - 1
+            prev ^= reader.read(64 - lead - trail) << trail
+        bits.append(prev)
+    return [None if v != v else v for v in array('d', bits.tobytes())]
+
+def _decimal_places(values: List[float], limit: int = 6) -> Optional[int]:
+    """Fewest decimals that represent every value exactly, if at most ``limit``"""
+    if not all(math.isfinite(v) and abs(v) < 1e15 for v in values):
+        return None
+    for places in range(limit + 1):
+        scale = 10 ** places
+        if all(round(v * scale) / scale == v for v in values):
+            return places
+    return None
+
+# Column encodings inside a chunk
+_ENC_XOR, _ENC_DELTA, _ENC_DOD, _ENC_NULL = 0, 1, 2, 3
+# Column flags: a presence bitmap precedes the values / values decode as int
+_FLAG_NULLS, _FLAG_INT = 1, 2
+
+def _encode_column(values: List[Any]) -> Tuple[int, int, int, bytes]:
+    """(encoding, decimals, flags, payload) of the smallest encoding for a column"""
+    present = [v for v in values if v is not None and v == v]
+    if not present:
+        return _ENC_NULL, 0, 0, b''
+    integer = _FLAG_INT if all(isinstance(v, int) for v in present) else 0
+    out = BitWriter()
+    _encode_xor(out, values)
+    best = (out.bits, _ENC_XOR, 0, integer, out)
+    
+    places = _decimal_places(present)
+    if places is not None:
+        scale = 10 ** places
+        scaled = [int(round(v * scale)) for v in present]
+        flags = integer | (_FLAG_NULLS if len(present) < len(values) else 0)
+        for encoding, order in ((_ENC_DELTA, 1), (_ENC_DOD, 2)):
+            out = BitWriter()
+            if flags & _FLAG_NULLS:
+                for v in values:
+                    out.write(v is not None and v == v, 1)
+            _encode_ints(out, scaled, order)
+            if out.bits < best[0]:
+                best = (out.bits, encoding, places, flags, out)
+    _, encoding, places, flags, out = best
+    return encoding, places, flags, out.getvalue()
+
+def _decode_column(data: bytes, rows: int, encoding: int, places: int, flags: int) -> List[Any]:
+    if encoding == _ENC_NULL:
+        return [None] * rows
+    reader = BitReader(data)
+    if encoding == _ENC_XOR:
+        values = _decode_xor(reader, rows)
+        return [None if v is None else int(v) for v in values] if flags & _FLAG_INT else values
+    
+    present = [reader.read(1) for _ in range(rows)] if flags & _FLAG_NULLS else None
+    ints = _decode_ints(reader, sum(present) if present else rows,
+                        1 if encoding == _ENC_DELTA else 2)
+    if flags & _FLAG_INT:
+        values = ints
+    else:
+        scale = 10 ** places
+        values = [v / scale for v in ints]
+    if present is None:
+        return values
+    it = iter(values)
+    return [next(it) if p else None for p in present]
+
+CHUNK_MAGIC = b'MCK1'
+_CHUNK_HEADER = struct.Struct('<4sIqqH')  # magic, rows, first ts, last ts, columns
+_CHUNK_COLUMN = struct.Struct('<BBBII')    # encoding, decimals, flags, offset, length
+
+@dataclass
+class ChunkInfo:
+    """Index entry of one sealed chunk file"""
+    path: str
+    rows: int
+    first_ts: int
+    last_ts: int
+    size: int
+    columns: Dict[str, Tuple[int, int, int, int, int]]
+
+class ChunkStore:
+    """Append-only compressed column chunks for raw metric rows
+
+    Rows collect in an open head (mirrored to ``head.log`` so a restart
+    loses nothing) and are sealed into an immutable chunk file once the head
+    holds ``chunk_rows`` rows or spans ``chunk_seconds``. Every column,
+    timestamps included, gets the smallest of Gorilla XOR, delta or
+    delta-of-delta over its exact decimal scaling. Sealed chunks are indexed
+    by time range and read through mmap. Rows older than the newest sealed
+    row collect in a separate overflow head (``overflow.log``) that is sealed
+    the same way once it holds ``chunk_rows`` rows. Columns listed in ``decimals``
+    are rounded on append (lossy, off by default); everything else
+    round-trips exactly.
+    
+    With ``read_only`` nothing on disk is changed: the head log is not
+    rewritten, nothing is sealed, and chunks sealed or pruned by the
+    writing process are picked up on each read.
+    """
+    
+    HEAD_FILE = "head.log"
+    OVERFLOW_FILE = "overflow.log"
+    SUFFIX = ".chunk"
+    
+    def __init__(self, directory: str, columns: Tuple[str, ...] = METRIC_COLUMNS,
+                 chunk_rows: int = 720, chunk_seconds: float = 7200, cache_size: int = 256,
+                 decimals: Optional[Dict[str, int]] = None, read_only: bool = False):
+        self.directory = Path(directory)
+        self.read_only = read_only
+        if not read_only:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.columns = tuple(columns)
+        self.chunk_rows = chunk_rows
+        self.chunk_ms = int(chunk_seconds * 1000)
+        self.cache_size = cache_size
+        self._rounding = [(i, decimals[c]) for i, c in enumerate(self.columns) if c in (decimals or {})]
+        self._lock = threading.RLock()
+        self._index: List[ChunkInfo] = []
+        self._head: List[Tuple[int, Tuple]] = []
+        self._head_file = None
+        self._overflow: List[Tuple[int, Tuple]] = []
+        self._overflow_file = None
+        self._cache: "OrderedDict[Tuple[str, str], List[Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._seen: Optional[Tuple] = None
+        self._load()
+    
+    def _load(self):
+        """Index sealed chunks and replay the head log"""
+        if self.read_only:
+            self._refresh()
+            return
+        for path in self.directory.glob('*.tmp'):
+            path.unlink()
+        self._index = self._index_chunks()
+        self._replay_head(self._read_head())
+        self._replay_overflow(self._read_head(self.OVERFLOW_FILE))
+        self._head_file = self._rewrite_log(self.HEAD_FILE, self._head)
+        self._overflow_file = self._rewrite_log(self.OVERFLOW_FILE, self._overflow)
+        if self._head_full():
+            self._seal()
+        if len(self._overflow) >= self.chunk_rows:
+            self._seal_overflow()
+    
+    def _rewrite_log(self, name: str, rows: List[Tuple[int, Tuple]]):
+        path = self.directory / name
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(self._head_line(ts, values) for ts, values in rows)
+        return open(path, 'a', encoding='utf-8')
+    
+    def _index_chunks(self) -> List[ChunkInfo]:
+        """Sealed chunks on disk by first timestamp, reusing already indexed ones"""
+        known = {c.path: c for c in self._index}
+        index = []
+        for path in sorted(self.directory.glob('*' + self.SUFFIX)):
+            info = known.get(str(path))
+            if info is None:
+                try:
+                    info = self._read_info(str(path))
+                except (OSError, ValueError, struct.error):
+                    continue  # Skip truncated or foreign files
+            index.append(info)
+        index.sort(key=lambda c: c.first_ts)
+        return index
+    
+    def _read_head(self, name: str = HEAD_FILE) -> List[Tuple[int, Tuple]]:
+        rows = []
+        try:
+            with open(self.directory / name, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # Torn final write
+                    rows.append((record['ts'], tuple(record.get(c) for c in self.columns)))
+        except FileNotFoundError:
+            pass
+        return rows
+    
+    def _replay_head(self, rows: List[Tuple[int, Tuple]]):
+        sealed_until = max((c.last_ts for c in self._index), default=None)
+        self._head = []
+        for ts, values in rows:
+            # Rows already sealed before a crash are not replayed twice
+            if sealed_until is None or ts > sealed_until:
+                self._insert_head(ts, values)
+    
+    def _replay_overflow(self, rows: List[Tuple[int, Tuple]]):
+        self._overflow = []
+        if not rows:
+            return
+        # An overflow chunk sealed just before a crash still has its rows in the log
+        first, last = min(ts for ts, _ in rows), max(ts for ts, _ in rows)
+        sealed = set(self._scan_sources(
+            [(c.first_ts, c.last_ts, self._scan_chunk(c, first, last + 1, list(self.columns)))
+             for c in self._index if c.last_ts >= first and c.first_ts <= last]))
+        self._overflow = sorted((row for row in rows if row not in sealed), key=lambda r: r[0])
+    
+    def _refresh(self):
+        """Read-only stores: follow the chunks and head log of the writing process"""
+        if not self.read_only:
+            return
+        head_state = []
+        for name in (self.HEAD_FILE, self.OVERFLOW_FILE):
+            try:
+                stat = (self.directory / name).stat()
+                head_state.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                head_state.append(None)
+        head_state = tuple(head_state)
+        try:
+            names = tuple(sorted(p.name for p in self.directory.glob('*' + self.SUFFIX)))
+        except OSError:
+            names = ()
+        with self._lock:
+            if self._seen == (names, head_state):
+                return
+            # Heads before chunks: rows sealed in between are then found in their chunk
+            head, overflow = self._read_head(), self._read_head(self.OVERFLOW_FILE)
+            self._index = self._index_chunks() if self.directory.is_dir() else []
+            self._replay_head(head)
+            self._replay_overflow(overflow)
+            self._seen = (names, head_state)
+    
+    def _head_line(self, ts: int, values: Tuple) -> str:
+        record = dict(zip(self.columns, values))
+        record['ts'] = ts
+        return json.dumps(record, separators=(',', ':')) + "\n"
+    
+    def _insert_head(self, ts: int, values: Tuple):
+        if self._head and ts < self._head[-1][0]:
+            index = bisect.bisect_right([row[0] for row in self._head], ts)
+            self._head.insert(index, (ts, values))
+        else:
+            self._head.append((ts, values))
+    
+    def _head_full(self) -> bool:
+        head = self._head
+        return bool(head) and (len(head) >= self.chunk_rows or head[-1][0] - head[0][0] >= self.chunk_ms)
+    
+    def _round(self, values) -> Tuple:
+        values = list(values)
+        for i, places in self._rounding:
+            if values[i] is not None:
+                values[i] = round(values[i], places)
+        return tuple(values)
+    
+    def append(self, rows: List[Tuple[int, Tuple]]):
+        """Add (ts, values) rows, values ordered like ``columns``"""
+        if self.read_only:
+            raise OSError("chunk store is read-only")
+        rows = [(ts, self._round(values)) for ts, values in rows]
+        with self._lock:
+            sealed_until = max((c.last_ts for c in self._index), default=None)
+            if sealed_until is not None:
+                # Rows older than sealed data go to the overflow head; head
+                # replay treats such rows as already sealed
+                late = [row for row in rows if row[0] <= sealed_until]
+                if late:
+                    rows = [row for row in rows if row[0] > sealed_until]
+                    self._overflow = sorted(self._overflow + late, key=lambda r: r[0])
+                    self._overflow_file.write("".join(self._head_line(ts, values) for ts, values in late))
+                    self._overflow_file.flush()
+                    if len(self._overflow) >= self.chunk_rows:
+                        self._seal_overflow()
+                    if not rows:
+                        return
+            for ts, values in rows:
+                self._insert_head(ts, values)
+            self._head_file.write("".join(self._head_line(ts, values) for ts, values in rows))
+            self._head_file.flush()
+            if self._head_full():
+                self._seal()
+    
+    def flush(self):
+        """Seal the open head and overflow head into chunk files"""
+        with self._lock:
+            if self.read_only:
+                return
+            if self._head:
+                self._seal()
+            if self._overflow:
+                self._seal_overflow()
+    
+    def _seal(self):
+        self._write_chunk(self._head)
+        self._head = []
+        self._head_file.truncate(0)
+    
+    def _seal_overflow(self):
+        self._write_chunk(self._overflow)
+        self._overflow = []
+        self._overflow_file.truncate(0)
+    
+    def _write_chunk(self, rows: List[Tuple[int, Tuple]]):
+        entries = [('ts',) + _encode_column([ts for ts, _ in rows])]
+        for i, column in enumerate(self.columns):
+            entries.append((column,) + _encode_column([values[i] for _, values in rows]))
+        
+        names = [name.encode() for name, *_ in entries]
+        offset = _CHUNK_HEADER.size + sum(1 + len(n) + _CHUNK_COLUMN.size for n in names)
+        parts = [_CHUNK_HEADER.pack(CHUNK_MAGIC, len(rows), rows[0][0], rows[-1][0], len(entries))]
+        for name, (_, encoding, places, flags, payload) in zip(names, entries):
+            parts += [bytes([len(name)]), name,
+                      _CHUNK_COLUMN.pack(encoding, places, flags, offset, len(payload))]
+            offset += len(payload)
+        parts += [payload for *_, payload in entries]
+        
+        base = f"{rows[0][0]:013d}-{rows[-1][0]:013d}"
+        path = self.directory / (base + self.SUFFIX)
+        n = 1
+        while path.exists():
+            path = self.directory / f"{base}.{n}{self.SUFFIX}"
+            n += 1
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(b''.join(parts))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        
+        info = self._read_info(str(path))
+        self._index.insert(bisect.bisect_right([c.first_ts for c in self._index], info.first_ts), info)
+    
+    @staticmethod
+    def _read_info(path: str) -> ChunkInfo:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, rows, first_ts, last_ts, count = _CHUNK_HEADER.unpack_from(mm, 0)
+            if magic != CHUNK_MAGIC:
+                raise ValueError(f"not a chunk file: {path}")
+            pos = _CHUNK_HEADER.size
+            columns = {}
+            for _ in range(count):
+                length = mm[pos]
+                name = mm[pos + 1:pos + 1 + length].decode()
+                pos += 1 + length
+                columns[name] = _CHUNK_COLUMN.unpack_from(mm, pos)
+                pos += _CHUNK_COLUMN.size
+            return ChunkInfo(path, rows, first_ts, last_ts, len(mm), columns)
+    
+    def _read_columns(self, info: ChunkInfo, names: List[str]) -> List[List[Any]]:
+        """Decoded columns of a chunk, through a small LRU cache"""
+        result: Dict[str, List[Any]] = {}
+        with self._cache_lock:
+            for name in names:
+                cached = self._cache.get((info.path, name))
+                if cached is not None:
+                    self._cache.move_to_end((info.path, name))
+                    result[name] = cached
+        missing = [name for name in names if name not in result]
+        if missing:
+            with open(info.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for name in missing:
+                    entry = info.columns.get(name)
+                    if entry is None:
+                        result[name] = [None] * info.rows
+                        continue
+                    encoding, places, flags, offset, length = entry
+                    result[name] = _decode_column(mm[offset:offset + length], info.rows,
+                                                  encoding, places, flags)
+            with self._cache_lock:
+                for name in missing:
+                    self._cache[(info.path, name)] = result[name]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return [result[name] for name in names]
+    
+    def _scan_chunk(self, info: ChunkInfo, start_ms: int, end_ms: int, columns: List[str]):
+        try:
+            ts, *values = self._read_columns(info, ['ts'] + columns)
+        except (OSError, ValueError):
+            return  # Pruned while the scan was running
+        for i in range(bisect.bisect_left(ts, start_ms), bisect.bisect_left(ts, end_ms)):
+            yield ts[i], tuple(col[i] for col in values)
+    
+    def scan(self, start_ms: int, end_ms: int, columns: Optional[List[str]] = None):
+        """Yield (ts, values) rows in [start_ms, end_ms), oldest first"""
+        columns = list(self.columns if columns is None else columns)
+        positions = [self.columns.index(c) if c in self.columns else None for c in columns]
+        self._refresh()
+        with self._lock:
+            chunks = [c for c in self._index if c.last_ts >= start_ms and c.first_ts < end_ms]
+            heads = [[(ts, tuple(None if i is None else values[i] for i in positions))
+                      for ts, values in rows if start_ms <= ts < end_ms]
+                     for rows in (self._head, self._overflow)]
+        
+        sources = [(c.first_ts, c.last_ts, self._scan_chunk(c, start_ms, end_ms, columns))
+                   for c in chunks]
+        sources += [(head[0][0], head[-1][0], iter(head)) for head in heads if head]
+        yield from self._scan_sources(sorted(sources, key=lambda source: source[0]))
+    
+    @staticmethod
+    def _scan_sources(sources: List[Tuple[int, int, Any]]):
+        """Rows of (first ts, last ts, rows) sources ordered by first ts, oldest first"""
+        # Sources only overlap after late writes; merge just those runs
+        run: List = []
+        run_end = None
+        for first_ts, last_ts, rows in sources + [(None, None, None)]:
+            if run and (first_ts is None or first_ts > run_end):
+                yield from (run[0] if len(run) == 1 else heapq.merge(*run, key=lambda r: r[0]))
+                run = []
+            if rows is not None:
+                run.append(rows)
+                run_end = last_ts if len(run) == 1 else max(run_end, last_ts)
+    
+    def aggregate(self, start_ms: int, end_ms: int, bucket_ms: int,
+                  columns: Optional[List[str]] = None):
+        """Yield (bucket, count, mins, maxs, avgs, lasts) per bucket, oldest first"""
+        columns = list(columns or self.columns)
+        width = len(columns)
+        bucket = None
+        for ts, values in self.scan(start_ms, end_ms, columns):
+            start = (ts // bucket_ms) * bucket_ms
+            if start != bucket:
+                if bucket is not None:
+                    yield (bucket, count, mins, maxs,
+                           [s / n if n else None for s, n in zip(sums, counts)], last)
+                bucket, count = start, 0
+                sums, counts = [0.0] * width, [0] * width
+                mins: List[Any] = [None] * width
+                maxs: List[Any] = [None] * width
+            count += 1
+            last = values
+            for i, v in enumerate(values):
+                if v is None:
+                    continue
+                sums[i] += v
+                counts[i] += 1
+                if mins[i] is None or v < mins[i]:
+                    mins[i] = v
+                if maxs[i] is None or v > maxs[i]:
+                    maxs[i] = v
+        if bucket is not None:
+            yield bucket, count, mins, maxs, [s / n if n else None for s, n in zip(sums, counts)], last
+    
+    def first_ts(self) -> Optional[int]:
+        """Oldest stored timestamp"""
+        self._refresh()
+        with self._lock:
+            candidates = [c.first_ts for c in self._index[:1]] + [ts for ts, _ in self._head[:1]]
+            candidates += [ts for ts, _ in self._overflow[:1]]
+        return min(candidates) if candidates else None
+    
+    def prune(self, cutoff_ms: int) -> int:
+        """Delete sealed chunks that end before ``cutoff_ms``; returns rows removed"""
+        if self.read_only:
+            raise OSError("chunk store is read-only")
+        with self._lock:
+            expired = [c for c in self._index if c.last_ts < cutoff_ms]
+            self._index = [c for c in self._index if c.last_ts >= cutoff_ms]
+        for info in expired:
+            try:
+                os.remove(info.path)
+            except OSError:
+                pass
+        with self._cache_lock:
+            paths = {c.path for c in expired}
+            for key in [k for k in self._cache if k[0] in paths]:
+                del self._cache[key]
+        return sum(c.rows for c in expired)
+    
+    def stats(self) -> Dict[str, int]:
+        """Sealed chunk count, rows and bytes, plus open head and overflow rows"""
+        self._refresh()
+        with self._lock:
+            return {'chunks': len(self._index), 'rows': sum(c.rows for c in self._index),
+                    'bytes': sum(c.size for c in self._index), 'head_rows': len(self._head),
+                    'overflow_rows': len(self._overflow)}
+    
+    def close(self):
+        """Close the head logs; the open heads are replayed on next start"""
+        with self._lock:
+            for name in ('_head_file', '_overflow_file'):
+                if getattr(self, name) is not None:
+                    getattr(self, name).close()
+                    setattr(self, name, None)
+
+class ChunkWriteError(OSError):
+    """Metrics of a committed batch that the chunk store did not take"""
+    
+    def __init__(self, metrics: List[SystemMetrics]):
+        super().__init__(f"chunk store append failed for {len(metrics)} metric rows")
+        self.metrics = metrics
 
 class DatabaseManager:
-    """SQLite database manager for storing metrics and logs"""
+    """SQLite database manager for storing metrics and logs
+
+    Keeps one long-lived writer connection (serialized by a lock) and a small
+    pool of read-only connections, so ticks and dashboard hits no longer pay
+    connect/teardown on every call. With ``metrics_backend='chunks'`` raw
+    metric rows go to a ChunkStore instead of the metrics table; rollups,
+    samples and everything else stay in SQLite.
+    
+    ``read_only`` opens the database of a running agent for queries and
+    exports: nothing is created, migrated or moved, and the metrics backend
+    and chunk directory recorded by the agent are used instead of ``config``.
+    """
     
-    def __init__(self, db_path: str = "monitor.db"):
+    def __init__(self, db_path: str = "monitor.db", config: Optional[DatabaseConfig] = None,
+                 retention: Optional[RetentionPolicy] = None, read_only: bool = False):
         self.db_path = db_path
+        self.read_only = read_only
+        self.config = config or DatabaseConfig()
+        self.retention = retention or RetentionPolicy()
+        self._write_lock = threading.RLock()
+        self._writer_conn: Optional[sqlite3.Connection] = None
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers_lock = threading.Lock()
+        self._readers_created = 0
+        self._migration_thread: Optional[threading.Thread] = None
+        self._series_cache: Dict[Tuple[str, str], int] = {}
+        self.chunks: Optional[ChunkStore] = None
+        if read_only:
+            self._read_meta()
+        if self.config.metrics_backend == 'chunks':
+            self.chunk_dir = self.config.chunk_dir or str(Path(db_path).with_suffix('.chunks'))
+            self.chunks = ChunkStore(self.chunk_dir, chunk_rows=self.config.chunk_rows,
+                                     chunk_seconds=self.config.chunk_seconds,
+                                     decimals=self.config.chunk_decimals, read_only=read_only)
+        elif self.config.metrics_backend != 'sqlite':
+            raise ValueError(f"unknown metrics backend: {self.config.metrics_backend}")
+        if read_only:
+            return
         self.init_db()
+        if self.chunks is not None:
+            self._move_metrics_to_chunks()
+    
+    def _read_meta(self):
+        """Check the schema of a read-only database and adopt its storage layout"""
+        if not self._in_memory and not Path(self.db_path).exists():
+            raise FileNotFoundError(f"no database at {self.db_path}")
+        with self._reader() as conn:
+            try:
+                version = self._schema_version(conn.cursor())
+            except sqlite3.OperationalError:
+                # Databases created before schema_version existed are v1
+                version = 1 if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                                            "AND name = 'metrics'").fetchone() else 0
+            meta = dict(conn.execute('SELECT key, value FROM meta')) if version >= 8 else {}
+        if version != SCHEMA_VERSION:
+            raise sqlite3.DatabaseError(f"{self.db_path} has schema v{version}, expected v{SCHEMA_VERSION}; "
+                                        f"start the agent on it once to migrate")
+        self.config = replace(self.config, metrics_backend=meta.get('metrics_backend', 'sqlite'),
+                              chunk_dir=meta.get('chunk_dir') or None)
+    
+    @property
+    def _in_memory(self) -> bool:
+        return self.db_path == ":memory:" or self.db_path.startswith("file::memory:")
+    
+    def _apply_pragmas(self, conn: sqlite3.Connection, read_only: bool = False):
+        """Apply configured pragmas to a fresh connection"""
+        cfg = self.config
+        conn.execute(f"PRAGMA busy_timeout = {int(cfg.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size = {-int(cfg.cache_size_kb)}")
+        if cfg.mmap_size:
+            conn.execute(f"PRAGMA mmap_size = {int(cfg.mmap_size)}")
+        if read_only:
+            conn.execute("PRAGMA query_only = 1")
+        else:
+            if not self._in_memory:
+                conn.execute(f"PRAGMA journal_mode = {cfg.journal_mode}")
+            conn.execute(f"PRAGMA synchronous = {cfg.synchronous}")
+    
+    def _connect_writer(self) -> sqlite3.Connection:
+        if self.read_only:
+            raise sqlite3.OperationalError("database opened read-only")
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._apply_pragmas(conn)
+        return conn
+    
+    def _connect_reader(self) -> sqlite3.Connection:
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._apply_pragmas(conn, read_only=True)
+        return conn
+    
+    @contextmanager
+    def _writer(self):
+        """Yield the shared writer connection inside a transaction"""
+        with self._write_lock:
+            if self._writer_conn is None:
+                self._writer_conn = self._connect_writer()
+            conn = self._writer_conn
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+    
+    @contextmanager
+    def _reader(self, dedicated: bool = False):
+        """Borrow a read-only connection from the pool
+
+        Long streams (exports) pass ``dedicated`` to get a connection of their
+        own instead, so they never starve the dashboard of pooled readers.
+        """
+        if self._in_memory:
+            # Private in-memory databases are only visible to the writer
+            with self._write_lock:
+                if self._writer_conn is None:
+                    self._writer_conn = self._connect_writer()
+                yield self._writer_conn
+            return
+        
+        if dedicated:
+            conn = self._connect_reader()
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+        
+        conn = None
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._readers_lock:
+                if self._readers_created < max(1, self.config.read_pool_size):
+                    self._readers_created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._connect_reader()
+                except Exception:
+                    with self._readers_lock:
+                        self._readers_created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._readers.get(timeout=self.config.busy_timeout_ms / 1000)
+                except queue.Empty:
+                    raise sqlite3.OperationalError("no reader connection available") from None
+        try:
+            yield conn
+        finally:
+            # End any implicit read transaction before returning it
+            conn.rollback()
+            self._readers.put(conn)
+    
+    def close(self):
+        """Close the writer, all pooled reader connections and the chunk store"""
+        if self.chunks is not None:
+            self.chunks.close()
+        with self._write_lock:
+            if self._writer_conn is not None:
+                try:
+                    self._writer_conn.close()
+                except Exception:
+                    pass
+                self._writer_conn = None
+        while True:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.close()
+            except Exception:
+                pass
+            with self._readers_lock:
+                self._readers_created -= 1
         
     def init_db(self):
-        """Initialize database tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Initialize database tables and bring the schema up to date"""
+        with self._writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER NOT NULL
+                )
+            ''')
+            
+            # Activity logs table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS activity_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    description TEXT NOT NULL
+                )
+            ''')
+            
+            version = self._schema_version(cursor)
+            if version == 0:
+                tables = {row[0] for row in cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'")}
+                # Databases created before schema_version existed are v1
+                version = 1 if 'metrics' in tables else 0
+            
+            if version == 0:
+                self._create_v2_tables(cursor)
+                version = 2
+            
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                self.MIGRATIONS[target](self, cursor)
+                version = target
+            
+            cursor.execute("DELETE FROM schema_version")
+            cursor.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+            # Read-only opens (query, export, serve) follow the agent's storage layout
+            chunk_dir = str(Path(self.chunk_dir).resolve()) if self.chunks is not None else ''
+            cursor.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                               [('metrics_backend', self.config.metrics_backend), ('chunk_dir', chunk_dir)])
         
+        if self._has_table("metrics_v1") or self._has_table("alerts_v1"):
+            self._migration_thread = threading.Thread(target=self._backfill_v1, daemon=True)
+            self._migration_thread.start()
+    
+    @staticmethod
+    def _schema_version(cursor: sqlite3.Cursor) -> int:
+        row = cursor.execute("SELECT MAX(version) FROM schema_version").fetchone()
+        return row[0] or 0
+    
+    def _has_table(self, name: str) -> bool:
+        with self._writer() as conn:
+            row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                               (name,)).fetchone()
+        return row is not None
+    
+    @staticmethod
+    def _create_v2_tables(cursor: sqlite3.Cursor):
+        """Create the v2 metrics and alerts tables (epoch ms timestamps)"""
         # System metrics table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS metrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
+                id INTEGER PRIMARY KEY,
+                ts INTEGER NOT NULL,
                 cpu_percent REAL,
                 memory_percent REAL,
                 disk_usage REAL,
@@ -98,16 +1068,7 @@ class DatabaseManager:
                 temperature REAL
             )
         ''')
-        
-        # Activity logs table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS activity_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                type TEXT NOT NULL,
-                description TEXT NOT NULL
-            )
-        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_metrics_ts ON metrics (ts)')
         
         # Alerts table
         cursor.execute('''
@@ -115,204 +1076,3000 @@ class DatabaseManager:
                 id TEXT PRIMARY KEY,
                 level TEXT NOT NULL,
                 message TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
+                ts INTEGER NOT NULL,
                 resolved INTEGER DEFAULT 0
             )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_active ON alerts (resolved, ts)')
+    
+    def _migrate_to_v2(self, cursor: sqlite3.Cursor):
+        """Swap in the v2 tables; legacy rows are copied later in batches"""
+        cursor.execute("ALTER TABLE metrics RENAME TO metrics_v1")
+        cursor.execute("ALTER TABLE alerts RENAME TO alerts_v1")
+        # The renamed tables keep their old indexes; v2 index names must be free
+        cursor.execute("DROP INDEX IF EXISTS idx_metrics_ts")
+        cursor.execute("DROP INDEX IF EXISTS idx_alerts_active")
+        self._create_v2_tables(cursor)
+    
+    def _migrate_to_v3(self, cursor: sqlite3.Cursor):
+        """Add the 1m/1h/1d rollup tables and their watermarks"""
+        for _, table, _ in ROLLUP_TIERS:
+            columns = ",\n".join(f"{col}_{agg} REAL" for col in BASE_METRIC_COLUMNS
+                                 for agg in ('min', 'max', 'avg', 'last'))
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    ts INTEGER PRIMARY KEY,
+                    samples INTEGER NOT NULL,
+                    {columns}
+                )
+            ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                tier TEXT PRIMARY KEY,
+                watermark INTEGER NOT NULL
+            )
+        ''')
+    
+    @staticmethod
+    def _add_columns(cursor: sqlite3.Cursor, table: str, columns: List[str]):
+        """ALTER TABLE ADD COLUMN for each "name TYPE" not already present"""
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        for column in columns:
+            if column.split()[0] not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+    
+    def _migrate_to_v4(self, cursor: sqlite3.Cursor):
+        """Add network throughput rates and the per-interface table"""
+        self._add_columns(cursor, 'metrics', [f"{col} REAL" for col in NETWORK_RATE_COLUMNS])
+        for _, table, _ in ROLLUP_TIERS:
+            self._add_columns(cursor, table, [f"{col}_{agg} REAL" for col in NETWORK_RATE_COLUMNS
+                                              for agg in ('min', 'max', 'avg', 'last')])
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS network_interfaces (
+                ts INTEGER NOT NULL,
+                interface TEXT NOT NULL,
+                bytes_sent_rate REAL,
+                bytes_recv_rate REAL,
+                packets_sent_rate REAL,
+                packets_recv_rate REAL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_network_interfaces_ts '
+                       'ON network_interfaces (ts)')
+    
+    def _migrate_to_v5(self, cursor: sqlite3.Cursor):
+        """Add the generic (metric, labels, ts, value) sample store
+
+        Per-interface rates move from network_interfaces into it.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS series (
+                id INTEGER PRIMARY KEY,
+                metric TEXT NOT NULL,
+                labels TEXT NOT NULL DEFAULT '',
+                UNIQUE (metric, labels)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS samples (
+                series_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                value REAL,
+                PRIMARY KEY (series_id, ts)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_samples_ts ON samples (ts)')
         
-        conn.commit()
-        conn.close()
+        rows = cursor.execute('''
+            SELECT ts, interface, bytes_sent_rate, bytes_recv_rate, packets_sent_rate, packets_recv_rate
+            FROM network_interfaces
+        ''').fetchall()
+        series_ids: Dict[Tuple[str, str], int] = {}
+        values = []
+        for ts, interface, *rates in rows:
+            for f, value in zip(NetworkRateTracker.FIELDS, rates):
+                key = (f"interface_{f}_rate", _labels_key({"interface": interface}))
+                if key not in series_ids:
+                    series_ids[key] = self._series_id(cursor, *key)
+                values.append((series_ids[key], ts, value))
+        cursor.executemany('INSERT OR REPLACE INTO samples (series_id, ts, value) VALUES (?, ?, ?)',
+                           values)
+        cursor.execute('DROP TABLE network_interfaces')
+    
+    def _migrate_to_v6(self, cursor: sqlite3.Cursor):
+        """Add alert_history: one row per firing or resolved transition"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alert_history (
+                id INTEGER PRIMARY KEY,
+                alert_id TEXT NOT NULL,
+                state TEXT NOT NULL,
+                level TEXT NOT NULL,
+                message TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                value REAL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alert_history_ts ON alert_history (ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alert_history_alert ON alert_history (alert_id, ts)')
+    
+    def _migrate_to_v7(self, cursor: sqlite3.Cursor):
+        """Add notification_outbox: alert notifications waiting for delivery"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id INTEGER PRIMARY KEY,
+                sink TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created INTEGER NOT NULL,
+                next_attempt INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL DEFAULT 'pending',
+                last_error TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_due ON notification_outbox (state, next_attempt)')
+    
+    def _migrate_to_v8(self, cursor: sqlite3.Cursor):
+        """Add meta: facts about the database itself, such as its metrics backend"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
+    
+    def _migrate_to_v9(self, cursor: sqlite3.Cursor):
+        """Add the fleet tables filled by agents pushing to a collector
+
+        hosts has one row per agent; fleet_metrics and fleet_samples mirror
+        metrics and samples keyed by host (samples carry a host label in
+        series), fleet_alerts holds each host's alert state, and
+        alert_history gains a host column (NULL for local alerts).
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS hosts (
+                name TEXT PRIMARY KEY,
+                address TEXT,
+                interval REAL,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL,
+                last_ts INTEGER
+            )
+        ''')
+        columns = ",\n".join(f"{col} REAL" for col in METRIC_COLUMNS)
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS fleet_metrics (
+                host TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                {columns},
+                PRIMARY KEY (host, ts)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fleet_metrics_ts ON fleet_metrics (ts)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fleet_samples (
+                series_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                value REAL,
+                PRIMARY KEY (series_id, ts)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fleet_samples_ts ON fleet_samples (ts)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fleet_alerts (
+                host TEXT NOT NULL,
+                id TEXT NOT NULL,
+                level TEXT NOT NULL,
+                message TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                resolved INTEGER DEFAULT 0,
+                value REAL,
+                PRIMARY KEY (host, id)
+            )
+        ''')
+        self._add_columns(cursor, 'alert_history', ['host TEXT'])
+    
+    MIGRATIONS = {
+        2: _migrate_to_v2,
+        3: _migrate_to_v3,
+        4: _migrate_to_v4,
+        5: _migrate_to_v5,
+        6: _migrate_to_v6,
+        7: _migrate_to_v7,
+        8: _migrate_to_v8,
+        9: _migrate_to_v9,
+    }
+    
+    def _backfill_v1(self, batch_size: int = 2000, pause: float = 0.05):
+        """Copy legacy ISO-timestamp rows into the v2 tables, newest first
+
+        Each batch is its own short transaction and copied rows are deleted
+        from the legacy table, so the migration resumes after a restart and
+        never holds the writer for long.
+        """
+        try:
+            with self._writer() as conn:
+                if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'alerts_v1'").fetchone():
+                    rows = conn.execute(
+                        "SELECT id, level, message, timestamp, resolved FROM alerts_v1").fetchall()
+                    conn.executemany('''
+                        INSERT OR IGNORE INTO alerts (id, level, message, ts, resolved)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', [(r[0], r[1], r[2], _to_epoch_ms(r[3]), r[4]) for r in rows])
+                    conn.execute("DROP TABLE alerts_v1")
+            
+            while True:
+                with self._writer() as conn:
+                    if not conn.execute(
+                            "SELECT 1 FROM sqlite_master WHERE name = 'metrics_v1'").fetchone():
+                        return
+                    rows = conn.execute('''
+                        SELECT id, timestamp, cpu_percent, memory_percent, disk_usage,
+                               network_sent, network_recv, processes_count, temperature
+                        FROM metrics_v1 ORDER BY id DESC LIMIT ?
+                    ''', (batch_size,)).fetchall()
+                    if not rows:
+                        conn.execute("DROP TABLE metrics_v1")
+                        return
+                    conn.executemany('''
+                        INSERT INTO metrics (ts, cpu_percent, memory_percent, disk_usage,
+                                           network_sent, network_recv, processes_count, temperature)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', [(_to_epoch_ms(r[1]),) + tuple(r[2:]) for r in rows])
+                    conn.execute("DELETE FROM metrics_v1 WHERE id >= ?", (rows[-1][0],))
+                time.sleep(pause)
+        except Exception:
+            pass  # Retried on next start
     
     def insert_metrics(self, metrics: SystemMetrics):
         """Insert system metrics"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO metrics (timestamp, cpu_percent, memory_percent, disk_usage,
-                               network_sent, network_recv, processes_count, temperature)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (metrics.timestamp, metrics.cpu_percent, metrics.memory_percent,
-              metrics.disk_usage, metrics.network_sent, metrics.network_recv,
-              metrics.processes_count, metrics.temperature))
-        conn.commit()
-        conn.close()
+        self.write_batch([metrics], [])
+    
+    def _series_id(self, cursor, metric: str, labels: str) -> int:
+        """Id of a (metric, labels) series, creating it on first use"""
+        key = (metric, labels)
+        series_id = self._series_cache.get(key)
+        if series_id is None:
+            cursor.execute('INSERT OR IGNORE INTO series (metric, labels) VALUES (?, ?)', key)
+            series_id = cursor.execute('SELECT id FROM series WHERE metric = ? AND labels = ?',
+                                       key).fetchone()[0]
+            self._series_cache[key] = series_id
+        return series_id
+    
+    def insert_samples(self, samples: List["Sample"]):
+        """Insert collector samples into the generic store"""
+        self.write_batch([], [], samples)
+    
+    def write_batch(self, metrics: List[SystemMetrics], alerts: List[Alert],
+                    samples: Optional[List["Sample"]] = None):
+        """Write queued metrics, alerts and samples in a single transaction"""
+        with self._writer() as conn:
+            if samples:
+                try:
+                    conn.executemany('''
+                        INSERT OR REPLACE INTO samples (series_id, ts, value) VALUES (?, ?, ?)
+                    ''', [(self._series_id(conn, s.metric, _labels_key(s.labels)), s.ts, s.value)
+                          for s in samples])
+                except sqlite3.Error:
+                    # A rolled back transaction may have discarded new series rows
+                    self._series_cache.clear()
+                    raise
+            if metrics and self.chunks is None:
+                conn.executemany(f'''
+                    INSERT INTO metrics (ts, {", ".join(METRIC_COLUMNS)})
+                    VALUES ({", ".join("?" * (len(METRIC_COLUMNS) + 1))})
+                ''', [(_to_epoch_ms(m.timestamp),) + tuple(getattr(m, col) for col in METRIC_COLUMNS)
+                      for m in metrics])
+            if alerts:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO alerts (id, level, message, ts, resolved)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(a.id, a.level, a.message, _to_epoch_ms(a.timestamp), int(a.resolved))
+                      for a in alerts])
+                conn.executemany('''
+                    INSERT INTO alert_history (alert_id, state, level, message, ts, value)
+                    SELECT ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (
+                        SELECT 1 FROM alert_history
+                        WHERE alert_id = ? AND ts = ? AND state = ? AND host IS NULL)
+                ''', [(a.id, state, a.level, a.message, _to_epoch_ms(a.timestamp), a.value,
+                       a.id, _to_epoch_ms(a.timestamp), state)
+                      for a in alerts for state in ['resolved' if a.resolved else 'firing']])
+        if metrics and self.chunks is not None:
+            # After the commit; if this fails only the metrics are written again
+            try:
+                self.chunks.append([(_to_epoch_ms(m.timestamp), tuple(getattr(m, col) for col in METRIC_COLUMNS))
+                                    for m in metrics])
+            except Exception as e:
+                raise ChunkWriteError(metrics) from e
+    
+    def _move_metrics_to_chunks(self, batch_size: int = 5000):
+        """Move rows left in the metrics table (from the sqlite backend) into chunks
+
+        Each batch is appended before its DELETE commits; rows a crash left in
+        both places are found in the store on the next start and not added
+        twice.
+        """
+        while True:
+            with self._writer() as conn:
+                rows = conn.execute(f'''
+                    SELECT id, ts, {", ".join(METRIC_COLUMNS)} FROM metrics ORDER BY ts LIMIT ?
+                ''', (batch_size,)).fetchall()
+                if not rows:
+                    return
+                moved = {ts for ts, _ in self.chunks.scan(rows[0][1], rows[-1][1] + 1, [])}
+                self.chunks.append([(row[1], row[2:]) for row in rows if row[1] not in moved])
+                conn.executemany('DELETE FROM metrics WHERE id = ?', [(row[0],) for row in rows])
     
     def insert_activity(self, activity_type: str, description: str):
         """Insert activity log"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         timestamp = datetime.now().isoformat()
-        cursor.execute('''
-            INSERT INTO activity_logs (timestamp, type, description)
-            VALUES (?, ?, ?)
-        ''', (timestamp, activity_type, description))
-        conn.commit()
-        conn.close()
+        with self._writer() as conn:
+            conn.execute('''
+                INSERT INTO activity_logs (timestamp, type, description)
+                VALUES (?, ?, ?)
+            ''', (timestamp, activity_type, description))
     
     def insert_alert(self, alert: Alert):
         """Insert or update alert"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO alerts (id, level, message, timestamp, resolved)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (alert.id, alert.level, alert.message, alert.timestamp, int(alert.resolved)))
-        conn.commit()
-        conn.close()
-    
-    def get_recent_metrics(self, hours: int = 24) -> List[Dict]:
-        """Get recent metrics"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        since = (datetime.now() - timedelta(hours=hours)).isoformat()
-        cursor.execute('''
-            SELECT * FROM metrics WHERE timestamp > ? ORDER BY timestamp DESC
-        ''', (since,))
-        columns = [desc[0] for desc in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        self.write_batch([], [alert])
     
-    def get_active_alerts(self) -> List[Dict]:
-        """Get active alerts"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM alerts WHERE resolved = 0 ORDER BY timestamp DESC')
+    @staticmethod
+    def _rows_to_dicts(cursor: sqlite3.Cursor) -> List[Dict]:
+        """Materialize rows, adding an ISO 'timestamp' next to the epoch 'ts'"""
         columns = [desc[0] for desc in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        conn.close()
+        results = []
+        for row in cursor.fetchall():
+            item = dict(zip(columns, row))
+            item['timestamp'] = _from_epoch_ms(item['ts'])
+            results.append(item)
         return results
+    
+    def choose_resolution(self, hours: float, max_points: Optional[int] = None) -> str:
+        """Pick the storage tier to answer a query over the last ``hours``
 
-class AlertManager:
-    """Alert management system"""
+        Tiers are tried from finest to coarsest; the first one whose retention
+        still covers the whole range and whose point count fits ``max_points``
+        wins. When none fits the budget the coarsest covering tier is used.
+        """
+        policy = self.retention
+        max_points = max_points or policy.max_points
+        range_ms = hours * 3_600_000
+        candidates = [('raw', policy.raw_interval_seconds * 1000)]
+        candidates += [(tier, bucket_ms) for tier, _, bucket_ms in ROLLUP_TIERS]
+        covering = []
+        for tier, step_ms in candidates:
+            keep = policy.keep_ms(tier)
+            if keep is not None and keep < range_ms:
+                continue
+            covering.append(tier)
+            if range_ms / step_ms <= max_points:
+                return tier
+        return covering[-1] if covering else ROLLUP_TIERS[-1][0]
     
-    def __init__(self, db_manager: DatabaseManager):
-        self.db = db_manager
-        self.thresholds = {
-            'cpu_high': 80.0,
-            'memory_high': 85.0,
-            'disk_high': 90.0,
-            'temperature_high': 70.0
-        }
+    def get_recent_metrics(self, hours: float = 24, resolution: str = 'auto',
+                           max_points: Optional[int] = None) -> List[Dict]:
+        """Get recent metrics, newest first
+
+        ``resolution`` is 'raw', '1m', '1h', '1d' or 'auto'. Rollup rows carry
+        the bucket average under each column name plus ``<column>_min``,
+        ``<column>_max`` and ``<column>_last``. Buckets past the tier's
+        watermark are aggregated from finer data on the fly and have no
+        ``_last`` values.
+        """
+        if resolution == 'auto':
+            resolution = self.choose_resolution(hours, max_points)
+        since = _to_epoch_ms(datetime.now() - timedelta(hours=hours))
+        if resolution == 'raw' and self.chunks is not None:
+            rows = [dict(zip(METRIC_COLUMNS, values), ts=ts, timestamp=_from_epoch_ms(ts),
+                         resolution='raw')
+                    for ts, values in self.chunks.scan(since + 1, _to_epoch_ms(datetime.now()) + 1)]
+            rows.reverse()
+            return rows
+        if resolution == 'raw':
+            with self._reader() as conn:
+                cursor = conn.execute('''
+                    SELECT * FROM metrics WHERE ts > ? ORDER BY ts DESC
+                ''', (since,))
+                rows = self._rows_to_dicts(cursor)
+            for row in rows:
+                row['resolution'] = 'raw'
+            return rows
+        
+        table, bucket_ms = {tier: (table, bucket_ms) for tier, table, bucket_ms in ROLLUP_TIERS}[resolution]
+        watermark = self.rollup_watermark(resolution) or 0
+        with self._reader() as conn:
+            cursor = conn.execute(f'SELECT * FROM {table} WHERE ts > ? AND ts < ? ORDER BY ts DESC',
+                                  (since, watermark))
+            rows = self._rows_to_dicts(cursor)
+        for row in rows:
+            for col in METRIC_COLUMNS:
+                row[col] = row[f'{col}_avg']
+            row['resolution'] = resolution
+        # Rollups trail raw data by the settle time, so the newest buckets come from finer tiers
+        tail = []
+        for row in self._iter_tier(resolution, max(since + 1, watermark), _to_epoch_ms(datetime.now()) + 1,
+                                   bucket_ms, list(METRIC_COLUMNS), 1000):
+            for col in METRIC_COLUMNS:
+                row[f'{col}_avg'] = row[col]
+                row[f'{col}_last'] = None
+            row.update(timestamp=_from_epoch_ms(row['ts']), resolution=resolution)
+            tail.append(row)
+        tail.reverse()
+        return tail + rows
     
-    def check_alerts(self, metrics: SystemMetrics):
-        """Check metrics against thresholds and generate alerts"""
-        alerts = []
-        
-        # CPU alert
-        if metrics.cpu_percent > self.thresholds['cpu_high']:
-            alert = Alert(
-                id="cpu_high",
-                level="WARNING",
-                message=f"High CPU usage: {metrics.cpu_percent:.1f}%",
-                timestamp=metrics.timestamp
-            )
-            alerts.append(alert)
-        
-        # Memory alert
-        if metrics.memory_percent > self.thresholds['memory_high']:
-            alert = Alert(
-                id="memory_high",
-                level="CRITICAL",
-                message=f"High memory usage: {metrics.memory_percent:.1f}%",
-                timestamp=metrics.timestamp
-            )
-            alerts.append(alert)
-        
-        # Disk alert
-        if metrics.disk_usage > self.thresholds['disk_high']:
-            alert = Alert(
-                id="disk_high",
-                level="CRITICAL",
-                message=f"High disk usage: {metrics.disk_usage:.1f}%",
-                timestamp=metrics.timestamp
-            )
-            alerts.append(alert)
-        
-        # Temperature alert
-        if metrics.temperature and metrics.temperature > self.thresholds['temperature_high']:
-            alert = Alert(
-                id="temperature_high",
-                level="WARNING",
-                message=f"High temperature: {metrics.temperature:.1f}°C",
-                timestamp=metrics.timestamp
-            )
-            alerts.append(alert)
+    def rollup_step(self, tier: str, now_ms: int, max_buckets: int = 60) -> bool:
+        """Roll up at most ``max_buckets`` settled buckets into ``tier``
+
+        1m buckets are built from raw samples, 1h from 1m and 1d from 1h.
+        Returns True while more settled buckets remain.
+        """
+        names = [name for name, _, _ in ROLLUP_TIERS]
+        index = names.index(tier)
+        _, table, bucket_ms = ROLLUP_TIERS[index]
         
-        # Store alerts silently
-        for alert in alerts:
-            self.db.insert_alert(alert)
+        with self._writer() as conn:
+            if index == 0:
+                source = 'metrics'
+                upper = now_ms - int(self.retention.settle_seconds * 1000)
+            else:
+                source = ROLLUP_TIERS[index - 1][1]
+                row = conn.execute('SELECT watermark FROM rollup_state WHERE tier = ?',
+                                   (names[index - 1],)).fetchone()
+                if row is None:
+                    return False
+                upper = row[0]
+            upper = (upper // bucket_ms) * bucket_ms
+            
+            row = conn.execute('SELECT watermark FROM rollup_state WHERE tier = ?',
+                               (tier,)).fetchone()
+            if row is not None:
+                start = row[0]
+            else:
+                if index == 0 and self.chunks is not None:
+                    first = self.chunks.first_ts()
+                else:
+                    first = conn.execute(f'SELECT MIN(ts) FROM {source}').fetchone()[0]
+                if first is None:
+                    return False
+                start = (first // bucket_ms) * bucket_ms
+            if start >= upper:
+                return False
+            end = min(upper, start + max_buckets * bucket_ms)
+            
+            if index == 0 and self.chunks is not None:
+                self._rollup_chunks(conn, table, bucket_ms, start, end)
+            else:
+                if index == 0:
+                    aggregates = ", ".join(
+                        f"MIN({c}) AS {c}_min, MAX({c}) AS {c}_max, AVG({c}) AS {c}_avg"
+                        for c in METRIC_COLUMNS)
+                    last_cols = ", ".join(f"l.{c}" for c in METRIC_COLUMNS)
+                    count = "COUNT(*)"
+                else:
+                    aggregates = ", ".join(
+                        f"MIN({c}_min) AS {c}_min, MAX({c}_max) AS {c}_max, "
+                        f"SUM({c}_avg * samples) / SUM(CASE WHEN {c}_avg IS NOT NULL "
+                        f"THEN samples END) AS {c}_avg"
+                        for c in METRIC_COLUMNS)
+                    last_cols = ", ".join(f"l.{c}_last" for c in METRIC_COLUMNS)
+                    count = "SUM(samples)"
+                target_cols = ", ".join(f"{c}_min, {c}_max, {c}_avg" for c in METRIC_COLUMNS)
+                group_cols = ", ".join(f"g.{c}_min, g.{c}_max, g.{c}_avg" for c in METRIC_COLUMNS)
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO {table} (ts, samples, {target_cols},
+                        {", ".join(f"{c}_last" for c in METRIC_COLUMNS)})
+                    SELECT g.bucket, g.n, {group_cols}, {last_cols}
+                    FROM (
+                        SELECT (ts / {bucket_ms}) * {bucket_ms} AS bucket, {count} AS n,
+                               MAX(ts) AS last_ts, {aggregates}
+                        FROM {source} WHERE ts >= ? AND ts < ?
+                        GROUP BY bucket
+                    ) g
+                    JOIN {source} l ON l.ts = g.last_ts
+                ''', (start, end))
+            conn.execute('INSERT OR REPLACE INTO rollup_state (tier, watermark) VALUES (?, ?)',
+                         (tier, end))
+            return end < upper
+    
+    def _rollup_chunks(self, conn: sqlite3.Connection, table: str, bucket_ms: int, start: int, end: int):
+        """Write [start, end) raw rows from the chunk store as rollup buckets"""
+        conn.executemany(f'''
+            INSERT OR REPLACE INTO {table} (ts, samples,
+                {", ".join(f"{c}_min, {c}_max, {c}_avg" for c in METRIC_COLUMNS)},
+                {", ".join(f"{c}_last" for c in METRIC_COLUMNS)})
+            VALUES ({", ".join("?" * (2 + 4 * len(METRIC_COLUMNS)))})
+        ''', [(bucket, n) + tuple(v for agg in zip(mins, maxs, avgs) for v in agg) + tuple(lasts)
+              for bucket, n, mins, maxs, avgs, lasts
+              in self.chunks.aggregate(start, end, bucket_ms, list(METRIC_COLUMNS))])
+    
+    def prune_step(self, tier: str, cutoff_ms: int, batch_size: int = 1000) -> int:
+        """Delete up to ``batch_size`` rows older than ``cutoff_ms`` from a tier
 
-class SystemMonitor:
-    """Advanced system monitoring"""
+        Raw samples are never pruned past the 1m watermark, so nothing is
+        deleted before it has been rolled up. Returns the number of rows removed.
+        """
+        with self._writer() as conn:
+            if tier == 'raw':
+                row = conn.execute("SELECT watermark FROM rollup_state WHERE tier = '1m'").fetchone()
+                cutoff_ms = min(cutoff_ms, row[0] if row else 0)
+                if self.chunks is not None:
+                    # Whole chunks only, so this may keep rows a little past the cutoff
+                    removed = self.chunks.prune(cutoff_ms)
+                else:
+                    cursor = conn.execute('''
+                        DELETE FROM metrics WHERE id IN (
+                            SELECT id FROM metrics WHERE ts < ? ORDER BY ts LIMIT ?)
+                    ''', (cutoff_ms, batch_size))
+                    removed = cursor.rowcount
+                cursor = conn.execute('''
+                    DELETE FROM samples WHERE (series_id, ts) IN (
+                        SELECT series_id, ts FROM samples WHERE ts < ? ORDER BY ts LIMIT ?)
+                ''', (cutoff_ms, batch_size))
+                return max(removed, cursor.rowcount)
+            elif tier == 'fleet':
+                cursor = conn.execute('''
+                    DELETE FROM fleet_metrics WHERE (host, ts) IN (
+                        SELECT host, ts FROM fleet_metrics WHERE ts < ? ORDER BY ts LIMIT ?)
+                ''', (cutoff_ms, batch_size))
+                removed = cursor.rowcount
+                cursor = conn.execute('''
+                    DELETE FROM fleet_samples WHERE (series_id, ts) IN (
+                        SELECT series_id, ts FROM fleet_samples WHERE ts < ? ORDER BY ts LIMIT ?)
+                ''', (cutoff_ms, batch_size))
+                return max(removed, cursor.rowcount)
+            else:
+                table = {name: table for name, table, _ in ROLLUP_TIERS}[tier]
+                cursor = conn.execute(f'''
+                    DELETE FROM {table} WHERE ts IN (
+                        SELECT ts FROM {table} WHERE ts < ? ORDER BY ts LIMIT ?)
+                ''', (cutoff_ms, batch_size))
+            return cursor.rowcount
     
-    def __init__(self, db_manager: DatabaseManager):
-        self.db = db_manager
-        self.alert_manager = AlertManager(db_manager)
-        self.running = False
-        self.network_io = psutil.net_io_counters()
+    def get_samples(self, metric: str, hours: float = 1,
+                    labels: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """Samples of one metric (optionally one label set), newest first"""
+        since = _to_epoch_ms(datetime.now() - timedelta(hours=hours))
+        query = '''
+            SELECT s.ts, r.labels, s.value FROM samples s JOIN series r ON r.id = s.series_id
+            WHERE r.metric = ? AND s.ts > ?
+        '''
+        params: List[Any] = [metric, since]
+        if labels is not None:
+            query += ' AND r.labels = ?'
+            params.append(_labels_key(labels))
+        with self._reader() as conn:
+            rows = conn.execute(query + ' ORDER BY s.ts DESC', params).fetchall()
+        return [{'ts': ts, 'timestamp': _from_epoch_ms(ts), 'metric': metric,
+                 'labels': json.loads(label_json) if label_json else {}, 'value': value}
+                for ts, label_json, value in rows]
     
-    def get_system_metrics(self) -> SystemMetrics:
-        """Collect comprehensive system metrics"""
-        # Basic metrics
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        
-        # Fix disk usage to work on Windows/Linux
-        try:
-            if os.name == 'nt':  # Windows
-                disk = psutil.disk_usage('C:')
-            else:  # Linux/Unix
-                disk = psutil.disk_usage('/')
-        except:
-            # Fallback to current directory
-            disk = psutil.disk_usage('.')
-        
-        # Network I/O
-        net_io = psutil.net_io_counters()
-        
-        # Temperature (if available)
-        temperature = None
-        try:
-            temps = psutil.sensors_temperatures()
-            if temps:
-                for name, entries in temps.items():
-                    if entries:
-                        temperature = entries[0].current
-                        break
-        except:
-            pass
-        
-        return SystemMetrics(
-            timestamp=datetime.now().isoformat(),
-            cpu_percent=cpu_percent,
-            memory_percent=memory.percent,
-            disk_usage=disk.percent,
-            network_sent=net_io.bytes_sent,
-            network_recv=net_io.bytes_recv,
-            processes_count=len(psutil.pids()),
-            temperature=temperature
-        )
+    def get_sample_history(self, metric: str, hours: float) -> Dict[str, Tuple[List[int], List[float]]]:
+        """Oldest-first (timestamps, values) of every series of ``metric``, by labels key"""
+        since = _to_epoch_ms(datetime.now() - timedelta(hours=hours))
+        history: Dict[str, Tuple[List[int], List[float]]] = {}
+        with self._reader() as conn:
+            cursor = conn.execute('''
+                SELECT r.labels, s.ts, s.value FROM samples s JOIN series r ON r.id = s.series_id
+                WHERE r.metric = ? AND s.ts > ? ORDER BY s.series_id, s.ts
+            ''', (metric, since))
+            for labels, ts, value in cursor:
+                series = history.setdefault(labels, ([], []))
+                series[0].append(ts)
+                series[1].append(value)
+        return history
     
-    def monitor_loop(self):
-        """Main monitoring loop"""
-        while self.running:
-            try:
-                metrics = self.get_system_metrics()
-                self.db.insert_metrics(metrics)
-                self.alert_manager.check_alerts(metrics)
-            except:
-                pass  # Silent operation
-            
-            time.sleep(10)  # Collect metrics every 10 seconds
+    def source_tier(self, start_ms: int, step_ms: Optional[int] = None) -> Tuple[str, str, int]:
+        """(tier, table, bucket_ms) to read for a range starting at ``start_ms``
 
-class ActivityMonitor:
+        Only tiers whose retention still covers ``start_ms`` qualify; among
+        them the coarsest one whose buckets are no wider than ``step_ms`` is
+        used (the finest qualifying tier when no step is given).
+        """
+        age = _to_epoch_ms(datetime.now()) - start_ms
+        tiers = [('raw', 'metrics', 0)] + list(ROLLUP_TIERS)
+        covering = [t for t in tiers
+                    if self.retention.keep_ms(t[0]) is None or self.retention.keep_ms(t[0]) >= age]
+        if not covering:
+            return tiers[-1]
+        if not step_ms:
+            return covering[0]
+        fitting = [t for t in covering if t[2] <= step_ms]
+        return fitting[-1] if fitting else covering[0]
+    
+    def iter_metrics(self, start_ms: int, end_ms: int, step_ms: Optional[int] = None,
+                     columns: Optional[List[str]] = None, chunk_size: int = 1000, dedicated: bool = False):
+        """Stream metric rows in [start_ms, end_ms), oldest first
+
+        With ``step_ms`` rows are bucketed in SQL into avg/min/max per column,
+        reading from the coarsest rollup tier that still fits the step.
+        Yields a (tier, step_ms) header tuple first, then one dict per row.
+        ``dedicated`` reads through a connection outside the reader pool.
+        """
+        columns = list(columns or METRIC_COLUMNS)
+        tier, _, bucket_ms = self.source_tier(start_ms, step_ms)
+        if step_ms and bucket_ms:
+            # Buckets must line up with the source tier
+            step_ms = max(bucket_ms, (step_ms // bucket_ms) * bucket_ms)
+        yield tier, step_ms or None
+        yield from self._iter_tier(tier, start_ms, end_ms, step_ms, columns, chunk_size, dedicated)
+    
+    def rollup_watermark(self, tier: str) -> Optional[int]:
+        """End of the range a rollup tier has been computed for"""
+        with self._reader() as conn:
+            row = conn.execute('SELECT watermark FROM rollup_state WHERE tier = ?', (tier,)).fetchone()
+        return row[0] if row else None
+    
+    def _iter_tier(self, tier: str, start_ms: int, end_ms: int, step_ms: Optional[int],
+                   columns: List[str], chunk_size: int, dedicated: bool = False):
+        """Rows of one tier; the part past its watermark is read from the finer tiers
+
+        Rollups trail raw data by the settle time plus the retention interval,
+        so without this the newest points of any rollup query would be missing.
+        """
+        if tier != 'raw':
+            names = [name for name, _, _ in ROLLUP_TIERS]
+            index = names.index(tier)
+            _, table, bucket_ms = ROLLUP_TIERS[index]
+            align = step_ms or bucket_ms
+            watermark = self.rollup_watermark(tier)
+            split = start_ms if watermark is None else (watermark // align) * align
+            split = min(max(split, start_ms), end_ms)
+            if split > start_ms:
+                yield from self._query_tier(tier, table, start_ms, split, step_ms, columns, chunk_size, dedicated)
+            if split < end_ms:
+                # Unsettled tail, bucketed like the tier itself when no step was asked for
+                finer = names[index - 1] if index else 'raw'
+                for row in self._iter_tier(finer, split, end_ms, align, columns, chunk_size, dedicated):
+                    if not step_ms:
+                        row = {key: row[key] for key in ['ts'] + columns}
+                    yield row
+            return
+        if self.chunks is not None:
+            if not step_ms:
+                for ts, values in self.chunks.scan(start_ms, end_ms, columns):
+                    yield dict(zip(columns, values), ts=ts)
+            else:
+                for bucket, _, mins, maxs, avgs, _ in self.chunks.aggregate(start_ms, end_ms, step_ms, columns):
+                    row = {'ts': bucket}
+                    for c, avg, low, high in zip(columns, avgs, mins, maxs):
+                        row.update({c: avg, f'{c}_min': low, f'{c}_max': high})
+                    yield row
+            return
+        yield from self._query_tier(tier, 'metrics', start_ms, end_ms, step_ms, columns, chunk_size, dedicated)
+    
+    def _query_tier(self, tier: str, table: str, start_ms: int, end_ms: int, step_ms: Optional[int],
+                    columns: List[str], chunk_size: int, dedicated: bool = False):
+        if not step_ms:
+            if tier == 'raw':
+                select = ", ".join(columns)
+            else:
+                select = ", ".join(f"{c}_avg AS {c}" for c in columns)
+            query = f"SELECT ts, {select} FROM {table} WHERE ts >= ? AND ts < ? ORDER BY ts"
+        else:
+            if tier == 'raw':
+                aggregates = ", ".join(f"AVG({c}) AS {c}, MIN({c}) AS {c}_min, MAX({c}) AS {c}_max"
+                                       for c in columns)
+            else:
+                aggregates = ", ".join(
+                    f"SUM({c}_avg * samples) / SUM(CASE WHEN {c}_avg IS NOT NULL THEN samples END) "
+                    f"AS {c}, MIN({c}_min) AS {c}_min, MAX({c}_max) AS {c}_max"
+                    for c in columns)
+            query = f'''
+                SELECT (ts / {int(step_ms)}) * {int(step_ms)} AS ts, {aggregates}
+                FROM {table} WHERE ts >= ? AND ts < ?
+                GROUP BY (ts / {int(step_ms)}) ORDER BY 1
+            '''
+        with self._reader(dedicated) as conn:
+            cursor = conn.execute(query, (start_ms, end_ms))
+            names = [desc[0] for desc in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(names, row))
+    
+    def get_active_alerts(self) -> List[Dict]:
+        """Get active alerts"""
+        with self._reader() as conn:
+            cursor = conn.execute('SELECT * FROM alerts WHERE resolved = 0 ORDER BY ts DESC')
+            return self._rows_to_dicts(cursor)
+    
+    def outbox_add(self, batches: List[Tuple[str, Dict]], now_ms: int):
+        """Store (sink, batch) notifications, due immediately"""
+        with self._writer() as conn:
+            conn.executemany('''
+                INSERT INTO notification_outbox (sink, payload, created, next_attempt) VALUES (?, ?, ?, ?)
+            ''', [(sink, json.dumps(batch), now_ms, now_ms) for sink, batch in batches])
+    
+    def outbox_due(self, now_ms: int, limit: int = 50) -> List[Tuple[int, str, Dict, int]]:
+        """Pending (id, sink, batch, attempts) whose next attempt is due, oldest first"""
+        with self._reader() as conn:
+            rows = conn.execute('''
+                SELECT id, sink, payload, attempts FROM notification_outbox
+                WHERE state = 'pending' AND next_attempt <= ? ORDER BY id LIMIT ?
+            ''', (now_ms, limit)).fetchall()
+        return [(row_id, sink, json.loads(payload), attempts) for row_id, sink, payload, attempts in rows]
+    
+    def outbox_next_due(self) -> Optional[int]:
+        """Earliest next attempt of any pending notification"""
+        with self._reader() as conn:
+            row = conn.execute("SELECT MIN(next_attempt) FROM notification_outbox WHERE state = 'pending'").fetchone()
+        return row[0]
+    
+    def outbox_retry(self, row_id: int, attempts: int, next_attempt: int, error: str, failed: bool):
+        """Reschedule a failed delivery, or give up on it for good"""
+        with self._writer() as conn:
+            conn.execute('''
+                UPDATE notification_outbox SET attempts = ?, next_attempt = ?, last_error = ?, state = ?
+                WHERE id = ?
+            ''', (attempts, next_attempt, error, 'failed' if failed else 'pending', row_id))
+    
+    def outbox_done(self, row_id: int):
+        """Forget a delivered notification"""
+        with self._writer() as conn:
+            conn.execute('DELETE FROM notification_outbox WHERE id = ?', (row_id,))
+    
+    def get_alert_history(self, hours: float = 24, alert_id: Optional[str] = None) -> List[Dict]:
+        """Firing and resolved transitions from the last ``hours``, newest first"""
+        since = _to_epoch_ms(datetime.now() - timedelta(hours=hours))
+        query = 'SELECT alert_id, host, state, level, message, ts, value FROM alert_history WHERE ts >= ?'
+        params: list = [since]
+        if alert_id is not None:
+            query += ' AND alert_id = ?'
+            params.append(alert_id)
+        with self._reader() as conn:
+            cursor = conn.execute(query + ' ORDER BY ts DESC', params)
+            return self._rows_to_dicts(cursor)
+    
+    def write_fleet_batch(self, host: str, address: Optional[str], interval: Optional[float],
+                          columns: List[str], metrics: List[List[Any]], alerts: List[Dict[str, Any]],
+                          samples: List[Tuple[str, Dict[str, str], int, Optional[float]]]):
+        """Store one agent push in a single transaction
+
+        ``metrics`` rows are [ts, value per ``columns``] and only columns known
+        here are kept. Every write is idempotent, so a batch the agent resends
+        after a lost response leaves no duplicates.
+        """
+        now_ms = _to_epoch_ms(datetime.now())
+        known = [(i, c) for i, c in enumerate(columns) if c in METRIC_COLUMNS]
+        last_ts = max((row[0] for row in metrics), default=None)
+        with self._writer() as conn:
+            conn.execute('''
+                INSERT INTO hosts (name, address, interval, first_seen, last_seen, last_ts)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    address = excluded.address, interval = excluded.interval,
+                    last_seen = excluded.last_seen,
+                    last_ts = MAX(COALESCE(last_ts, 0), COALESCE(excluded.last_ts, 0))
+            ''', (host, address, interval, now_ms, now_ms, last_ts))
+            if metrics:
+                names = ", ".join(c for _, c in known)
+                conn.executemany(f'''
+                    INSERT OR REPLACE INTO fleet_metrics (host, ts{", " if known else ""}{names})
+                    VALUES ({", ".join("?" * (len(known) + 2))})
+                ''', [(host, row[0]) + tuple(row[i + 1] for i, _ in known) for row in metrics])
+            if samples:
+                try:
+                    conn.executemany('''
+                        INSERT OR REPLACE INTO fleet_samples (series_id, ts, value) VALUES (?, ?, ?)
+                    ''', [(self._series_id(conn, metric, _labels_key(dict(labels, host=host))), ts, value)
+                          for metric, labels, ts, value in samples])
+                except sqlite3.Error:
+                    self._series_cache.clear()
+                    raise
+            if alerts:
+                # A batch resent from the spool must not roll back a newer state
+                conn.executemany('''
+                    INSERT INTO fleet_alerts (host, id, level, message, ts, resolved, value)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (host, id) DO UPDATE SET
+                        level = excluded.level, message = excluded.message, ts = excluded.ts,
+                        resolved = excluded.resolved, value = excluded.value
+                    WHERE excluded.ts >= fleet_alerts.ts
+                ''', [(host, a['id'], a['level'], a['message'], a['ts'], int(a['resolved']), a['value'])
+                      for a in alerts])
+                conn.executemany('''
+                    INSERT INTO alert_history (alert_id, host, state, level, message, ts, value)
+                    SELECT ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (
+                        SELECT 1 FROM alert_history WHERE alert_id = ? AND ts = ? AND host = ?)
+                ''', [(a['id'], host, 'resolved' if a['resolved'] else 'firing', a['level'], a['message'],
+                       a['ts'], a['value'], a['id'], a['ts'], host) for a in alerts])
+    
+    def get_fleet_hosts(self) -> List[Dict]:
+        """Every host that has pushed, with its latest metric row and active alert count"""
+        with self._reader() as conn:
+            cursor = conn.execute(f'''
+                SELECT h.name AS host, h.address, h.interval, h.first_seen, h.last_seen, h.last_ts,
+                       {", ".join(f"m.{c}" for c in METRIC_COLUMNS)},
+                       (SELECT COUNT(*) FROM fleet_alerts a WHERE a.host = h.name AND a.resolved = 0)
+                           AS alerts
+                FROM hosts h LEFT JOIN fleet_metrics m ON m.host = h.name AND m.ts = h.last_ts
+                ORDER BY h.name
+            ''')
+            names = [desc[0] for desc in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+    
+    def get_fleet_alerts(self, host: Optional[str] = None) -> List[Dict]:
+        """Active alerts pushed by agents (optionally one host), newest first"""
+        query = 'SELECT host, id, level, message, ts, value FROM fleet_alerts WHERE resolved = 0'
+        params: list = []
+        if host is not None:
+            query += ' AND host = ?'
+            params.append(host)
+        with self._reader() as conn:
+            cursor = conn.execute(query + ' ORDER BY ts DESC', params)
+            return self._rows_to_dicts(cursor)
+    
+    def iter_fleet_metrics(self, host: str, start_ms: int, end_ms: int, step_ms: Optional[int] = None,
+                           columns: Optional[List[str]] = None, chunk_size: int = 1000,
+                           dedicated: bool = False):
+        """Stream one host's pushed rows in [start_ms, end_ms), oldest first
+
+        With ``step_ms`` rows are bucketed into avg/min/max per column.
+        """
+        columns = list(columns or METRIC_COLUMNS)
+        if not step_ms:
+            query = f'''
+                SELECT ts, {", ".join(columns)} FROM fleet_metrics
+                WHERE host = ? AND ts >= ? AND ts < ? ORDER BY ts
+            '''
+        else:
+            aggregates = ", ".join(f"AVG({c}) AS {c}, MIN({c}) AS {c}_min, MAX({c}) AS {c}_max"
+                                   for c in columns)
+            query = f'''
+                SELECT (ts / {int(step_ms)}) * {int(step_ms)} AS ts, {aggregates}
+                FROM fleet_metrics WHERE host = ? AND ts >= ? AND ts < ?
+                GROUP BY (ts / {int(step_ms)}) ORDER BY 1
+            '''
+        with self._reader(dedicated) as conn:
+            cursor = conn.execute(query, (host, start_ms, end_ms))
+            names = [desc[0] for desc in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(names, row))
+
+class BatchWriter:
+    """Buffered background writer for metrics and alerts
+
+    Metrics, samples and alerts are queued in memory and committed by a flusher thread
+    in one transaction every ``batch_size`` rows or ``flush_interval`` seconds,
+    so a slow disk never stalls the sampling thread. When the queue is full the
+    ``drop_policy`` decides what happens: "drop_oldest", "drop_newest" or
+    "block". With ``forward`` set, each drained batch is also handed to it
+    (a PushClient shipping it to a collector).
+    """
+    
+    DROP_POLICIES = ("drop_oldest", "drop_newest", "block")
+    
+    def __init__(self, db_manager: DatabaseManager, max_queue: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 5.0,
+                 drop_policy: str = "drop_oldest", forward: Optional["PushClient"] = None):
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.db = db_manager
+        self.forward = forward
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        self.failed_flushes = 0
+        self._pending: List[tuple] = []
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def insert_metrics(self, metrics: SystemMetrics):
+        """Queue system metrics for the next flush"""
+        self._put(("metrics", metrics))
+    
+    def insert_alert(self, alert: Alert):
+        """Queue an alert for the next flush"""
+        self._put(("alert", alert))
+    
+    def insert_samples(self, samples: List["Sample"]):
+        """Queue collector samples for the next flush"""
+        self._put(("samples", samples))
+    
+    def _put(self, item: tuple):
+        if self.drop_policy == "block":
+            self.queue.put(item)
+            return
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        if self.drop_policy == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                pass
+        self.dropped += 1
+    
+    def _drain(self, limit: int) -> List[tuple]:
+        items = []
+        while len(items) < limit:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+    
+    @staticmethod
+    def _split(items: List[tuple]) -> Tuple[List[SystemMetrics], List[Alert], List["Sample"]]:
+        metrics = [obj for kind, obj in items if kind == "metrics"]
+        # Alerts are queued on transitions only; keep them all, in order, for the history
+        alerts = [obj for kind, obj in items if kind == "alert"]
+        samples = [sample for kind, obj in items if kind == "samples" for sample in obj]
+        return metrics, alerts, samples
+    
+    def flush(self) -> int:
+        """Commit everything currently queued; returns rows written"""
+        with self._flush_lock:
+            fresh = self._drain(self.queue.maxsize or 1 << 30)
+            if fresh and self.forward is not None:
+                # Only fresh items: a batch retried below was forwarded the first time
+                try:
+                    self.forward.submit(*self._split(fresh))
+                except Exception:
+                    pass  # Silent operation
+            items = self._pending + fresh
+            self._pending = []
+            if not items:
+                return 0
+            metrics, alerts, samples = self._split(items)
+            try:
+                self.db.write_batch(metrics, alerts, samples)
+            except ChunkWriteError as e:
+                # Alerts and samples are committed; only the metrics are retried
+                self._retry_later([("metrics", m) for m in e.metrics])
+                self.written += len(items) - len(e.metrics)
+                return len(items) - len(e.metrics)
+            except Exception:
+                self._retry_later(items)
+                return 0
+            self.written += len(items)
+            return len(items)
+    
+    def _retry_later(self, items: List[tuple]):
+        """Keep a failed batch for the next attempt, bounded by the queue size"""
+        self.failed_flushes += 1
+        limit = self.queue.maxsize or len(items)
+        if len(items) > limit:
+            self.dropped += len(items) - limit
+            items = items[-limit:]
+        self._pending = items
+    
+    def _run(self):
+        """Flusher loop"""
+        while not self._stop_event.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            while not self._stop_event.is_set():
+                if self.queue.qsize() >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._stop_event.wait(min(remaining, 0.1))
+            try:
+                self.flush()
+            except Exception:
+                pass  # Silent operation
+    
+    def start(self):
+        """Start the background flusher thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 10.0):
+        """Stop the flusher and write out anything still queued"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+class RetentionEngine:
+    """Background rollup and pruning of stored metrics
+
+    Work is split into small batches, each in its own short transaction with
+    a pause in between, so the batch writer never waits long for the lock.
+    """
+    
+    def __init__(self, db_manager: DatabaseManager, interval: float = 60.0,
+                 batch_size: int = 1000, max_buckets: int = 60, pause: float = 0.05):
+        self.db = db_manager
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_buckets = max_buckets
+        self.pause = pause
+        self.running = False
+        self.last_run: Optional[float] = None
+    
+    def run_once(self, now_ms: Optional[int] = None, interruptible: bool = False):
+        """Roll up every settled bucket, then prune expired rows
+
+        An interruptible run gives up between batches once ``running`` is
+        cleared; direct calls always finish.
+        """
+        now_ms = now_ms or _to_epoch_ms(datetime.now())
+        for tier, _, _ in ROLLUP_TIERS:
+            while self.db.rollup_step(tier, now_ms, self.max_buckets):
+                if not self._pause(interruptible):
+                    return
+        
+        for tier in ['raw'] + [tier for tier, _, _ in ROLLUP_TIERS] + ['fleet']:
+            keep = self.db.retention.keep_ms(tier)
+            if keep is None:
+                continue
+            while self.db.prune_step(tier, now_ms - keep, self.batch_size) >= self.batch_size:
+                if not self._pause(interruptible):
+                    return
+        self.last_run = time.time()
+    
+    def _pause(self, interruptible: bool) -> bool:
+        time.sleep(self.pause)
+        return self.running or not interruptible
+    
+    def retention_loop(self):
+        """Periodic retention loop"""
+        while self.running:
+            try:
+                self.run_once(interruptible=True)
+            except:
+                pass  # Silent operation
+            
+            deadline = time.monotonic() + self.interval
+            while self.running and time.monotonic() < deadline:
+                time.sleep(min(1.0, self.interval))
+
+class EventBus:
+    """In-process publish/subscribe for live dashboard updates
+
+    Every subscriber gets its own bounded queue; a slow client loses its
+    oldest events instead of blocking the publisher.
+    """
+    
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers: List["queue.Queue[tuple]"] = []
+        self._lock = threading.Lock()
+    
+    def subscribe(self) -> "queue.Queue[tuple]":
+        q: "queue.Queue[tuple]" = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+    
+    def unsubscribe(self, q: "queue.Queue[tuple]"):
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+    
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+    
+    def publish(self, event: str, data: Any):
+        """Deliver ``(event, data)`` to every subscriber without blocking"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait((event, data))
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    q.put_nowait((event, data))
+                except (queue.Empty, queue.Full):
+                    pass
+
+def _parse_duration(value: Any) -> float:
+    """Seconds from a number or a string like '30s', '5m', '1h' or '1d'"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    value = str(value).strip()
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+class RollingWindow:
+    """Samples of one series from the last ``window_ms``
+
+    Subclasses keep their aggregate up to date in ``_push``/``_pop``, so
+    adding a sample or expiring old ones costs O(1) amortized and reading the
+    value never rescans the window.
+    """
+    
+    def __init__(self, window_ms: int):
+        self.window_ms = window_ms
+        self.entries: "deque[Tuple[int, float]]" = deque()
+    
+    def add(self, ts: int, value: float):
+        if self.entries and ts <= self.entries[-1][0]:
+            return  # Out of order or duplicate
+        self.entries.append((ts, value))
+        self._push(ts, value)
+        self.expire(ts)
+    
+    def expire(self, now_ms: int):
+        cutoff = now_ms - self.window_ms
+        while self.entries and self.entries[0][0] <= cutoff:
+            self._pop(*self.entries.popleft())
+    
+    def _push(self, ts: int, value: float):
+        pass
+    
+    def _pop(self, ts: int, value: float):
+        pass
+    
+    def value(self) -> Optional[float]:
+        """Most recent value"""
+        return self.entries[-1][1] if self.entries else None
+
+class AvgWindow(RollingWindow):
+    """Mean over the window from a running sum"""
+    
+    def __init__(self, window_ms: int):
+        super().__init__(window_ms)
+        self.total = 0.0
+    
+    def _push(self, ts, value):
+        self.total += value
+    
+    def _pop(self, ts, value):
+        self.total -= value
+    
+    def value(self):
+        return self.total / len(self.entries) if self.entries else None
+
+class ExtremeWindow(RollingWindow):
+    """Max (or min) over the window from a monotonic deque"""
+    
+    def __init__(self, window_ms: int, maximum: bool = True):
+        super().__init__(window_ms)
+        self.sign = 1 if maximum else -1
+        self.candidates: "deque[Tuple[int, float]]" = deque()
+    
+    def _push(self, ts, value):
+        # Older samples that can never be the extreme again are dropped for good
+        while self.candidates and self.sign * self.candidates[-1][1] <= self.sign * value:
+            self.candidates.pop()
+        self.candidates.append((ts, value))
+    
+    def _pop(self, ts, value):
+        if self.candidates and self.candidates[0][0] == ts:
+            self.candidates.popleft()
+    
+    def value(self):
+        return self.candidates[0][1] if self.candidates else None
+
+class QuantileWindow(RollingWindow):
+    """Approximate quantile over the window from log-spaced buckets
+
+    Values land in buckets whose bounds grow by ``gamma``, giving a relative
+    error of ``accuracy``; counts are updated in O(1) and a read walks only
+    the occupied buckets. Values <= 0 are counted as 0.
+    """
+    
+    def __init__(self, window_ms: int, quantile: float, accuracy: float = 0.01):
+        super().__init__(window_ms)
+        self.quantile = quantile
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.counts: Dict[Optional[int], int] = {}
+    
+    def _bucket(self, value: float) -> Optional[int]:
+        return math.ceil(math.log(value) / self._log_gamma) if value > 0 else None
+    
+    def _push(self, ts, value):
+        key = self._bucket(value)
+        self.counts[key] = self.counts.get(key, 0) + 1
+    
+    def _pop(self, ts, value):
+        key = self._bucket(value)
+        self.counts[key] -= 1
+        if not self.counts[key]:
+            del self.counts[key]
+    
+    def value(self):
+        if not self.entries:
+            return None
+        rank = self.quantile * (len(self.entries) - 1)
+        seen = self.counts.get(None, 0)
+        if rank < seen:
+            return 0.0
+        for key in sorted(k for k in self.counts if k is not None):
+            seen += self.counts[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return self.entries[-1][1]
+
+class RateWindow(RollingWindow):
+    """Change per second between the oldest and newest sample in the window"""
+    
+    def value(self):
+        if len(self.entries) < 2:
+            return None
+        (t0, v0), (t1, v1) = self.entries[0], self.entries[-1]
+        return (v1 - v0) * 1000 / (t1 - t0)
+
+@dataclass
+class AlertRule:
+    """A declarative alert: ``function(metric over window) op threshold``
+
+    ``function`` is one of last, avg, min, max, pNN (e.g. p95), rate (change
+    per second) or absent (seconds since the series last reported). One alert
+    is raised per matching series; ``id`` and ``message`` are format strings
+    over the series labels plus ``name``, ``value`` and ``threshold``.
+    """
+    name: str
+    metric: str
+    threshold: float
+    function: str = "last"
+    window: float = 300.0  # seconds
+    op: str = ">"  # ">" or "<"
+    clear: Optional[float] = None  # resolve threshold (hysteresis), default: threshold
+    for_seconds: float = 0.0
+    level: str = "WARNING"
+    message: str = "{name}: {value:.1f}"
+    id: str = "{name}"
+    labels: Dict[str, str] = field(default_factory=dict)  # required label values
+    exclude: Dict[str, List[str]] = field(default_factory=dict)  # label values to skip
+    
+    FUNCTIONS = ("last", "avg", "min", "max", "rate", "absent")
+    
+    def __post_init__(self):
+        if self.function not in self.FUNCTIONS and not re.fullmatch(r"p\d{1,2}(\.\d+)?", self.function):
+            raise ValueError(f"Unknown function in rule {self.name}: {self.function}")
+        if self.op not in (">", "<"):
+            raise ValueError(f"Unknown operator in rule {self.name}: {self.op}")
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AlertRule":
+        """Build a rule from its config form ('for' and durations like '5m' allowed)"""
+        data = dict(data)
+        if 'for' in data:
+            data['for_seconds'] = data.pop('for')
+        for key in ('window', 'for_seconds'):
+            if key in data:
+                data[key] = _parse_duration(data[key])
+        data['threshold'] = float(data['threshold'])
+        if data.get('clear') is not None:
+            data['clear'] = float(data['clear'])
+        return cls(**data)
+    
+    def matches(self, labels: Dict[str, str]) -> bool:
+        return (all(labels.get(k) == v for k, v in self.labels.items())
+                and not any(labels.get(k) in values for k, values in self.exclude.items()))
+    
+    def breached(self, value: Optional[float], firing: bool) -> bool:
+        """Whether ``value`` violates the rule; firing alerts are held until ``clear``"""
+        if value is None:
+            return False
+        limit = self.clear if firing and self.clear is not None else self.threshold
+        return value > limit if self.op == ">" else value < limit
+    
+    def new_window(self) -> RollingWindow:
+        window_ms = int(self.window * 1000)
+        if self.function == "avg":
+            return AvgWindow(window_ms)
+        if self.function in ("min", "max"):
+            return ExtremeWindow(window_ms, self.function == "max")
+        if self.function == "rate":
+            return RateWindow(window_ms)
+        if self.function.startswith("p"):
+            return QuantileWindow(window_ms, float(self.function[1:]) / 100)
+        return RollingWindow(window_ms)
+    
+    def format(self, template: str, labels: Dict[str, str], value: Optional[float]) -> str:
+        """Fill ``template`` with the labels, name, value and threshold"""
+        try:
+            return template.format_map({**labels, 'name': self.name, 'value': value,
+                                        'threshold': self.threshold})
+        except (KeyError, ValueError, IndexError, TypeError):
+            return f"{self.name}: {value}"
+
+# Used when no rule file exists. Windows smooth out short spikes, and the 'for'
+# durations cover startup, when a window holds only a few samples
+DEFAULT_ALERT_RULES = [
+    {"name": "cpu_high", "metric": "cpu_percent", "function": "avg", "window": "5m",
+     "threshold": 80, "clear": 70, "for": "1m", "level": "WARNING",
+     "message": "High CPU usage: {value:.1f}% (5m average)"},
+    {"name": "memory_high", "metric": "memory_percent", "function": "avg", "window": "5m",
+     "threshold": 85, "clear": 80, "for": "1m", "level": "CRITICAL",
+     "message": "High memory usage: {value:.1f}% (5m average)"},
+    {"name": "disk_high", "metric": "disk_usage", "threshold": 90, "clear": 88, "level": "CRITICAL",
+     "message": "High disk usage: {value:.1f}%"},
+    # Per-mount disk alerts (the system disk is covered above)
+    {"name": "disk_high", "metric": "disk_mount_usage_percent", "threshold": 90, "clear": 88,
+     "level": "CRITICAL", "id": "disk_high:{mountpoint}", "exclude": {"mountpoint": ["/", "C:\\"]},
+     "message": "High disk usage on {mountpoint}: {value:.1f}%"},
+    {"name": "disk_busy", "metric": "disk_busy_percent", "function": "avg", "window": "5m",
+     "threshold": 90, "clear": 80, "for": "1m", "level": "WARNING", "id": "disk_busy:{device}",
+     "message": "Disk {device} saturated: {value:.1f}% busy (5m average)"},
+    {"name": "temperature_high", "metric": "temperature", "function": "max", "window": "1m",
+     "threshold": 70, "clear": 65, "for": "30s", "level": "WARNING",
+     "message": "High temperature: {value:.1f}°C"},
+    {"name": "cpu_samples_missing", "metric": "cpu_percent", "function": "absent", "window": "2m",
+     "threshold": 120, "level": "WARNING",
+     "message": "No CPU samples for {value:.0f}s; collection may be stalled"},
+]
+
+# Rule file looked up in the working directory
+ALERT_RULES_FILE = "alert_rules.json"
+
+class RuleEngine:
+    """Evaluates alert rules incrementally over per-series rolling windows
+
+    Samples are pushed in as collectors produce them, so an evaluation only
+    reads each window's running aggregate and never queries the database.
+    """
+    
+    def __init__(self, rules: List[AlertRule]):
+        self.rules = rules
+        self._by_metric: Dict[str, List[int]] = {}
+        for index, rule in enumerate(rules):
+            self._by_metric.setdefault(rule.metric, []).append(index)
+        # (rule index, labels key) -> (labels, window)
+        self._windows: Dict[Tuple[int, str], Tuple[Dict[str, str], RollingWindow]] = {}
+        self._started_ms = _to_epoch_ms(datetime.now())
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_file(cls, path: str) -> "RuleEngine":
+        """Load ``{"rules": [...]}`` (or a bare list) from a JSON file"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        rules = data['rules'] if isinstance(data, dict) else data
+        return cls([AlertRule.from_dict(rule) for rule in rules])
+    
+    @classmethod
+    def default(cls) -> "RuleEngine":
+        return cls([AlertRule.from_dict(rule) for rule in DEFAULT_ALERT_RULES])
+    
+    def observe(self, samples: List["Sample"]):
+        """Feed collector samples into every matching rule window"""
+        with self._lock:
+            for sample in samples:
+                if sample.value is None:
+                    continue
+                for index in self._by_metric.get(sample.metric, ()):
+                    rule = self.rules[index]
+                    if not rule.matches(sample.labels):
+                        continue
+                    key = (index, _labels_key(sample.labels))
+                    entry = self._windows.get(key)
+                    if entry is None:
+                        entry = self._windows[key] = (dict(sample.labels), rule.new_window())
+                    entry[1].add(sample.ts, float(sample.value))
+    
+    def evaluate(self, now_ms: int) -> List[Tuple[str, AlertRule, Dict[str, str], Optional[float]]]:
+        """Current ``(alert id, rule, labels, value)`` of every series with data"""
+        results = []
+        with self._lock:
+            absent_seen = set()
+            for key, (labels, window) in list(self._windows.items()):
+                rule = self.rules[key[0]]
+                if rule.function == "absent":
+                    absent_seen.add(key[0])
+                    last = window.entries[-1][0]
+                    results.append((rule.format(rule.id, labels, None), rule, labels, (now_ms - last) / 1000))
+                    continue
+                window.expire(now_ms)
+                value = window.value()
+                if value is None:
+                    # Series went quiet; its alerts resolve as no longer reported
+                    del self._windows[key]
+                    continue
+                results.append((rule.format(rule.id, labels, value), rule, labels, value))
+            
+            # Absent rules whose metric never reported since startup
+            for index, rule in enumerate(self.rules):
+                if rule.function == "absent" and index not in absent_seen:
+                    results.append((rule.format(rule.id, {}, None), rule, {},
+                                    (now_ms - self._started_ms) / 1000))
+        return results
+
+class SeriesBaseline:
+    """Online statistics of one series in constant memory
+
+    An EWMA mean and variance follow recent behaviour; a second, slower EWMA
+    per hour-of-week slot remembers what is normal for this time of week.
+    """
+    
+    __slots__ = ('labels', 'count', 'mean', 'var', 'season_count', 'season_mean', 'season_var',
+                 'season_week', 'last_ts', 'last_value', 'last_z', 'last_baseline')
+    
+    SLOTS = 168  # hours in a week
+    
+    def __init__(self, labels: Dict[str, str]):
+        self.labels = labels
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.season_count = array('q', [0]) * self.SLOTS
+        self.season_mean = array('d', [0.0]) * self.SLOTS
+        self.season_var = array('d', [0.0]) * self.SLOTS
+        self.season_week = array('q', [-1]) * self.SLOTS  # week first seen, -1 for never
+        self.last_ts = 0
+        self.last_value: Optional[float] = None
+        self.last_z: Optional[float] = None
+        self.last_baseline: Optional[float] = None
+
+class AnomalyDetector:
+    """Streaming z-score anomaly detection on collector samples
+
+    Every sample of a tracked metric is scored against its series baseline
+    and then learned, in O(1) time and constant memory per series. The
+    baseline is the hour-of-week slot once that slot has data from an
+    earlier week (so gradual regressions stand out against last week), and
+    the recent EWMA before that. Deviations beyond ``z_threshold`` feed the
+    alert state machine; they resolve below ``clear_z``.
+    """
+    
+    DEFAULT_METRICS = ('cpu_percent', 'memory_percent', 'processes_count', 'network_sent_rate',
+                       'network_recv_rate', 'disk_read_rate', 'disk_write_rate')
+    
+    def __init__(self, metrics: Tuple[str, ...] = DEFAULT_METRICS, z_threshold: float = 4.0,
+                 clear_z: float = 3.0, halflife: float = 60, season_halflife: float = 720,
+                 warmup: int = 30, for_seconds: float = 60.0, stale_seconds: float = 300.0,
+                 min_std: Optional[Dict[str, float]] = None, relative_std: float = 0.05,
+                 level: str = "WARNING"):
+        self.metrics = frozenset(metrics)
+        self.z_threshold = z_threshold
+        self.clear_z = clear_z
+        # Half-lives are in samples: ~10 minutes recent, ~2 hours of each slot at 10s
+        self.alpha = 1 - 0.5 ** (1 / halflife)
+        self.season_alpha = 1 - 0.5 ** (1 / season_halflife)
+        self.warmup = warmup
+        self.for_seconds = for_seconds
+        self.stale_ms = int(stale_seconds * 1000)
+        # Noise floors, so near-constant series do not turn tiny wiggles into huge z-scores
+        self.min_std = {'cpu_percent': 2.0, 'memory_percent': 1.0, 'processes_count': 5.0}
+        self.min_std.update(min_std or {})
+        self.relative_std = relative_std
+        self.level = level
+        self._utc_offset_ms = int(datetime.now().astimezone().utcoffset().total_seconds() * 1000)
+        self._series: Dict[Tuple[str, str], SeriesBaseline] = {}
+        self._lock = threading.Lock()
+    
+    def _slot(self, ts_ms: int) -> Tuple[int, int]:
+        """(hour-of-week slot with Monday 00h = 0, week number) in local time"""
+        hours = (ts_ms + self._utc_offset_ms) // 3_600_000
+        # The epoch fell on a Thursday, 72 hours after a Monday
+        return (hours + 72) % SeriesBaseline.SLOTS, (hours + 72) // SeriesBaseline.SLOTS
+    
+    @staticmethod
+    def _ewma(mean: float, var: float, value: float, alpha: float,
+              count: Optional[int] = None) -> Tuple[float, float]:
+        """One EWMA mean/variance step; a plain running mean until ``count`` reaches 1/alpha"""
+        if count is not None:
+            alpha = max(alpha, 1 / count)
+        diff = value - mean
+        increment = alpha * diff
+        return mean + increment, (1 - alpha) * (var + diff * increment)
+    
+    def _score(self, metric: str, stats: SeriesBaseline, value: float, slot: int,
+               week: int) -> Tuple[Optional[float], Optional[float], float]:
+        """(z-score, baseline mean, baseline std) of ``value``; z is None while warming up"""
+        if stats.count < self.warmup:
+            return None, None, 0.0
+        if 0 <= stats.season_week[slot] < week:
+            mean, var = stats.season_mean[slot], stats.season_var[slot]
+        else:
+            mean, var = stats.mean, stats.var
+        std = max(math.sqrt(var), self.min_std.get(metric, 0.0), self.relative_std * abs(mean), 1e-9)
+        return (value - mean) / std, mean, std
+    
+    def _learn(self, stats: SeriesBaseline, value: float, slot: int, week: int,
+               clipped: Optional[float] = None):
+        """Fold ``value`` into the baselines
+
+        An outlier is learned as ``clipped`` (limited to the threshold), at the
+        plain half-life and without widening the variance, so a spike cannot
+        hide itself while a lasting shift is adopted gradually. A slot with no
+        earlier week was not what the value was scored against and learns it
+        as is.
+        """
+        stats.count += 1
+        if clipped is None:
+            stats.mean, stats.var = self._ewma(stats.mean, stats.var, value, self.alpha, stats.count)
+        else:
+            stats.mean = self._ewma(stats.mean, stats.var, clipped, self.alpha)[0]
+        stats.season_count[slot] += 1
+        if clipped is None or not 0 <= stats.season_week[slot] < week:
+            stats.season_mean[slot], stats.season_var[slot] = self._ewma(
+                stats.season_mean[slot], stats.season_var[slot], value, self.season_alpha,
+                stats.season_count[slot])
+        else:
+            stats.season_mean[slot] = self._ewma(stats.season_mean[slot], stats.season_var[slot], clipped,
+                                                 self.season_alpha)[0]
+        if stats.season_week[slot] < 0:
+            stats.season_week[slot] = week
+    
+    def _stats(self, metric: str, labels: Dict[str, str]) -> SeriesBaseline:
+        key = (metric, _labels_key(labels))
+        stats = self._series.get(key)
+        if stats is None:
+            stats = self._series[key] = SeriesBaseline(dict(labels))
+        return stats
+    
+    def observe(self, samples: List["Sample"]):
+        """Score, then learn, every tracked sample; ``evaluate`` reports the latest scores"""
+        with self._lock:
+            for sample in samples:
+                if sample.metric not in self.metrics or sample.value is None:
+                    continue
+                value = float(sample.value)
+                if math.isnan(value):
+                    continue
+                stats = self._stats(sample.metric, sample.labels)
+                slot, week = self._slot(sample.ts)
+                z, baseline, std = self._score(sample.metric, stats, value, slot, week)
+                if z is not None and abs(z) > self.z_threshold:
+                    self._learn(stats, value, slot, week, baseline + math.copysign(self.z_threshold * std, z))
+                else:
+                    self._learn(stats, value, slot, week)
+                stats.last_ts, stats.last_value, stats.last_z, stats.last_baseline = sample.ts, value, z, baseline
+    
+    def _alert(self, metric: str, stats: SeriesBaseline) -> Alert:
+        suffix = ",".join(f"{k}={v}" for k, v in sorted(stats.labels.items()))
+        name = f"{metric}{{{suffix}}}" if suffix else metric
+        return Alert(
+            id=f"anomaly:{name}",
+            level=self.level,
+            message=(f"Unusual {name}: {stats.last_value:.1f} vs baseline "
+                     f"{stats.last_baseline:.1f} (z={stats.last_z:+.1f})"),
+            timestamp=_from_epoch_ms(stats.last_ts),
+            value=stats.last_value
+        )
+    
+    def evaluate(self, now_ms: int) -> List[Tuple[Alert, float]]:
+        """Latest ``(alert, z)`` of every series scored within ``stale_seconds``"""
+        with self._lock:
+            return [(self._alert(metric, stats), stats.last_z)
+                    for (metric, _), stats in self._series.items()
+                    if stats.last_z is not None and now_ms - stats.last_ts <= self.stale_ms]
+    
+    def backfill(self, db_manager: DatabaseManager, hours: float = 48):
+        """Seed baselines from stored samples, vectorised with NumPy when available"""
+        for metric in self.metrics:
+            for labels_key, (ts, values) in db_manager.get_sample_history(metric, hours).items():
+                labels = json.loads(labels_key) if labels_key else {}
+                with self._lock:
+                    stats = self._stats(metric, labels)
+                    if np.available():
+                        self._backfill_vectorised(stats, ts, values)
+                        continue
+                    for t, value in zip(ts, values):
+                        if value is not None:
+                            self._learn(stats, float(value), *self._slot(t))
+    
+    def _backfill_vectorised(self, stats: SeriesBaseline, ts: List[int], values: List[Optional[float]]):
+        x = np.array(values, dtype=float)
+        t = np.array(ts, dtype=np.int64)
+        keep = ~np.isnan(x)
+        x, t = x[keep], t[keep]
+        if not len(x):
+            return
+        stats.mean, stats.var = self._weighted_stats(x, self.alpha)
+        stats.count += len(x)
+        hours = (t + self._utc_offset_ms) // 3_600_000 + 72
+        slots = hours % SeriesBaseline.SLOTS
+        weeks = hours // SeriesBaseline.SLOTS
+        for slot in np.unique(slots):
+            in_slot = slots == slot
+            stats.season_mean[slot], stats.season_var[slot] = self._weighted_stats(x[in_slot], self.season_alpha)
+            stats.season_count[slot] += int(in_slot.sum())
+            stats.season_week[slot] = int(weeks[in_slot].min())
+    
+    @staticmethod
+    def _weighted_stats(x: "np.ndarray", alpha: float) -> Tuple[float, float]:
+        """Exponentially weighted mean and variance, newest values weighted most
+
+        Equivalent to running ``_ewma`` over ``x`` (to within the first 1/alpha samples).
+        """
+        weights = (1 - alpha) ** np.arange(len(x) - 1, -1, -1, dtype=float)
+        total = weights.sum()
+        mean = float(weights @ x / total)
+        return mean, float(weights @ (x - mean) ** 2 / total)
+
+class NotificationSink(abc.ABC):
+    """Base class for notification destinations
+
+    ``send`` delivers one batch of alert transitions and raises on failure;
+    the dispatcher takes care of batching, retries and persistence.
+    """
+    
+    type = ""
+    
+    def __init__(self, name: Optional[str] = None):
+        self.name = name or self.type
+    
+    @abc.abstractmethod
+    def send(self, batch: Dict[str, Any]):
+        """Deliver one batch; raise to have it retried"""
+    
+    @staticmethod
+    def summary(batch: Dict[str, Any]) -> str:
+        """One-line description of a batch"""
+        firing = sum(1 for n in batch['alerts'] if n['state'] == 'firing')
+        flapped = sum(1 for n in batch['alerts'] if n.get('fired_at'))
+        return (f"[{batch['host']}] {len(batch['alerts'])} alert(s): "
+                f"{firing} firing, {len(batch['alerts']) - firing} resolved"
+                + (f" ({flapped} fired and resolved)" if flapped else ""))
+    
+    @staticmethod
+    def text(batch: Dict[str, Any]) -> str:
+        """Plain-text body of a batch, one line per alert"""
+        return "\n".join(f"{n['timestamp']} {n['state'].upper()} {n['level']} {n['id']}: {n['message']}"
+                         + (f" (fired {n['fired_at']})" if n.get('fired_at') else "")
+                         for n in batch['alerts'])
+
+class WebhookSink(NotificationSink):
+    """POSTs the batch as JSON"""
+    
+    type = "webhook"
+    
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 10.0,
+                 name: Optional[str] = None):
+        super().__init__(name)
+        self.url = url
+        self.headers = headers or {}
+        self.timeout = timeout
+    
+    def send(self, batch):
+        request = urllib.request.Request(
+            self.url, data=json.dumps(batch).encode('utf-8'), method='POST',
+            headers={'Content-Type': 'application/json', **self.headers})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+class SmtpSink(NotificationSink):
+    """Sends the batch as one plain-text email"""
+    
+    type = "smtp"
+    
+    def __init__(self, host: str, sender: str, recipients: List[str], port: int = 25,
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 starttls: bool = False, timeout: float = 10.0, name: Optional[str] = None):
+        super().__init__(name)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+    
+    def send(self, batch):
+        message = EmailMessage()
+        message['Subject'] = self.summary(batch)
+        message['From'] = self.sender
+        message['To'] = ", ".join(self.recipients)
+        message.set_content(self.text(batch))
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or "")
+            smtp.send_message(message)
+
+class FileSink(NotificationSink):
+    """Appends the batch to a JSON-lines file"""
+    
+    type = "file"
+    
+    def __init__(self, path: str, name: Optional[str] = None):
+        super().__init__(name)
+        self.path = path
+    
+    def send(self, batch):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(batch) + "\n")
+
+class CommandSink(NotificationSink):
+    """Runs a command with the batch as JSON on stdin; a non-zero exit is a failure"""
+    
+    type = "command"
+    
+    def __init__(self, command: List[str], timeout: float = 30.0, name: Optional[str] = None):
+        super().__init__(name)
+        self.command = command
+        self.timeout = timeout
+    
+    def send(self, batch):
+        subprocess.run(self.command, input=json.dumps(batch).encode('utf-8'), timeout=self.timeout,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+NOTIFICATION_SINKS = {cls.type: cls for cls in (WebhookSink, SmtpSink, FileSink, CommandSink)}
+
+# Notification config looked up in the working directory
+NOTIFICATIONS_FILE = "notifications.json"
+
+class NotificationDispatcher:
+    """Delivers alert transitions to sinks without ever blocking the caller
+
+    ``notify`` only enqueues. A worker thread gathers transitions for
+    ``batch_window`` seconds (one entry per alert id with its latest state,
+    so a storm becomes one message per sink; an alert that fired and
+    resolved within the window carries ``fired_at``), stores each sink's batch in the
+    notification_outbox table and then delivers it. Failures are retried
+    with jittered exponential backoff up to ``max_attempts``; undelivered
+    batches survive restarts in the outbox.
+    """
+    
+    def __init__(self, db_manager: DatabaseManager, sinks: List[NotificationSink],
+                 batch_window: float = 10.0, max_batch: int = 100, max_queue: int = 1000,
+                 max_attempts: int = 8, base_delay: float = 5.0, max_delay: float = 900.0):
+        self.db = db_manager
+        self.sinks = {sink.name: sink for sink in sinks}
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue: "queue.Queue[Alert]" = queue.Queue(maxsize=max_queue)
+        self.host = socket.gethostname()
+        self.dropped = 0
+        self.delivered = 0
+        self.failures = 0
+        self._next_due: Optional[int] = 0  # earliest outbox retry (epoch ms); 0 = check now
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @classmethod
+    def from_file(cls, db_manager: DatabaseManager, path: str = NOTIFICATIONS_FILE) -> "NotificationDispatcher":
+        """Build from ``{"sinks": [{"type": "webhook", "url": ...}, ...], "batch_window": ...}``"""
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        sinks = []
+        for spec in config.pop('sinks'):
+            spec = dict(spec)
+            sinks.append(NOTIFICATION_SINKS[spec.pop('type')](**spec))
+        return cls(db_manager, sinks, **config)
+    
+    def notify(self, alert: Alert):
+        """Queue a firing or resolved transition; drops the oldest when full"""
+        try:
+            self.queue.put_nowait(alert)
+        except queue.Full:
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+                self.queue.put_nowait(alert)
+            except (queue.Empty, queue.Full):
+                pass
+    
+    def start(self):
+        """Start the delivery thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 10.0):
+        """Stop delivering; anything still queued is saved to the outbox for the next run"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self._enqueue(self._drain(self.queue.qsize()))
+    
+    def _drain(self, limit: int) -> List[Alert]:
+        items = []
+        while len(items) < limit:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+    
+    def _enqueue(self, alerts: List[Alert]):
+        """Coalesce transitions into one outbox batch per sink"""
+        if not alerts or not self.sinks:
+            return
+        latest: Dict[str, Dict[str, Any]] = {}
+        for a in alerts:
+            entry = {'id': a.id, 'state': 'resolved' if a.resolved else 'firing', 'level': a.level,
+                     'message': a.message, 'timestamp': a.timestamp, 'value': a.value, 'transitions': 1}
+            previous = latest.get(a.id)
+            if previous is not None:
+                entry['transitions'] = previous['transitions'] + 1
+                # Fired and resolved within one window: the resolution alone would hide the incident
+                fired_at = previous.get('fired_at') or (
+                    previous['timestamp'] if previous['state'] == 'firing' else None)
+                if a.resolved and fired_at:
+                    entry['fired_at'] = fired_at
+            latest[a.id] = entry
+        batch = {'host': self.host, 'alerts': list(latest.values())}
+        self.db.outbox_add([(name, batch) for name in self.sinks], _to_epoch_ms(datetime.now()))
+        self._next_due = 0
+    
+    def _backoff(self, attempts: int) -> float:
+        """Seconds before retry number ``attempts``, with jitter against thundering herds"""
+        return min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+    
+    def deliver_due(self, now_ms: Optional[int] = None) -> int:
+        """Attempt every outbox batch that is due; returns how many were delivered"""
+        now_ms = _to_epoch_ms(datetime.now()) if now_ms is None else now_ms
+        delivered = 0
+        for row_id, sink_name, batch, attempts in self.db.outbox_due(now_ms):
+            sink = self.sinks.get(sink_name)
+            if sink is None:
+                continue  # Sink removed from the config; keep the batch for inspection
+            try:
+                sink.send(batch)
+            except Exception as e:
+                self.failures += 1
+                attempts += 1
+                self.db.outbox_retry(row_id, attempts, now_ms + int(self._backoff(attempts) * 1000),
+                                     f"{type(e).__name__}: {e}", attempts >= self.max_attempts)
+                continue
+            self.db.outbox_done(row_id)
+            delivered += 1
+        self.delivered += delivered
+        self._next_due = self.db.outbox_next_due()
+        return delivered
+    
+    def _run(self):
+        """Delivery loop: gather a batch window, persist it, deliver what is due"""
+        while not self._stop_event.is_set():
+            try:
+                first = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                first = None
+            alerts = []
+            if first is not None:
+                # Let the rest of a storm arrive before sending anything
+                self._stop_event.wait(self.batch_window)
+                alerts = [first] + self._drain(self.max_batch - 1)
+            self.process(alerts)
+    
+    def process(self, alerts: Optional[List[Alert]] = None):
+        """Persist queued transitions as one batch and deliver whatever is due"""
+        alerts = self._drain(self.max_batch) if alerts is None else alerts
+        if alerts:
+            try:
+                self._enqueue(alerts)
+            except:
+                pass  # Silent operation
+        # The outbox is only read when something is due, not on every pass
+        if self._next_due is not None and _to_epoch_ms(datetime.now()) >= self._next_due:
+            try:
+                self.deliver_due()
+            except:
+                pass  # Silent operation
+
+class PushClient:
+    """Ships snapshots, alert transitions and optionally samples to a collector
+
+    The batch writer hands over every batch it drains (``submit``) and
+    ``deliver``, a periodic runtime task, sends everything gathered since the
+    last push as one gzipped JSON POST to the collector's /api/push. While
+    the collector is unreachable payloads are written to ``spool_dir`` and
+    retries back off exponentially with jitter; once it answers again the
+    spool is resent oldest first, ``catchup`` files per pass, ahead of any
+    fresh payload. Payloads the collector refuses (400/413) are counted in
+    ``rejected`` and dropped. The spool is capped at ``max_spool_bytes`` by dropping the oldest files.
+    """
+    
+    SPOOL_SUFFIX = '.json.gz'
+    
+    def __init__(self, url: str, spool_dir: str, host: Optional[str] = None, token: Optional[str] = None,
+                 interval: float = 10.0, samples: bool = False, timeout: float = 10.0,
+                 max_spool_bytes: int = 64 << 20, max_pending: int = 20000, catchup: int = 10,
+                 max_delay: float = 300.0):
+        self.url = url
+        self.spool_dir = spool_dir
+        self.host = host or socket.gethostname()
+        self.token = token
+        self.interval = interval
+        self.samples = samples
+        self.timeout = timeout
+        self.max_spool_bytes = max_spool_bytes
+        self.max_pending = max_pending
+        self.catchup = catchup
+        self.max_delay = max_delay
+        self.sent = 0
+        self.failures = 0
+        self.rejected = 0  # payloads the collector refused; resending cannot help
+        self.dropped = 0  # spooled payloads dropped to stay under the cap
+        self.spooled_bytes = 0
+        self._lock = threading.Lock()
+        self._metrics: List[List[Any]] = []
+        self._alerts: List[Dict[str, Any]] = []
+        self._samples: List[List[Any]] = []
+        self._spool: "deque[Tuple[str, int]]" = deque()  # (file name, size), oldest first
+        self._seq = 0
+        self._attempts = 0
+        self._retry_at = 0.0
+        self._load_spool()
+    
+    def _load_spool(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        for name in sorted(os.listdir(self.spool_dir)):
+            path = os.path.join(self.spool_dir, name)
+            if name.endswith('.tmp'):
+                os.remove(path)  # Interrupted write
+            elif name.endswith(self.SPOOL_SUFFIX):
+                size = os.path.getsize(path)
+                self._spool.append((name, size))
+                self.spooled_bytes += size
+    
+    @property
+    def spooled(self) -> int:
+        return len(self._spool)
+    
+    def submit(self, metrics: List[SystemMetrics], alerts: List[Alert], samples: List["Sample"]):
+        """Add a drained writer batch to the next push"""
+        rows = [[_to_epoch_ms(m.timestamp)] + [getattr(m, c) for c in METRIC_COLUMNS] for m in metrics]
+        events = [{'id': a.id, 'level': a.level, 'message': a.message, 'ts': _to_epoch_ms(a.timestamp),
+                   'resolved': a.resolved, 'value': a.value} for a in alerts]
+        points = [[s.metric, s.labels, s.ts, s.value] for s in samples] if self.samples else []
+        with self._lock:
+            self._metrics += rows
+            self._alerts += events
+            self._samples += points
+            full = len(self._metrics) + len(self._samples) >= self.max_pending
+        if full:
+            # Nobody is delivering (or it is far behind); keep memory bounded
+            body = self._take()
+            if body is not None:
+                self._spool_write(body)
+    
+    def _take(self) -> Optional[bytes]:
+        """Everything gathered so far as one compressed payload"""
+        with self._lock:
+            if not (self._metrics or self._alerts or self._samples):
+                return None
+            payload = {'host': self.host, 'interval': self.interval, 'sent': _to_epoch_ms(datetime.now()),
+                       'columns': list(METRIC_COLUMNS), 'metrics': self._metrics,
+                       'alerts': self._alerts, 'samples': self._samples}
+            self._metrics, self._alerts, self._samples = [], [], []
+        return gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 6, mtime=0)
+    
+    def _spool_write(self, body: bytes):
+        with self._lock:
+            self._seq += 1
+            name = f"{_to_epoch_ms(datetime.now()):013d}-{self._seq:06d}{self.SPOOL_SUFFIX}"
+            path = os.path.join(self.spool_dir, name)
+            try:
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(body)
+                os.replace(path + '.tmp', path)
+            except OSError:
+                self.dropped += 1
+                return
+            self._spool.append((name, len(body)))
+            self.spooled_bytes += len(body)
+            while self.spooled_bytes > self.max_spool_bytes and len(self._spool) > 1:
+                self._forget(*self._spool.popleft())
+                self.dropped += 1
+    
+    def _forget(self, name: str, size: int):
+        self.spooled_bytes -= size
+        try:
+            os.remove(os.path.join(self.spool_dir, name))
+        except OSError:
+            pass
+    
+    def _post(self, body: bytes) -> str:
+        """Send one payload: "sent", "rejected" (drop it) or "failed" (keep it and retry)"""
+        headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        request = urllib.request.Request(self.url, data=body, method='POST', headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            if e.code in (400, 413):
+                self.rejected += 1
+                return 'rejected'
+            self._failed()
+            return 'failed'
+        except Exception:
+            self._failed()
+            return 'failed'
+        self._attempts = 0
+        self.sent += 1
+        return 'sent'
+    
+    def _failed(self):
+        self.failures += 1
+        self._attempts += 1
+        delay = min(self.max_delay, self.interval * 2 ** (self._attempts - 1))
+        self._retry_at = time.monotonic() + delay * random.uniform(0.5, 1.0)
+    
+    def deliver(self) -> int:
+        """Catch up on the spool, then push what was gathered; returns payloads sent
+
+        The fresh payload waits in the spool until everything older has gone
+        out, so the collector sees an agent's batches in the order they were
+        taken.
+        """
+        sent = 0
+        for _ in range(self.catchup):
+            if time.monotonic() < self._retry_at:
+                break
+            with self._lock:
+                if not self._spool:
+                    break
+                name, size = self._spool[0]
+            try:
+                with open(os.path.join(self.spool_dir, name), 'rb') as f:
+                    body = f.read()
+            except OSError:
+                body = None
+            if body is not None:
+                status = self._post(body)
+                if status == 'failed':
+                    break
+                sent += status == 'sent'
+            with self._lock:
+                # Unless the cap dropped it while it was being sent
+                if self._spool and self._spool[0][0] == name:
+                    self._forget(*self._spool.popleft())
+        body = self._take()
+        if body is not None:
+            with self._lock:
+                behind = bool(self._spool)
+            status = 'failed'
+            if not behind and time.monotonic() >= self._retry_at:
+                status = self._post(body)
+            if status == 'failed':
+                self._spool_write(body)
+            sent += status == 'sent'
+        return sent
+    
+    def stop(self):
+        """Spool whatever has not been pushed yet, for the next run"""
+        body = self._take()
+        if body is not None:
+            self._spool_write(body)
+
+@dataclass
+class AlertState:
+    """In-memory lifecycle of one alert id (resolved alerts are dropped)"""
+    id: str
+    level: str
+    message: str
+    state: str  # "pending" or "firing"
+    since_ms: int  # when the condition was first breached
+    value: Optional[float] = None
+    restored: bool = False  # left firing by an earlier run and not evaluated since
+
+class AlertManager:
+    """Alert management system
+
+    Alerts come from a RuleEngine (``alert_rules.json`` when present,
+    DEFAULT_ALERT_RULES otherwise) fed with every collector sample. Each
+    alert id moves pending -> firing -> resolved: a breach has to last the
+    rule's ``for`` duration before it fires, and a firing alert resolves only
+    once the value crosses the rule's ``clear`` level, so values hovering
+    around a threshold do not flap. State is kept in memory and the database
+    is written on transitions only. Alerts left firing by an earlier run are
+    not resolved for lack of data until their series has had one rule window
+    to report again.
+    """
+    
+    def __init__(self, db_manager: DatabaseManager, writer: Optional[BatchWriter] = None,
+                 events: Optional[EventBus] = None, rules: Optional[RuleEngine] = None,
+                 rules_path: str = ALERT_RULES_FILE, anomaly: Optional[AnomalyDetector] = None,
+                 notifier: Optional[NotificationDispatcher] = None):
+        self.db = db_manager
+        self.writer = writer or db_manager
+        self.events = events
+        self.anomaly = anomaly
+        self.notifier = notifier
+        # Active alerts as served to the dashboard, kept in memory for live updates
+        self.version = 0  # bumped whenever the active set changes
+        try:
+            self.active = {a['id']: a for a in db_manager.get_active_alerts()}
+        except Exception:
+            self.active = {}
+        # Alerts left firing by an earlier run resolve once their condition is gone
+        self.states: Dict[str, AlertState] = {
+            alert_id: AlertState(alert_id, row['level'], row['message'], 'firing',
+                                 _to_epoch_ms(row['timestamp']), restored=True)
+            for alert_id, row in self.active.items()}
+        self._restored_until: Optional[int] = None  # set on the first check
+        self.rules_error: Optional[str] = None
+        if rules is None and os.path.exists(rules_path):
+            try:
+                rules = RuleEngine.from_file(rules_path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # A broken rule file must not silence alerting altogether
+                self.rules_error = f"{rules_path}: {type(e).__name__}: {e}"
+        self.rules = rules or RuleEngine.default()
+    
+    def observe(self, samples: List["Sample"]):
+        """Feed collector samples to the rule windows and the anomaly detector"""
+        self.rules.observe(samples)
+        if self.anomaly is not None:
+            self.anomaly.observe(samples)
+    
+    def check_alerts(self, metrics: SystemMetrics):
+        """Evaluate the rules at the snapshot's time and advance alert states"""
+        now_ms = _to_epoch_ms(metrics.timestamp)
+        changed = False
+        seen = set()
+        for alert_id, rule, labels, value in self.rules.evaluate(now_ms):
+            if alert_id in seen:
+                continue
+            seen.add(alert_id)
+            state = self.states.get(alert_id)
+            breached = rule.breached(value, state is not None and state.state == 'firing')
+            changed |= self._advance(alert_id, breached, rule.level, rule.format(rule.message, labels, value),
+                                     value, rule.for_seconds, metrics.timestamp, now_ms)
+        
+        if self.anomaly is not None:
+            for alert, z in self.anomaly.evaluate(now_ms):
+                if alert.id in seen:
+                    continue
+                seen.add(alert.id)
+                state = self.states.get(alert.id)
+                limit = (self.anomaly.clear_z if state is not None and state.state == 'firing'
+                         else self.anomaly.z_threshold)
+                changed |= self._advance(alert.id, abs(z) > limit, alert.level, alert.message, alert.value,
+                                         self.anomaly.for_seconds, metrics.timestamp, now_ms)
+        
+        if self._restored_until is None:
+            grace = max((rule.window for rule in self.rules.rules), default=0.0) * 1000
+            if self.anomaly is not None:
+                grace = max(grace, self.anomaly.stale_ms)
+            self._restored_until = now_ms + int(grace)
+        for alert_id in seen & self.states.keys():
+            self.states[alert_id].restored = False
+        # Series no longer reported (an unmounted disk, a vanished sensor) count as cleared
+        for alert_id in [a for a in self.states if a not in seen]:
+            if self.states[alert_id].restored and now_ms < self._restored_until:
+                continue  # Its series may not have reported since the restart
+            changed |= self._advance(alert_id, False, None, None, None, 0.0, metrics.timestamp, now_ms)
+        
+        if changed:
+            self.version += 1
+        if changed and self.events is not None:
+            self.events.publish('alerts', {'alerts': self.active_alerts()})
+    
+    def _advance(self, alert_id: str, breached: bool, level: Optional[str], message: Optional[str],
+                 value: Optional[float], for_seconds: float, timestamp: str, now_ms: int) -> bool:
+        """Apply one observation to an alert's state; True if the active set changed"""
+        state = self.states.get(alert_id)
+        if breached:
+            if state is None:
+                state = self.states[alert_id] = AlertState(alert_id, level, message, 'pending', now_ms)
+            state.value = value
+            if state.state == 'pending':
+                state.level, state.message = level, message
+                if now_ms - state.since_ms >= for_seconds * 1000:
+                    state.state = 'firing'
+                    self._record(Alert(alert_id, level, message, timestamp, value=value))
+                    return True
+            return False
+        
+        if state is None:
+            return False
+        del self.states[alert_id]
+        if state.state != 'firing':
+            return False  # Never fired, so nothing was written
+        self._record(Alert(alert_id, state.level, state.message, timestamp, resolved=True, value=value))
+        return True
+    
+    def _record(self, alert: Alert):
+        """Persist a transition, notify about it and update the in-memory active set"""
+        self.writer.insert_alert(alert)
+        if self.notifier is not None:
+            self.notifier.notify(alert)
+        if alert.resolved:
+            self.active.pop(alert.id, None)
+        else:
+            self.active[alert.id] = {'id': alert.id, 'level': alert.level, 'message': alert.message,
+                                     'timestamp': alert.timestamp, 'resolved': 0}
+    
+    def pending_alerts(self) -> List[AlertState]:
+        """Alerts whose condition holds but has not lasted long enough to fire"""
+        return [s for s in list(self.states.values()) if s.state == 'pending']
+    
+    def active_alerts(self) -> List[Dict]:
+        """Active alerts, newest first"""
+        return sorted(self.active.values(), key=lambda a: a['timestamp'], reverse=True)
+
+class MetricsRingBuffer:
+    """Fixed-capacity in-memory history of recent samples
+
+    Each metric column is a preallocated ``array('d')`` written in place, so
+    appends allocate nothing and the dashboard can read the latest sample or
+    the last hour without touching SQLite. Missing values are stored as NaN.
+    """
+    
+    FIELDS = ('ts',) + METRIC_COLUMNS
+    INT_FIELDS = ('ts', 'network_sent', 'network_recv', 'processes_count')
+    
+    def __init__(self, capacity: int = 3600):
+        self.capacity = capacity
+        self._columns = {name: array('d', [math.nan]) * capacity for name in self.FIELDS}
+        self._next = 0
+        self._size = 0
+        self._latest: Optional[SystemMetrics] = None
+        self._lock = threading.Lock()
+        # Incremented on every append; lets readers detect new data cheaply
+        self.version = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def append(self, metrics: SystemMetrics):
+        """Store a sample, overwriting the oldest one when full"""
+        ts = _to_epoch_ms(metrics.timestamp)
+        with self._lock:
+            i = self._next
+            self._columns['ts'][i] = ts
+            for name in METRIC_COLUMNS:
+                value = getattr(metrics, name)
+                self._columns[name][i] = math.nan if value is None else value
+            self._next = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+            self._latest = metrics
+            self.version += 1
+    
+    def latest_metrics(self) -> Optional[SystemMetrics]:
+        """The most recent SystemMetrics object, if any"""
+        return self._latest
+    
+    def _row(self, i: int) -> Dict:
+        row = {}
+        for name in self.FIELDS:
+            value = self._columns[name][i]
+            if math.isnan(value):
+                row[name] = None
+            else:
+                row[name] = int(value) if name in self.INT_FIELDS else value
+        row['timestamp'] = _from_epoch_ms(row['ts'])
+        return row
+    
+    def _indexes_since(self, seconds: Optional[float]) -> List[int]:
+        """Ring positions newest first, stopping at the first sample older than the cutoff"""
+        cutoff = None if seconds is None else _to_epoch_ms(datetime.now()) - seconds * 1000
+        ts = self._columns['ts']
+        indexes = []
+        i = self._next
+        for _ in range(self._size):
+            i = (i - 1) % self.capacity
+            if cutoff is not None and ts[i] <= cutoff:
+                break
+            indexes.append(i)
+        return indexes
+    
+    def latest(self) -> Optional[Dict]:
+        """The most recent sample as a row dict (same keys as the metrics table)"""
+        with self._lock:
+            if not self._size:
+                return None
+            return self._row((self._next - 1) % self.capacity)
+    
+    def since(self, seconds: Optional[float] = None) -> List[Dict]:
+        """Samples from the last ``seconds`` (all when None), newest first"""
+        with self._lock:
+            return [self._row(i) for i in self._indexes_since(seconds)]
+    
+    def count_since(self, seconds: Optional[float] = None) -> int:
+        """Number of samples in the last ``seconds``"""
+        with self._lock:
+            return len(self._indexes_since(seconds))
+    
+    def columns(self, seconds: Optional[float] = None) -> Dict[str, List[Optional[float]]]:
+        """Column-oriented copy of the last ``seconds``, oldest first"""
+        with self._lock:
+            indexes = self._indexes_since(seconds)[::-1]
+            result = {}
+            for name in self.FIELDS:
+                cast = int if name in self.INT_FIELDS else float
+                result[name] = [None if math.isnan(v) else cast(v)
+                                for v in (self._columns[name][i] for i in indexes)]
+            return result
+
+class CpuSampler:
+    """Non-blocking CPU utilisation from cpu_times() deltas
+
+    Each call reports usage since the previous call, so the collector never
+    has to sleep inside psutil.cpu_percent(interval=...). The first sample
+    covers the time since construction.
+    """
+    
+    def __init__(self):
+        self._last_total = psutil.cpu_times()
+        self._last_percpu = psutil.cpu_times(percpu=True)
+    
+    @staticmethod
+    def _busy_percent(prev, cur) -> float:
+        def split(times):
+            total = sum(times)
+            # On Linux guest time is already counted in user/nice
+            total -= getattr(times, 'guest', 0) + getattr(times, 'guest_nice', 0)
+            idle = times.idle + getattr(times, 'iowait', 0)
+            return total, total - idle
+        prev_total, prev_busy = split(prev)
+        cur_total, cur_busy = split(cur)
+        elapsed = cur_total - prev_total
+        if elapsed <= 0:
+            return 0.0
+        return round(min(100.0, max(0.0, (cur_busy - prev_busy) / elapsed * 100)), 1)
+    
+    def sample(self):
+        """Return (total_percent, per_core_percents) since the last call"""
+        total = psutil.cpu_times()
+        percpu = psutil.cpu_times(percpu=True)
+        cpu_percent = self._busy_percent(self._last_total, total)
+        if len(percpu) == len(self._last_percpu):
+            per_core = [self._busy_percent(p, c) for p, c in zip(self._last_percpu, percpu)]
+        else:
+            per_core = []  # CPU hotplug; resynchronise on the next tick
+        self._last_total, self._last_percpu = total, percpu
+        return cpu_percent, per_core
+
+def _counter_delta(prev: int, cur: int) -> int:
+    """Increase of a cumulative counter, tolerating wraparound and resets"""
+    if cur >= prev:
+        return cur - prev
+    for limit in (2 ** 32, 2 ** 64):
+        if limit * 3 // 4 <= prev < limit:
+            return cur + limit - prev
+    # Counter was reset; everything counted so far happened since then
+    return cur
+
+class NetworkRateTracker:
+    """Per-interface throughput from cumulative net_io_counters()
+
+    Rates are computed from the delta to the previous call. A counter that
+    goes backwards is treated as a wraparound when the previous value was
+    close to the 32/64-bit limit, and as an interface reset otherwise.
+    """
+    
+    FIELDS = ('bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv')
+    
+    def __init__(self):
+        self._last_time = time.monotonic()
+        self._last = self._read()
+    
+    @staticmethod
+    def _read() -> Dict[str, Any]:
+        try:
+            return psutil.net_io_counters(pernic=True) or {}
+        except Exception:
+            return {}
+    
+    _delta = staticmethod(_counter_delta)
+    
+    @staticmethod
+    def is_loopback(name: str) -> bool:
+        return name == 'lo' or name.startswith('lo:') or name.lower().startswith('loopback')
+    
+    def sample(self) -> Dict[str, Dict[str, float]]:
+        """Return {interface: {field: per-second rate}} since the last call"""
+        now = time.monotonic()
+        current = self._read()
+        elapsed = now - self._last_time
+        rates = {}
+        if elapsed > 0:
+            for name, counters in current.items():
+                prev = self._last.get(name)
+                if prev is None:
+                    continue  # New interface; no baseline yet
+                rates[name] = {f: self._delta(getattr(prev, f), getattr(counters, f)) / elapsed
+                               for f in self.FIELDS}
+        self._last_time, self._last = now, current
+        return rates
+
+@dataclass
+class Sample:
+    """One labelled metric value from a collector"""
+    metric: str
+    value: Optional[float]
+    labels: Dict[str, str] = field(default_factory=dict)
+    ts: int = 0  # epoch ms
+
+class Collector(abc.ABC):
+    """Base class for metric collectors
+
+    Subclasses set ``name``, a default ``interval`` in seconds and the metric
+    names they emit in ``fields``, list the modules they import in
+    ``requires`` and implement ``collect()``.
+    """
+    
+    name = "collector"
+    interval = 10.0
+    fields: Tuple[str, ...] = ()
+    requires: Tuple[LazyModule, ...] = (psutil,)
+    
+    def __init__(self, interval: Optional[float] = None):
+        if interval is not None:
+            self.interval = interval
+    
+    @abc.abstractmethod
+    def collect(self) -> List[Sample]:
+        """Return the current samples"""
+
+class CpuCollector(Collector):
+    """Total and per-core CPU usage"""
+    
+    name = "cpu"
+    fields = ("cpu_percent", "cpu_core_percent")
+    
+    def __init__(self, interval: Optional[float] = None):
+        super().__init__(interval)
+        self.sampler = CpuSampler()
+    
+    def collect(self) -> List[Sample]:
+        cpu_percent, per_core = self.sampler.sample()
+        samples = [Sample("cpu_percent", cpu_percent)]
+        samples += [Sample("cpu_core_percent", p, {"core": str(i)}) for i, p in enumerate(per_core)]
+        return samples
+
+class MemoryCollector(Collector):
+    """Virtual memory usage"""
+    
+    name = "memory"
+    fields = ("memory_percent",)
+    
+    def collect(self) -> List[Sample]:
+        return [Sample("memory_percent", psutil.virtual_memory().percent)]
+
+class DiskCollector(Collector):
+    """Usage of the system disk and of every mounted partition
+
+    Partitions are filtered by filesystem type and mountpoint; pseudo and
+    read-only image filesystems are skipped by default.
+    """
+    
+    name = "disk"
+    interval = 30.0
+    fields = ("disk_usage", "disk_mount_usage_percent", "disk_mount_free_bytes")
+    
+    EXCLUDE_FSTYPES = frozenset({'squashfs', 'tmpfs', 'devtmpfs', 'overlay', 'iso9660',
+                                 'proc', 'sysfs', 'cgroup', 'cgroup2', 'nsfs', 'autofs'})
+    
+    def __init__(self, interval: Optional[float] = None, fstypes: Optional[List[str]] = None,
+                 exclude_fstypes: Optional[List[str]] = None,
+                 exclude_mountpoints: Tuple[str, ...] = ('/snap/', '/var/lib/docker/')):
+        super().__init__(interval)
+        self.fstypes = set(fstypes) if fstypes else None
+        self.exclude_fstypes = set(exclude_fstypes) if exclude_fstypes is not None else set(self.EXCLUDE_FSTYPES)
+        self.exclude_mountpoints = exclude_mountpoints
+    
+    def partitions(self) -> List[Any]:
+        """Mounted partitions that pass the fstype/mountpoint filters"""
+        try:
+            parts = psutil.disk_partitions(all=False)
+        except Exception:
+            return []
+        selected, seen = [], set()
+        for part in parts:
+            if self.fstypes is not None and part.fstype not in self.fstypes:
+                continue
+            if part.fstype in self.exclude_fstypes or part.mountpoint in seen:
+                continue
+            if any(part.mountpoint.startswith(prefix) for prefix in self.exclude_mountpoints):
+                continue
+            seen.add(part.mountpoint)
+            selected.append(part)
+        return selected
+    
+    def collect(self) -> List[Sample]:
+        # Fix disk usage to work on Windows/Linux
+        try:
+            if os.name == 'nt':  # Windows
+                disk = psutil.disk_usage('C:')
+            else:  # Linux/Unix
+                disk = psutil.disk_usage('/')
+        except:
+            # Fallback to current directory
+            disk = psutil.disk_usage('.')
+        samples = [Sample("disk_usage", disk.percent)]
+        
+        for part in self.partitions():
+            try:
+                usage = psutil.disk_usage(part.mountpoint)
+            except Exception:
+                continue  # Unreadable or vanished mount
+            labels = {"mountpoint": part.mountpoint, "device": part.device, "fstype": part.fstype}
+            samples.append(Sample("disk_mount_usage_percent", usage.percent, labels))
+            samples.append(Sample("disk_mount_free_bytes", usage.free, labels))
+        return samples
+
+class DiskIOCollector(Collector):
+    """Per-device read/write throughput, IOPS and busy time"""
+    
+    name = "disk_io"
+    fields = ("disk_read_rate", "disk_write_rate", "disk_read_iops", "disk_write_iops",
+              "disk_busy_percent")
+    
+    COUNTERS = ('read_bytes', 'write_bytes', 'read_count', 'write_count', 'busy_time')
+    
+    def __init__(self, interval: Optional[float] = None, devices: Optional[List[str]] = None,
+                 exclude_prefixes: Tuple[str, ...] = ('loop', 'ram', 'zram')):
+        super().__init__(interval)
+        self.devices = set(devices) if devices else None
+        self.exclude_prefixes = exclude_prefixes
+        self._last_time = time.monotonic()
+        self._last = self._read()
+    
+    def _read(self) -> Dict[str, Any]:
+        try:
+            counters = psutil.disk_io_counters(perdisk=True) or {}
+        except Exception:
+            return {}
+        return {name: c for name, c in counters.items()
+                if (self.devices is None or name in self.devices)
+                and not name.startswith(self.exclude_prefixes)}
+    
+    def collect(self) -> List[Sample]:
+        now = time.monotonic()
+        current = self._read()
+        elapsed = now - self._last_time
+        samples = []
+        if elapsed > 0:
+            for name, counters in current.items():
+                prev = self._last.get(name)
+                if prev is None:
+                    continue  # New device; no baseline yet
+                delta = {f: _counter_delta(getattr(prev, f), getattr(counters, f))
+                         for f in self.COUNTERS if hasattr(counters, f)}
+                labels = {"device": name}
+                samples += [
+                    Sample("disk_read_rate", delta['read_bytes'] / elapsed, labels),
+                    Sample("disk_write_rate", delta['write_bytes'] / elapsed, labels),
+                    Sample("disk_read_iops", delta['read_count'] / elapsed, labels),
+                    Sample("disk_write_iops", delta['write_count'] / elapsed, labels),
+                ]
+                if 'busy_time' in delta:
+                    # busy_time is in milliseconds (Linux/FreeBSD only)
+                    busy = min(100.0, delta['busy_time'] / (elapsed * 1000) * 100)
+                    samples.append(Sample("disk_busy_percent", busy, labels))
+        self._last_time, self._last = now, current
+        return samples
+
+class NetworkCollector(Collector):
+    """Cumulative counters plus aggregate and per-interface rates"""
+    
+    name = "network"
+    fields = ("network_sent", "network_recv") + NETWORK_RATE_COLUMNS + tuple(
+        f"interface_{f}_rate" for f in NetworkRateTracker.FIELDS)
+    
+    def __init__(self, interval: Optional[float] = None):
+        super().__init__(interval)
+        self.rates = NetworkRateTracker()
+    
+    def collect(self) -> List[Sample]:
+        net_io = psutil.net_io_counters()
+        samples = [Sample("network_sent", net_io.bytes_sent),
+                   Sample("network_recv", net_io.bytes_recv)]
+        interfaces = self.rates.sample()
+        if interfaces:
+            external = [r for name, r in interfaces.items()
+                        if not NetworkRateTracker.is_loopback(name)]
+            for f, column in zip(NetworkRateTracker.FIELDS, ('network_sent_rate', 'network_recv_rate',
+                                                             'packets_sent_rate', 'packets_recv_rate')):
+                samples.append(Sample(column, sum(r[f] for r in external)))
+        for name, rates in interfaces.items():
+            samples += [Sample(f"interface_{f}_rate", rates[f], {"interface": name})
+                        for f in NetworkRateTracker.FIELDS]
+        return samples
+
+class SensorsCollector(Collector):
+    """Hardware temperatures (slow on some platforms)"""
+    
+    name = "sensors"
+    interval = 60.0
+    fields = ("temperature", "sensor_temperature")
+    
+    def collect(self) -> List[Sample]:
+        samples = []
+        try:
+            temps = psutil.sensors_temperatures()
+        except Exception:
+            temps = {}
+        for chip, entries in (temps or {}).items():
+            for i, entry in enumerate(entries):
+                if not samples:
+                    # First reading doubles as the headline temperature
+                    samples.append(Sample("temperature", entry.current))
+                samples.append(Sample("sensor_temperature", entry.current,
+                                      {"chip": chip, "sensor": entry.label or str(i)}))
+        return samples
+
+class ProcessCountCollector(Collector):
+    """Number of running processes"""
+    
+    name = "processes"
+    fields = ("processes_count",)
+    
+    def collect(self) -> List[Sample]:
+        return [Sample("processes_count", len(psutil.pids()))]
+
+class ProcessCollector(Collector):
+    """Per-process CPU, memory, IO and open files for the top consumers
+
+    psutil.Process handles and the previous cpu/io counters are kept across
+    ticks, so rates come from cheap deltas instead of blocking per-process
+    cpu_percent() calls. Processes are summed by name (a per-pid label would
+    add a series for every process ever seen), and only the top ``top_n``
+    names by CPU and by RSS are emitted and pay for the open file count.
+    """
+    
+    name = "process_top"
+    interval = 30.0
+    fields = ("process_cpu_percent", "process_rss_bytes", "process_read_rate",
+              "process_write_rate", "process_open_files", "process_instances")
+    
+    def __init__(self, interval: Optional[float] = None, top_n: int = 10):
+        super().__init__(interval)
+        self.top_n = top_n
+        self._procs: Dict[int, Any] = {}
+        self._names: Dict[int, str] = {}
+        self._prev: Dict[int, Tuple[float, Optional[int], Optional[int]]] = {}
+        self._last_time: Optional[float] = None
+    
+    @staticmethod
+    def _open_files(proc) -> Optional[int]:
+        try:
+            return proc.num_handles() if os.name == 'nt' else proc.num_fds()
+        except psutil.Error:
+            return None
+    
+    def collect(self) -> List[Sample]:
+        now = time.monotonic()
+        elapsed = now - self._last_time if self._last_time is not None else None
+        self._last_time = now
+        
+        pids = set(psutil.pids())
+        for pid in list(self._procs):
+            if pid not in pids:
+                self._forget(pid)
+        for pid in pids - self._procs.keys():
+            try:
+                proc = psutil.Process(pid)
+                self._names[pid] = proc.name()
+            except psutil.Error:
+                continue
+            self._procs[pid] = proc
+        
+        rows = []
+        for pid, proc in list(self._procs.items()):
+            try:
+                with proc.oneshot():
+                    times = proc.cpu_times()
+                    rss = proc.memory_info().rss
+                    try:
+                        io = proc.io_counters()
+                        read_bytes, write_bytes = io.read_bytes, io.write_bytes
+                    except (psutil.AccessDenied, AttributeError):
+                        read_bytes = write_bytes = None
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                self._forget(pid)
+                continue
+            except psutil.Error:
+                continue
+            cpu_time = times.user + times.system
+            prev = self._prev.get(pid)
+            self._prev[pid] = (cpu_time, read_bytes, write_bytes)
+            
+            cpu_percent = read_rate = write_rate = None
+            if prev is not None and elapsed and cpu_time >= prev[0]:
+                cpu_percent = (cpu_time - prev[0]) / elapsed * 100
+                if read_bytes is not None and prev[1] is not None:
+                    read_rate = max(0, read_bytes - prev[1]) / elapsed
+                    write_rate = max(0, write_bytes - prev[2]) / elapsed
+            rows.append((pid, cpu_percent, rss, read_rate, write_rate))
+        
+        # name -> [pids, cpu percent, rss, read rate, write rate]
+        groups: Dict[str, List[Any]] = {}
+        for pid, cpu_percent, rss, read_rate, write_rate in rows:
+            group = groups.setdefault(self._names.get(pid, "?"), [[], None, 0, None, None])
+            group[0].append(pid)
+            group[2] += rss
+            if cpu_percent is not None:
+                group[1] = (group[1] or 0.0) + cpu_percent
+            if read_rate is not None:
+                group[3] = (group[3] or 0.0) + read_rate
+                group[4] = (group[4] or 0.0) + write_rate
+        
+        by_cpu = sorted((n for n, g in groups.items() if g[1] is not None),
+                        key=lambda n: groups[n][1], reverse=True)
+        by_rss = sorted(groups, key=lambda n: groups[n][2], reverse=True)
+        
+        samples = []
+        for name in dict.fromkeys(by_cpu[:self.top_n] + by_rss[:self.top_n]):
+            pids, cpu_percent, rss, read_rate, write_rate = groups[name]
+            labels = {"name": name}
+            samples.append(Sample("process_rss_bytes", rss, labels))
+            samples.append(Sample("process_instances", len(pids), labels))
+            if cpu_percent is not None:
+                samples.append(Sample("process_cpu_percent", round(cpu_percent, 1), labels))
+            if read_rate is not None:
+                samples.append(Sample("process_read_rate", read_rate, labels))
+                samples.append(Sample("process_write_rate", write_rate, labels))
+            open_files = [n for n in (self._open_files(self._procs[pid]) for pid in pids) if n is not None]
+            if open_files:
+                samples.append(Sample("process_open_files", sum(open_files), labels))
+        return samples
+    
+    def _forget(self, pid: int):
+        self._procs.pop(pid, None)
+        self._names.pop(pid, None)
+        self._prev.pop(pid, None)
+
+@dataclass
+class CollectorStats:
+    """Self-monitoring counters for one collector"""
+    runs: int = 0
+    errors: int = 0
+    samples: int = 0
+    last_duration: float = 0.0
+    total_duration: float = 0.0
+    last_error: Optional[str] = None
+
+class CollectorRegistry:
+    """Registered collectors, their latest samples and a shared scheduler
+
+    Collectors are kept in a heap ordered by their next due time on the
+    monotonic clock, so one thread can drive any mix of intervals.
+    """
+    
+    def __init__(self):
+        self._collectors: Dict[str, Collector] = {}
+        self._latest: Dict[str, List[Sample]] = {}
+        self._heap: List[tuple] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, CollectorStats] = {}
+        # Collectors left out because a dependency is missing, with the reason
+        self.disabled: Dict[str, str] = {}
+    
+    def register_if_available(self, collector_cls: type, interval: Optional[float] = None) -> bool:
+        """Construct and register a collector unless one of its dependencies is missing"""
+        reason = missing_dependency(*collector_cls.requires)
+        if reason is not None:
+            self.disabled[collector_cls.name] = reason
+            return False
+        self.register(collector_cls(interval))
+        return True
+    
+    def register(self, collector: Collector, start: Optional[float] = None):
+        """Add (or replace) a collector; it first runs at ``start`` (default now)"""
+        with self._lock:
+            self._collectors[collector.name] = collector
+            self.stats.setdefault(collector.name, CollectorStats())
+            self._push(collector.name, time.monotonic() if start is None else start)
+    
+    def unregister(self, name: str):
+        """Remove a collector and its latest samples"""
+        with self._lock:
+            self._collectors.pop(name, None)
+            self._latest.pop(name, None)
+    
+    def get(self, name: str) -> Optional[Collector]:
+        return self._collectors.get(name)
+    
+    def __iter__(self):
+        return iter(list(self._collectors.values()))
+    
+    def _push(self, name: str, due: float):
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, name))
+    
+    def next_due(self) -> Optional[float]:
+        """Monotonic time at which the next collector is due"""
+        with self._lock:
+            while self._heap and self._heap[0][2] not in self._collectors:
+                heapq.heappop(self._heap)  # Left behind by unregister()
+            return self._heap[0][0] if self._heap else None
+    
+    def run_collector(self, collector: Collector) -> List[Sample]:
+        """Run one collector now, recording stats and its latest samples"""
+        stats = self.stats.setdefault(collector.name, CollectorStats())
+        started = time.perf_counter()
+        try:
+            samples = collector.collect()
+        except Exception as e:
+            samples = []
+            stats.errors += 1
+            stats.last_error = f"{type(e).__name__}: {e}"
+        duration = time.perf_counter() - started
+        stats.runs += 1
+        stats.samples += len(samples)
+        stats.last_duration = duration
+        stats.total_duration += duration
+        ts = _to_epoch_ms(datetime.now())
+        for sample in samples:
+            sample.ts = sample.ts or ts
+        with self._lock:
+            if collector.name in self._collectors:
+                self._latest[collector.name] = samples
+        return samples
+    
+    def run_pending(self, now: Optional[float] = None) -> List[Sample]:
+        """Run every collector that is due and reschedule it"""
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, _, name = heapq.heappop(self._heap)
+                collector = self._collectors.get(name)
+                if collector is None:
+                    continue
+                # Next slot strictly after now; missed runs are skipped instead of bursting
+                nxt = when + (math.floor((now - when) / collector.interval) + 1) * collector.interval
+                self._push(name, nxt)
+                due.append(collector)
+        samples = []
+        for collector in due:
+            samples.extend(self.run_collector(collector))
+        return samples
+    
+    def run_all(self) -> List[Sample]:
+        """Run every collector immediately (schedule unchanged)"""
+        samples = []
+        for collector in self:
+            samples.extend(self.run_collector(collector))
+        return samples
+    
+    def latest(self) -> List[Sample]:
+        """Most recent samples of every collector"""
+        with self._lock:
+            return [sample for samples in self._latest.values() for sample in samples]
+
+DEFAULT_COLLECTORS = (CpuCollector, MemoryCollector, DiskCollector, DiskIOCollector, NetworkCollector,
+                      SensorsCollector, ProcessCountCollector, ProcessCollector)
+
+class SystemMonitor:
+    """Advanced system monitoring
+
+    Collectors run on their own intervals through a CollectorRegistry and
+    write labelled samples to the generic store; every ``interval`` seconds
+    their latest values are combined into a SystemMetrics snapshot for the
+    metrics table, the ring buffer and the alert checks.
+    """
+    
+    def __init__(self, db_manager: DatabaseManager, writer: Optional[BatchWriter] = None,
+                 history_size: int = 3600, interval: float = 10.0,
+                 collector_intervals: Optional[Dict[str, float]] = None,
+                 anomaly_detection: bool = False, notifier: Optional[NotificationDispatcher] = None):
+        self.db = db_manager
+        self.interval = interval
+        self.writer = writer or db_manager
+        self.events = EventBus()
+        self.alert_manager = AlertManager(db_manager, writer, self.events,
+                                          anomaly=AnomalyDetector() if anomaly_detection else None,
+                                          notifier=notifier)
+        self.recent = MetricsRingBuffer(history_size)
+        self.running = False
+        self.registry = CollectorRegistry()
+        intervals = collector_intervals or {}
+        for collector_cls in DEFAULT_COLLECTORS:
+            self.registry.register_if_available(collector_cls, intervals.get(collector_cls.name))
+    
+    def build_snapshot(self) -> SystemMetrics:
+        """Combine the latest collector samples into a SystemMetrics"""
+        values: Dict[str, Any] = {}
+        per_core: Dict[int, float] = {}
+        interfaces: Dict[str, Dict[str, float]] = {}
+        processes: Dict[str, Dict[str, Any]] = {}
+        disks: Dict[str, float] = {}
+        disk_io: Dict[str, Dict[str, float]] = {}
+        for sample in self.registry.latest():
+            if not sample.labels:
+                values[sample.metric] = sample.value
+            elif sample.metric == "cpu_core_percent":
+                per_core[int(sample.labels["core"])] = sample.value
+            elif sample.metric.startswith("interface_"):
+                key = sample.metric[len("interface_"):-len("_rate")]
+                interfaces.setdefault(sample.labels["interface"], {})[key] = sample.value
+            elif sample.metric == "disk_mount_usage_percent":
+                disks[sample.labels["mountpoint"]] = sample.value
+            elif sample.metric in DiskIOCollector.fields:
+                disk_io.setdefault(sample.labels["device"], {})[sample.metric[len("disk_"):]] = sample.value
+            elif sample.metric.startswith("process_"):
+                row = processes.setdefault(sample.labels["name"], {"name": sample.labels["name"]})
+                row[sample.metric[len("process_"):]] = sample.value
+        
+        return SystemMetrics(
+            timestamp=datetime.now().isoformat(),
+            cpu_percent=values.get("cpu_percent", 0.0),
+            memory_percent=values.get("memory_percent", 0.0),
+            disk_usage=values.get("disk_usage", 0.0),
+            network_sent=values.get("network_sent", 0),
+            network_recv=values.get("network_recv", 0),
+            processes_count=values.get("processes_count", 0),
+            temperature=values.get("temperature"),
+            cpu_per_core=[per_core[i] for i in sorted(per_core)],
+            network_sent_rate=values.get("network_sent_rate"),
+            network_recv_rate=values.get("network_recv_rate"),
+            packets_sent_rate=values.get("packets_sent_rate"),
+            packets_recv_rate=values.get("packets_recv_rate"),
+            interfaces=interfaces,
+            top_processes=sorted(processes.values(),
+                                 key=lambda p: (p.get("cpu_percent") or 0, p["rss_bytes"]),
+                                 reverse=True),
+            disks=disks,
+            disk_io=disk_io
+        )
+    
+    def get_system_metrics(self) -> SystemMetrics:
+        """Collect comprehensive system metrics"""
+        self.alert_manager.observe(self.registry.run_all())
+        return self.build_snapshot()
+    
+    def record_samples(self, samples: List[Sample]):
+        """Queue collector samples for storage and feed them to the alert rules"""
+        if samples:
+            self.writer.insert_samples(samples)
+            self.alert_manager.observe(samples)
+    
+    def tick(self):
+        """Take a snapshot: store it, publish it and evaluate the alerts"""
+        metrics = self.build_snapshot()
+        self.recent.append(metrics)
+        self.writer.insert_metrics(metrics)
+        if self.events.subscriber_count:
+            self.events.publish('metrics', asdict(metrics))
+        self.alert_manager.check_alerts(metrics)
+    
+    def monitor_loop(self):
+        """Main monitoring loop"""
+        if self.alert_manager.anomaly is not None:
+            try:
+                self.alert_manager.anomaly.backfill(self.db)
+            except:
+                pass  # Silent operation
+        
+        # Ticks are scheduled on the monotonic clock, so collection time
+        # does not stretch the period
+        next_tick = time.monotonic()
+        while self.running:
+            now = time.monotonic()
+            try:
+                self.record_samples(self.registry.run_pending(now))
+            except:
+                pass  # Silent operation
+            
+            if now >= next_tick:
+                try:
+                    self.tick()
+                except:
+                    pass  # Silent operation
+                
+                next_tick += self.interval
+                if next_tick <= time.monotonic():
+                    # Fell behind (suspend, stalled disk): skip missed ticks instead of bursting
+                    next_tick += math.ceil((time.monotonic() - next_tick) / self.interval) * self.interval
+            
+            wake = min(next_tick, self.registry.next_due() or next_tick)
+            time.sleep(max(0.0, wake - time.monotonic()))
+
+class ActivityMonitor:
     """Enhanced activity monitoring"""
     
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
         self.screenshot_dir = Path("screenshots")
-        self.screenshot_dir.mkdir(exist_ok=True)
         self.screenshot_interval = 60  # seconds
         self.running = False
     
@@ -334,56 +4091,1212 @@ class ActivityMonitor:
         """Handle mouse click events"""
         if pressed:
             try:
-                self.db.insert_activity("mouse", f"Click {button} at ({x}, {y})")
-            except:
+                self.db.insert_activity("mouse", f"Click {button} at ({x}, {y})")
+            except:
+                pass
+    
+    def on_mouse_scroll(self, x, y, dx, dy):
+        """Handle mouse scroll events"""
+        try:
+            self.db.insert_activity("mouse", f"Scroll at ({x}, {y}) delta=({dx}, {dy})")
+        except:
+            pass
+    
+    def take_screenshot(self):
+        """Capture and record one screenshot"""
+        self.screenshot_dir.mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = self.screenshot_dir / f"screenshot_{timestamp}.png"
+        
+        screenshot = pyautogui.screenshot()
+        screenshot.save(path)
+        self.db.insert_activity("screenshot", f"Screenshot saved: {path.name}")
+    
+    def screenshot_loop(self):
+        """Periodic screenshot capture"""
+        while self.running:
+            try:
+                self.take_screenshot()
+            except:
+                pass  # Silent operation
+            
+            time.sleep(self.screenshot_interval)
+
+def _format_bytes(size: Optional[float]) -> str:
+    """Human readable byte count"""
+    if size is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024 or unit == "TB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def _format_rate(bytes_per_sec: Optional[float]) -> str:
+    """Human readable throughput"""
+    return "n/a" if bytes_per_sec is None else _format_bytes(bytes_per_sec) + "/s"
+
+def _parse_time(value: Optional[str], default_ms: int) -> int:
+    """Parse an API time: epoch s/ms, ISO 8601, 'now' or a relative '-6h'/'-30m'/'-7d'"""
+    if value is None or value == '' or value == 'now':
+        return default_ms
+    units = {'s': 1_000, 'm': 60_000, 'h': 3_600_000, 'd': 86_400_000}
+    if value[0] == '-' and value[-1] in units:
+        return _to_epoch_ms(datetime.now()) - int(float(value[1:-1]) * units[value[-1]])
+    try:
+        return _to_epoch_ms(float(value))
+    except ValueError:
+        return _to_epoch_ms(value)
+
+def lttb(points: List[Tuple[float, float]], threshold: int) -> List[Tuple[float, float]]:
+    """Largest-Triangle-Three-Buckets downsampling of (x, y) points"""
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        span = points[next_start:next_end]
+        avg_x = sum(p[0] for p in span) / len(span)
+        avg_y = sum(p[1] for p in span) / len(span)
+        
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = points[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+OPENMETRICS_PREFIX = 'monitor_'
+# Collector metrics that are cumulative counters; everything else is a gauge
+COUNTER_METRICS = frozenset({'network_sent', 'network_recv'})
+
+def _om_name(name: str) -> str:
+    """Metric or label name restricted to the OpenMetrics character set"""
+    name = re.sub(r'[^a-zA-Z0-9_:]', '_', name)
+    return '_' + name if name[:1].isdigit() else name
+
+def _om_labels(labels: Dict[str, str]) -> str:
+    """Label set in exposition syntax, e.g. ``{core="0"}``"""
+    if not labels:
+        return ''
+    parts = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{_om_name(key)}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+def _om_number(value: Any) -> str:
+    """Sample value in exposition syntax"""
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+def render_openmetrics(families: List[Tuple[str, str, str, List[Tuple[Dict[str, str], Any]]]]) -> str:
+    """OpenMetrics text for ``(name, type, help, [(labels, value), ...])`` families"""
+    lines = []
+    for name, kind, help_text, points in families:
+        name = OPENMETRICS_PREFIX + _om_name(name)
+        suffix = '_total' if kind == 'counter' else ''
+        lines.append(f'# TYPE {name} {kind}')
+        if help_text:
+            lines.append(f'# HELP {name} {help_text}')
+        for labels, value in points:
+            if value is not None:
+                lines.append(f'{name}{suffix}{_om_labels(labels)} {_om_number(value)}')
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+# Export formats and their content types
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+class _ChunkSink:
+    """Write-only file object whose contents are taken out piece by piece
+
+    Lets the Parquet writer stream: each finished row group is drained and
+    sent on, while tell() keeps counting for the file footer's offsets.
+    """
+    
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+    
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def writable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return False
+    
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def _export_parquet(rows, fields: List[str], chunk_rows: int):
+    """Parquet with one row group per ``chunk_rows`` rows; ts becomes a UTC timestamp"""
+    schema = pa.schema([('ts', pa.timestamp('ms', tz='UTC'))] + [(f, pa.float64()) for f in fields])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    
+    def row_group(batch: List[Dict]) -> bytes:
+        table = pa.table([pa.array([r['ts'] for r in batch], schema.field('ts').type)]
+                         + [pa.array([r.get(f) for r in batch], pa.float64()) for f in fields],
+                         schema=schema)
+        writer.write_table(table, row_group_size=chunk_rows)
+        return sink.drain()
+    
+    try:
+        batch: List[Dict] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_rows:
+                yield row_group(batch)
+                batch = []
+        if batch:
+            yield row_group(batch)
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export_rows(rows, fields: List[str], fmt: str, chunk_rows: int = 50_000, flush_chars: int = 1 << 20):
+    """Encode metric row dicts as ``fmt``, yielding bytes as it goes
+
+    Text formats are handed out every ``flush_chars`` characters and Parquet
+    once per row group of ``chunk_rows`` rows, so only that much is ever
+    held in memory.
+    """
+    if fmt == 'parquet':
+        yield from _export_parquet(rows, fields, chunk_rows)
+        return
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(['ts', 'timestamp'] + fields)
+        write = lambda row: writer.writerow([row['ts'], _from_epoch_ms(row['ts'])] + [row.get(f) for f in fields])
+    else:
+        write = lambda row: buffer.write(json.dumps(
+            dict({f: row.get(f) for f in fields}, ts=row['ts'], timestamp=_from_epoch_ms(row['ts'])),
+            separators=(',', ':')) + '\n')
+    for row in rows:
+        write(row)
+        if buffer.tell() >= flush_chars:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def export_metrics(db_manager: DatabaseManager, fmt: str, start_ms: int, end_ms: int,
+                   step_ms: Optional[int] = None, columns: Optional[List[str]] = None,
+                   host: Optional[str] = None, chunk_rows: int = 50_000) -> Tuple[Dict[str, Any], Any]:
+    """Stream stored metrics in [start_ms, end_ms) as CSV, JSON Lines or Parquet
+
+    Rows come from a cursor read with fetchmany (or the chunk store), so
+    memory stays flat however long the range; the cursor has a connection of
+    its own, outside the dashboard's reader pool. With ``step_ms`` every
+    column becomes avg, min and max per bucket; with ``host`` the rows
+    pushed by that agent are exported instead. Returns (info, byte chunks);
+    bad arguments raise ValueError before anything is read.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown format: {fmt}")
+    if fmt == 'parquet' and not pa.available():
+        raise ValueError(f"parquet export needs pyarrow: {pa.reason}")
+    columns = list(columns or METRIC_COLUMNS)
+    unknown = [c for c in columns if c not in METRIC_COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown column(s): {', '.join(unknown)}")
+    if end_ms <= start_ms:
+        raise ValueError("empty range")
+    if host is not None:
+        rows = db_manager.iter_fleet_metrics(host, start_ms, end_ms, step_ms, columns, dedicated=True)
+        tier = 'fleet'
+    else:
+        rows = db_manager.iter_metrics(start_ms, end_ms, step_ms, columns, dedicated=True)
+        tier, step_ms = next(rows)
+    fields = [f for c in columns for f in ((c, f'{c}_min', f'{c}_max') if step_ms else (c,))]
+    info = {'format': fmt, 'from': start_ms, 'to': end_ms, 'resolution': tier, 'step': step_ms or None,
+            'columns': fields}
+    return info, export_rows(rows, fields, fmt, chunk_rows)
+
+class ApiError(Exception):
+    """Bad API request (reported as HTTP 400 unless another status is given)"""
+    
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+class CachedResponse:
+    """A rendered response body with a content ETag and lazily compressed variants
+
+    Built once per data version (or once per process for static assets) and
+    shared by every request, so repeat hits cost a dict lookup, and clients
+    that already have the current version get a bodyless 304.
+    """
+    
+    ENCODINGS = ('gzip', 'deflate')  # server preference order
+    MIN_COMPRESS = 512  # smaller bodies are not worth compressing
+    
+    def __init__(self, body: bytes, content_type: str, cache_control: str = 'no-cache'):
+        self.body = body
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        self._encoded = {'identity': body}
+    
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """Best content coding the client accepts: gzip, deflate or identity"""
+        if not accept_encoding or len(self.body) < self.MIN_COMPRESS:
+            return 'identity'
+        accepted = {}
+        for item in accept_encoding.split(','):
+            name, _, params = item.partition(';')
+            q = 1.0
+            params = params.strip().lower()
+            if params.startswith('q='):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            accepted[name.strip().lower()] = q
+        for encoding in self.ENCODINGS:
+            if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+                return encoding
+        return 'identity'
+    
+    def etag(self, encoding: str = 'identity') -> str:
+        """Strong ETag; each content coding is a distinct representation"""
+        return f'"{self.digest}"' if encoding == 'identity' else f'"{self.digest}-{encoding}"'
+    
+    def matches(self, if_none_match: Optional[str], encoding: str = 'identity') -> bool:
+        """Whether an If-None-Match header names this representation"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        etag = self.etag(encoding)
+        return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+    
+    def encoded(self, encoding: str) -> bytes:
+        """Body in ``encoding``, compressed on first use"""
+        body = self._encoded.get(encoding)
+        if body is None:
+            if encoding == 'gzip':
+                body = gzip.compress(self.body, compresslevel=6, mtime=0)
+            else:
+                body = zlib.compress(self.body, 6)
+            self._encoded[encoding] = body
+        return body
+
+DASHBOARD_CSS = """\
+body { 
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
+    margin: 0; 
+    padding: 20px;
+    background: linear-gradient(-45deg, #ee7752, #e73c7e, #23a6d5, #23d5ab);
+    background-size: 400% 400%;
+    animation: gradientBG 15s ease infinite;
+    min-height: 100vh;
+    position: relative;
+    overflow-x: hidden;
+}
+@keyframes gradientBG {
+    0% { background-position: 0% 50%; }
+    50% { background-position: 100% 50%; }
+    100% { background-position: 0% 50%; }
+}
+body::before {
+    content: '';
+    position: fixed;
+    top: 0;
+    left: 0;
+    width: 100%;
+    height: 100%;
+    background: rgba(0, 0, 0, 0.3);
+    z-index: -1;
+    backdrop-filter: blur(2px);
+}
+.container { 
+    max-width: 1200px; 
+    margin: 0 auto; 
+    position: relative; 
+    z-index: 1; 
+}
+.header { 
+    background: rgba(44, 62, 80, 0.95); 
+    color: white; 
+    padding: 25px; 
+    border-radius: 15px; 
+    backdrop-filter: blur(15px); 
+    border: 2px solid rgba(255,255,255,0.1);
+    box-shadow: 0 12px 40px rgba(0,0,0,0.4);
+    text-align: center;
+    margin-bottom: 25px;
+}
+.header h1 {
+    margin: 0;
+    font-size: 2.5em;
+    text-shadow: 0 3px 6px rgba(0,0,0,0.5);
+    background: linear-gradient(45deg, #ff6b6b, #4ecdc4, #45b7d1, #96ceb4);
+    background-size: 400% 400%;
+    -webkit-background-clip: text;
+    -webkit-text-fill-color: transparent;
+    animation: gradient 3s ease infinite;
+}
+@keyframes gradient {
+    0%, 100% { background-position: 0% 50%; }
+    50% { background-position: 100% 50%; }
+}
+.metrics { 
+    display: grid; 
+    grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); 
+    gap: 25px; 
+    margin: 25px 0; 
+}
+.metric-card { 
+    background: rgba(255, 255, 255, 0.95); 
+    padding: 25px; 
+    border-radius: 15px; 
+    box-shadow: 0 12px 40px rgba(0,0,0,0.4); 
+    backdrop-filter: blur(15px);
+    border: 2px solid rgba(255,255,255,0.2);
+    transition: all 0.3s ease;
+    position: relative;
+    overflow: hidden;
+}
+.metric-card::before {
+    content: '';
+    position: absolute;
+    top: 0;
+    left: -100%;
+    width: 100%;
+    height: 100%;
+    background: linear-gradient(90deg, transparent, rgba(255,255,255,0.3), transparent);
+    transition: left 0.6s;
+}
+.metric-card:hover::before {
+    left: 100%;
+}
+.metric-card:hover {
+    transform: translateY(-5px);
+    box-shadow: 0 15px 50px rgba(0,0,0,0.5);
+}
+.metric-card h3 {
+    margin-top: 0;
+    color: #2c3e50;
+    font-size: 1.2em;
+}
+.metric-value { 
+    font-size: 2.5em; 
+    font-weight: bold; 
+    color: #3498db; 
+    text-shadow: 0 3px 6px rgba(0,0,0,0.3);
+    margin: 10px 0;
+}
+.alerts { 
+    background: rgba(255, 255, 255, 0.95); 
+    padding: 25px; 
+    border-radius: 15px; 
+    margin: 25px 0; 
+    backdrop-filter: blur(15px);
+    border: 2px solid rgba(255,255,255,0.2);
+    box-shadow: 0 12px 40px rgba(0,0,0,0.4);
+}
+.alert { 
+    padding: 15px; 
+    margin: 10px 0; 
+    border-radius: 8px; 
+    animation: pulse 2s infinite;
+}
+@keyframes pulse {
+    0%, 100% { opacity: 1; }
+    50% { opacity: 0.8; }
+}
+.alert.WARNING { 
+    background: rgba(243, 156, 18, 0.9); 
+    color: white; 
+    border-left: 5px solid #f39c12;
+}
+.alert.CRITICAL { 
+    background: rgba(231, 76, 60, 0.9); 
+    color: white; 
+    border-left: 5px solid #e74c3c;
+}
+.status { 
+    display: inline-block; 
+    padding: 8px 15px; 
+    border-radius: 20px; 
+    color: white; 
+    font-weight: bold;
+    text-transform: uppercase;
+    font-size: 0.8em;
+    letter-spacing: 1px;
+}
+.status.good { 
+    background: linear-gradient(45deg, #27ae60, #2ecc71); 
+    box-shadow: 0 4px 15px rgba(46, 204, 113, 0.4);
+}
+.status.warning { 
+    background: linear-gradient(45deg, #f39c12, #e67e22); 
+    box-shadow: 0 4px 15px rgba(243, 156, 18, 0.4);
+}
+.status.critical { 
+    background: linear-gradient(45deg, #e74c3c, #c0392b); 
+    box-shadow: 0 4px 15px rgba(231, 76, 60, 0.4);
+    animation: criticalBlink 1s infinite;
+}
+@keyframes criticalBlink {
+    0%, 100% { opacity: 1; }
+    50% { opacity: 0.7; }
+}
+.processes table {
+    width: 100%;
+    border-collapse: collapse;
+}
+.processes th, .processes td {
+    padding: 6px 10px;
+    text-align: right;
+    border-bottom: 1px solid rgba(0,0,0,0.08);
+}
+.processes th:first-child, .processes td:first-child {
+    text-align: left;
+}
+.stealth-info {
+    background: rgba(255, 255, 255, 0.95); 
+    padding: 20px; 
+    border-radius: 15px; 
+    backdrop-filter: blur(15px); 
+    border: 2px solid rgba(255,255,255,0.2); 
+    box-shadow: 0 12px 40px rgba(0,0,0,0.4);
+    text-align: center;
+    margin-top: 25px;
+}
+.stealth-badge {
+    display: inline-block;
+    background: linear-gradient(45deg, #8e44ad, #9b59b6);
+    color: white;
+    padding: 10px 20px;
+    border-radius: 25px;
+    font-weight: bold;
+    margin: 10px;
+    box-shadow: 0 4px 15px rgba(142, 68, 173, 0.4);
+}
+@media (max-width: 768px) {
+    .metrics { grid-template-columns: 1fr; }
+    .header h1 { font-size: 2em; }
+    .metric-value { font-size: 2em; }
+}
+@keyframes fadeInUp {
+    from {
+        opacity: 0;
+        transform: translateY(30px);
+    }
+    to {
+        opacity: 1;
+        transform: translateY(0);
+    }
+}
+"""
+
+DASHBOARD_JS = """\
+// Live updates: server-sent events, falling back to polling the JSON API
+function formatBytes(n) {
+    if (n === null || n === undefined) return 'n/a';
+    const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+    let i = 0;
+    while (n >= 1024 && i < units.length - 1) { n /= 1024; i++; }
+    return n.toFixed(1) + ' ' + units[i];
+}
+function formatRate(n) {
+    return n === null || n === undefined ? 'n/a' : formatBytes(n) + '/s';
+}
+function setText(id, text) {
+    const el = document.getElementById(id);
+    if (el) el.textContent = text;
+}
+function setStatus(id, value, warn, crit) {
+    const el = document.getElementById(id);
+    if (!el) return;
+    el.className = 'status ' + (value < warn ? 'good' : value < crit ? 'warning' : 'critical');
+    el.textContent = value < warn ? 'Normal' : value < crit ? 'High' : 'Critical';
+}
+function cell(row, text) {
+    const td = document.createElement('td');
+    td.textContent = text;
+    row.appendChild(td);
+}
+function applyMetrics(m) {
+    if (!m || m.cpu_percent === undefined) return;
+    setText('cpu-value', m.cpu_percent.toFixed(1) + '%');
+    setStatus('cpu-status', m.cpu_percent, 50, 80);
+    setText('cpu-cores', (m.cpu_per_core || []).map(p => p.toFixed(0) + '%').join(' · '));
+    setText('memory-value', m.memory_percent.toFixed(1) + '%');
+    setStatus('memory-status', m.memory_percent, 70, 85);
+    setText('disk-value', m.disk_usage.toFixed(1) + '%');
+    setStatus('disk-status', m.disk_usage, 80, 90);
+    setText('processes-value', m.processes_count);
+    setText('net-recv', formatRate(m.network_recv_rate));
+    setText('net-sent', formatRate(m.network_sent_rate));
+    setText('last-update', (m.timestamp || '').replace('T', ' ').slice(0, 19));
+    if (m.top_processes && m.top_processes.length) {
+        const table = document.createElement('table');
+        const head = table.insertRow();
+        ['Process', 'CPU', 'Memory', 'Read', 'Write', 'Open files'].forEach(h => {
+            const th = document.createElement('th');
+            th.textContent = h;
+            head.appendChild(th);
+        });
+        m.top_processes.forEach(p => {
+            const row = table.insertRow();
+            cell(row, p.name + ' (\u00d7' + (p.instances || 1) + ')');
+            cell(row, (p.cpu_percent || 0).toFixed(1) + '%');
+            cell(row, formatBytes(p.rss_bytes));
+            cell(row, formatRate(p.read_rate));
+            cell(row, formatRate(p.write_rate));
+            cell(row, p.open_files === undefined ? 'n/a' : p.open_files);
+        });
+        const box = document.getElementById('processes');
+        box.replaceChildren(table);
+    }
+}
+function applyAlerts(alerts) {
+    setText('alerts-count', alerts.length);
+    const box = document.getElementById('alerts');
+    if (!box) return;
+    if (!alerts.length) {
+        box.innerHTML = '<p>✅ No security threats detected</p>';
+        return;
+    }
+    box.replaceChildren(...alerts.map(a => {
+        const div = document.createElement('div');
+        div.className = 'alert ' + a.level;
+        const strong = document.createElement('strong');
+        strong.textContent = '🚨 ' + a.level;
+        const small = document.createElement('small');
+        small.textContent = ' - ' + a.timestamp;
+        div.append(strong, ': ' + a.message, small);
+        return div;
+    }));
+}
+let polling = null;
+function poll() {
+    fetch('/api/latest').then(r => r.json()).then(applyMetrics).catch(() => {});
+    fetch('/api/alerts').then(r => r.json()).then(d => applyAlerts(d.alerts)).catch(() => {});
+}
+function startPolling() {
+    if (polling) return;
+    setText('refresh-mode', 'Polling every 15 seconds');
+    polling = setInterval(poll, 15000);
+}
+document.addEventListener('DOMContentLoaded', function() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    const events = new EventSource('/events');
+    events.addEventListener('metrics', e => {
+        applyMetrics(JSON.parse(e.data));
+        const points = document.getElementById('data-points');
+        if (points) points.textContent = (parseInt(points.textContent, 10) || 0) + 1;
+    });
+    events.addEventListener('alerts', e => applyAlerts(JSON.parse(e.data).alerts));
+    events.onopen = () => setText('refresh-mode', 'Live (server-sent events)');
+    events.onerror = () => {
+        // EventSource retries on its own; poll meanwhile so the page never goes stale
+        if (events.readyState === EventSource.CLOSED) startPolling();
+        else poll();
+    };
+});
+
+// Add some dynamic effects
+document.addEventListener('DOMContentLoaded', function() {
+    const cards = document.querySelectorAll('.metric-card');
+    cards.forEach((card, index) => {
+        card.style.animationDelay = (index * 0.1) + 's';
+        card.style.animation = 'fadeInUp 0.6s ease forwards';
+    });
+});
+"""
+
+# Served under /static/ with a content hash in the URL, so browsers may cache them forever
+STATIC_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+STATIC_ASSETS = {
+    'dashboard.css': CachedResponse(DASHBOARD_CSS.encode('utf-8'), 'text/css; charset=utf-8',
+                                    STATIC_CACHE_CONTROL),
+    'dashboard.js': CachedResponse(DASHBOARD_JS.encode('utf-8'), 'application/javascript; charset=utf-8',
+                                   STATIC_CACHE_CONTROL),
+}
+
+def _static_url(name: str) -> str:
+    """Versioned URL of a static asset"""
+    return f"/static/{name}?v={STATIC_ASSETS[name].digest}"
+
+def _status_html(element_id: str, value: float, warn: float, critical: float) -> str:
+    """Status pill for a percentage with warning and critical thresholds"""
+    if value < warn:
+        css_class, label = 'good', 'Normal'
+    elif value < critical:
+        css_class, label = 'warning', 'High'
+    else:
+        css_class, label = 'critical', 'Critical'
+    return f'<span id="{element_id}" class="status {css_class}">{label}</span>'
+
+# Dynamic part of the dashboard, compiled once; values are filled in per data version
+DASHBOARD_TEMPLATE = string.Template("""\
+<!DOCTYPE html>
+<html>
+<head>
+    <title>🔥 Stealth Monitor Dashboard</title>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <link rel="stylesheet" href="$css_url">
+    <script src="$js_url" defer></script>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🔥 STEALTH MONITOR 🔥</h1>
+            <p>🕵️ Silent System Surveillance • Last update: <span id="last-update">$last_update</span></p>
+            <div class="stealth-badge">🔒 HIDDEN MODE ACTIVE</div>
+            <div class="stealth-badge">🌐 Dashboard: localhost:$port</div>
+        </div>
+        
+        <div class="metrics">
+            <div class="metric-card">
+                <h3>🖥️ CPU Usage</h3>
+                <div class="metric-value" id="cpu-value">$cpu_value</div>
+                $cpu_status
+                <p><small id="cpu-cores">$cpu_cores</small></p>
+            </div>
+            
+            <div class="metric-card">
+                <h3>🧠 Memory Usage</h3>
+                <div class="metric-value" id="memory-value">$memory_value</div>
+                $memory_status
+            </div>
+            
+            <div class="metric-card">
+                <h3>💾 Disk Usage</h3>
+                <div class="metric-value" id="disk-value">$disk_value</div>
+                $disk_status
+                $disks
+            </div>
+            
+            <div class="metric-card">
+                <h3>⚙️ Active Processes</h3>
+                <div class="metric-value" id="processes-value">$processes_count</div>
+                <span class="status good">Running</span>
+            </div>
+            
+            <div class="metric-card">
+                <h3>🌐 Network</h3>
+                <div class="metric-value" id="net-recv">$net_recv</div>
+                <p><small>⬇ received · ⬆ <span id="net-sent">$net_sent</span> sent</small></p>
+                $network_chart
+            </div>
+        </div>
+        
+        <div class="alerts processes">
+            <h2>⚙️ Top Processes</h2>
+            <div id="processes">$processes</div>
+        </div>
+        
+        <div class="alerts">
+            <h2>🚨 Security Alerts (<span id="alerts-count">$alerts_count</span>)</h2>
+            <div id="alerts">$alerts</div>
+        </div>
+        
+        <div class="stealth-info">
+            <h2>🕵️ Stealth Operation Status</h2>
+            <p><strong>📊 Data Points Collected:</strong> <span id="data-points">$data_points</span></p>
+            <p><strong>🔄 Auto-Refresh:</strong> <span id="refresh-mode">Live updates</span></p>
+            <p><strong>🛑 Stop Monitor:</strong> Press F12 key</p>
+            <p><strong>📸 Screenshots:</strong> Captured every 60 seconds</p>
+            <div class="stealth-badge">🔥 FULLY OPERATIONAL</div>
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+# Fleet overview served by a collector; rendered per request from the hosts table
+FLEET_TEMPLATE = string.Template("""\
+<!DOCTYPE html>
+<html>
+<head>
+    <title>🌐 Fleet Monitor</title>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <meta http-equiv="refresh" content="$refresh">
+    <link rel="stylesheet" href="$css_url">
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🌐 FLEET MONITOR</h1>
+            <p>$hosts_up of $hosts_total hosts reporting • Last update: $last_update</p>
+        </div>
+        
+        <div class="alerts processes">
+            <h2>🖥️ Hosts</h2>
+            $hosts
+        </div>
+        
+        <div class="alerts">
+            <h2>🚨 Fleet Alerts ($alerts_count)</h2>
+            $alerts
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+class FleetCollector:
+    """Receives agent pushes on /api/push and stores them per host
+
+    Payloads are the gzipped JSON batches sent by PushClient. When ``token``
+    is set agents must send it as a bearer token. Bodies are capped before
+    and after decompression, and every push is one short write transaction.
+    A host is reported stale once nothing arrived for ``stale_after`` of its
+    push intervals.
+    """
+    
+    HOST_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._:-]{0,252}$')
+    
+    def __init__(self, db_manager: DatabaseManager, token: Optional[str] = None,
+                 max_body: int = 4 << 20, max_payload: int = 32 << 20, stale_after: float = 3.0):
+        self.db = db_manager
+        self.token = token
+        self.max_body = max_body
+        self.max_payload = max_payload
+        self.stale_after = stale_after
+        self.received = 0
+        self.rejected = 0
+        self.rows = 0
+    
+    def _authorized(self, authorization: Optional[str]) -> bool:
+        if not self.token:
+            return True
+        scheme, _, credentials = (authorization or '').partition(' ')
+        return (scheme.lower() == 'bearer'
+                and hmac.compare_digest(credentials.strip().encode('utf-8'), self.token.encode('utf-8')))
+    
+    def admit(self, authorization: Optional[str], length: int):
+        """Check a push's headers before its body is read; raises ApiError"""
+        try:
+            if not self._authorized(authorization):
+                raise ApiError("Unauthorized", 401)
+            if length < 0:
+                raise ApiError("Invalid Content-Length", 400)
+            if length > self.max_body:
+                raise ApiError("Payload too large", 413)
+        except ApiError:
+            self.rejected += 1
+            raise
+    
+    def ingest(self, body: bytes, encoding: Optional[str] = None, authorization: Optional[str] = None,
+               address: Optional[str] = None) -> int:
+        """Validate and store one push; returns the rows stored, raises ApiError"""
+        try:
+            rows = self._ingest(body, encoding, authorization, address)
+        except ApiError:
+            self.rejected += 1
+            raise
+        self.received += 1
+        self.rows += rows
+        return rows
+    
+    def _ingest(self, body: bytes, encoding: Optional[str], authorization: Optional[str],
+                address: Optional[str]) -> int:
+        if not self._authorized(authorization):
+            raise ApiError("Unauthorized", 401)
+        if len(body) > self.max_body:
+            raise ApiError("Payload too large", 413)
+        try:
+            if encoding == 'gzip':
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                body = decompressor.decompress(body, self.max_payload)
+                if decompressor.unconsumed_tail:
+                    raise ApiError("Payload too large", 413)
+            elif encoding not in (None, '', 'identity'):
+                raise ApiError(f"Unsupported encoding: {encoding}", 415)
+            payload = json.loads(body)
+        except (zlib.error, ValueError) as e:
+            raise ApiError(f"Invalid payload: {e}")
+        try:
+            host, interval, columns, metrics, alerts, samples = self._validate(payload)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ApiError(f"Invalid payload: {type(e).__name__}: {e}")
+        self.db.write_fleet_batch(host, address, interval, columns, metrics, alerts, samples)
+        return len(metrics) + len(alerts) + len(samples)
+    
+    @staticmethod
+    def _number(value: Any) -> Optional[float]:
+        if value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)):
+            return value
+        raise TypeError(f"not a number: {value!r}")
+    
+    @staticmethod
+    def _ts(value: Any) -> int:
+        if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+            return value
+        raise ValueError(f"bad timestamp: {value!r}")
+    
+    def _validate(self, payload: Dict[str, Any]):
+        """Checked and normalised (host, interval, columns, metrics, alerts, samples)"""
+        host = payload['host']
+        if not isinstance(host, str) or not self.HOST_PATTERN.match(host):
+            raise ValueError(f"bad host: {host!r}")
+        interval = self._number(payload.get('interval'))
+        columns = [str(c) for c in payload.get('columns', [])]
+        metrics = []
+        for row in payload.get('metrics', []):
+            if len(row) != len(columns) + 1:
+                raise ValueError("metric row does not match columns")
+            metrics.append([self._ts(row[0])] + [self._number(v) for v in row[1:]])
+        alerts = [{'id': str(a['id']), 'level': str(a['level']), 'message': str(a['message']),
+                   'ts': self._ts(a['ts']), 'resolved': bool(a.get('resolved')),
+                   'value': self._number(a.get('value'))}
+                  for a in payload.get('alerts', [])]
+        samples = [(str(metric), {str(k): str(v) for k, v in (labels or {}).items()},
+                    self._ts(ts), self._number(value))
+                   for metric, labels, ts, value in payload.get('samples', [])]
+        return host, interval, columns, metrics, alerts, samples
+    
+    def hosts(self) -> List[Dict]:
+        """Every known host with its latest values and an up/stale status"""
+        now_ms = _to_epoch_ms(datetime.now())
+        hosts = self.db.get_fleet_hosts()
+        for host in hosts:
+            limit_ms = self.stale_after * (host['interval'] or 10.0) * 1000
+            host['status'] = 'up' if now_ms - host['last_seen'] <= limit_ms else 'stale'
+            host['last_seen_timestamp'] = _from_epoch_ms(host['last_seen'])
+        return hosts
+
+class DashboardServer(HTTPServer):
+    """HTTP server that hands connections to a bounded worker pool
+
+    At most ``max_workers`` connections are served at once and up to
+    ``max_pending`` more wait for a worker; beyond that clients get an
+    immediate 503 instead of piling up threads. Idle keep-alive and slow
+    clients are dropped after ``request_timeout`` seconds, and at most
+    ``max_streams`` workers may be held by event streams.
+    """
+    
+    daemon_threads = True
+    # socketserver's default backlog of 5 refuses connections when many agents push at once
+    request_queue_size = 128
+    
+    def __init__(self, server_address, dashboard: "WebDashboard", max_workers: int = 16,
+                 max_pending: int = 64, max_streams: int = 8, request_timeout: float = 15.0):
+        self.dashboard = dashboard
+        self.request_timeout = request_timeout
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dashboard")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._active: set = set()
+        self._active_lock = threading.Lock()
+        self.closing = threading.Event()
+        self.stream_slots = threading.BoundedSemaphore(max(1, min(max_streams, max_workers - 1)))
+        super().__init__(server_address, DashboardHandler)
+    
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            # Saturated: answer without occupying a worker
+            try:
+                request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n"
+                                b"Retry-After: 1\r\nConnection: close\r\n\r\n")
+            except OSError:
                 pass
+            self.shutdown_request(request)
+            return
+        try:
+            self.pool.submit(self._process, request, client_address)
+        except RuntimeError:
+            # Pool already shut down
+            self._slots.release()
+            self.shutdown_request(request)
     
-    def on_mouse_scroll(self, x, y, dx, dy):
-        """Handle mouse scroll events"""
+    def _process(self, request, client_address):
+        with self._active_lock:
+            self._active.add(request)
         try:
-            self.db.insert_activity("mouse", f"Scroll at ({x}, {y}) delta=({dx}, {dy})")
-        except:
-            pass
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            with self._active_lock:
+                self._active.discard(request)
+            self.shutdown_request(request)
+            self._slots.release()
     
-    def screenshot_loop(self):
-        """Periodic screenshot capture"""
-        while self.running:
+    def handle_error(self, request, client_address):
+        pass  # Silent operation
+    
+    def server_close(self):
+        self.closing.set()
+        super().server_close()
+        if self.dashboard.events is not None:
+            self.dashboard.events.publish(None, None)  # Wake idle event streams
+        # Wake workers blocked on idle keep-alive or streaming connections
+        with self._active_lock:
+            active = list(self._active)
+        for request in active:
             try:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                path = self.screenshot_dir / f"screenshot_{timestamp}.png"
-                
-                screenshot = pyautogui.screenshot()
-                screenshot.save(path)
-                self.db.insert_activity("screenshot", f"Screenshot saved: {path.name}")
-                
-            except:
-                pass  # Silent operation
-            
-            time.sleep(self.screenshot_interval)
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.pool.shutdown(wait=False, cancel_futures=True)
 
 class DashboardHandler(BaseHTTPRequestHandler):
-    """Fixed HTTP request handler"""
+    """Fixed HTTP request handler
+
+    Served by DashboardServer, which owns the single shared WebDashboard.
+    """
     
-    def __init__(self, *args, db_manager=None, **kwargs):
-        self.db_manager = db_manager
-        super().__init__(*args, **kwargs)
+    protocol_version = 'HTTP/1.1'  # keep-alive; every response needs a length or chunking
+    
+    def setup(self):
+        self.timeout = getattr(self.server, 'request_timeout', None)
+        super().setup()
     
     def do_GET(self):
         """Handle GET requests"""
+        self.streaming = False
         try:
-            if self.path == '/' or self.path == '/dashboard':
-                self.send_response(200)
-                self.send_header('Content-type', 'text/html; charset=utf-8')
-                self.send_header('Cache-Control', 'no-cache')
-                self.end_headers()
-                
-                dashboard = WebDashboard(self.db_manager)
-                html = dashboard.get_dashboard_html()
-                self.wfile.write(html.encode('utf-8'))
+            url = urllib.parse.urlsplit(self.path)
+            path = url.path
+            params = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+            dashboard = self.server.dashboard
+            
+            if dashboard.fleet is not None and (path == '/fleet' or (path == '/' and dashboard.recent is None)):
+                # A collector without local data opens on the fleet view
+                self._send_cached(dashboard.fleet_response())
+            elif path == '/' or path == '/dashboard':
+                self._send_cached(dashboard.dashboard_response())
+            elif path.startswith('/static/') and path[len('/static/'):] in STATIC_ASSETS:
+                self._send_cached(STATIC_ASSETS[path[len('/static/'):]])
+            elif path == '/events' and dashboard.events is not None:
+                self._stream_events(dashboard)
+            elif path == '/metrics':
+                self._send_cached(dashboard.metrics_response())
+            elif path == '/api/latest':
+                self._send_json(dashboard.api_latest())
+            elif path == '/api/alerts':
+                self._send_json(dashboard.api_alerts())
+            elif path == '/api/status':
+                self._send_json(dashboard.api_status())
+            elif path == '/api/alerts/history':
+                self._send_json(dashboard.api_alert_history(params))
+            elif path == '/api/metrics':
+                header, rows = dashboard.api_metrics(params)
+                self._stream_json(header, 'points', rows)
+            elif path == '/api/export':
+                info, chunks = dashboard.api_export(params)
+                self._stream_body(EXPORT_FORMATS[info['format']], chunks, {
+                    'Content-Disposition': f'attachment; filename="metrics.{info["format"]}"',
+                    'X-Resolution': info['resolution']})
+            elif path == '/api/fleet' and dashboard.fleet is not None:
+                self._send_json(dashboard.api_fleet())
+            elif path == '/api/fleet/alerts' and dashboard.fleet is not None:
+                self._send_json(dashboard.api_fleet_alerts(params))
+            elif path == '/api/fleet/metrics' and dashboard.fleet is not None:
+                header, rows = dashboard.api_fleet_metrics(params)
+                self._stream_json(header, 'points', rows)
             else:
                 self.send_error(404)
+        except ApiError as e:
+            self._send_json({'error': str(e)}, status=e.status)
         except Exception as e:
-            self.send_error(500)
+            # The response may be half written; never reuse this connection
+            self.close_connection = True
+            if self.streaming:
+                return  # Headers are out; the missing last chunk tells the client it failed
+            try:
+                self.send_error(500)
+            except OSError:
+                pass
+    
+    def do_POST(self):
+        """Handle POST requests: agent pushes to a collector"""
+        try:
+            fleet = self.server.dashboard.fleet
+            if urllib.parse.urlsplit(self.path).path != '/api/push' or fleet is None:
+                self.close_connection = True  # The body is never read
+                self.send_error(404)
+                return
+            try:
+                length = int(self.headers.get('Content-Length', ''))
+            except ValueError:
+                self.close_connection = True
+                self.send_error(411)
+                return
+            try:
+                fleet.admit(self.headers.get('Authorization'), length)
+            except ApiError:
+                self.close_connection = True  # The body is never read
+                raise
+            body = self.rfile.read(min(length, fleet.max_body))
+            rows = fleet.ingest(body, self.headers.get('Content-Encoding'), self.headers.get('Authorization'),
+                                self.client_address[0])
+            self._send_json({'stored': rows})
+        except ApiError as e:
+            self._send_json({'error': str(e)}, status=e.status)
+        except Exception:
+            self.close_connection = True
+            try:
+                self.send_error(500)
+            except OSError:
+                pass
+    
+    def _stream_events(self, dashboard: "WebDashboard", keepalive: float = 5.0):
+        """Server-sent events: push samples and alert changes as they happen"""
+        slots = getattr(self.server, 'stream_slots', None)
+        if slots is not None and not slots.acquire(blocking=False):
+            # Too many open streams; the page falls back to polling
+            self.send_error(503)
+            return
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.streaming = True
+        
+        subscription = dashboard.events.subscribe()
+        try:
+            self.wfile.write(b'retry: 5000\n\n')
+            latest = dashboard.api_latest()
+            if latest:
+                self._write_event('metrics', latest)
+            closing = getattr(self.server, 'closing', None)
+            while closing is None or not closing.is_set():
+                try:
+                    event, data = subscription.get(timeout=keepalive)
+                except queue.Empty:
+                    self.wfile.write(b': keepalive\n\n')
+                    self.wfile.flush()
+                    continue
+                if event is not None:  # None only wakes the loop to re-check closing
+                    self._write_event(event, data)
+        except (OSError, ValueError):
+            pass  # Client went away or timed out
+        finally:
+            dashboard.events.unsubscribe(subscription)
+            if slots is not None:
+                slots.release()
+    
+    def _write_event(self, event: str, data: Any):
+        payload = json.dumps(data, separators=(',', ':'))
+        self.wfile.write(f'event: {event}\ndata: {payload}\n\n'.encode('utf-8'))
+        self.wfile.flush()
+    
+    def _send_cached(self, response: CachedResponse):
+        """Send a cached body, honouring If-None-Match and Accept-Encoding"""
+        encoding = response.negotiate(self.headers.get('Accept-Encoding'))
+        not_modified = response.matches(self.headers.get('If-None-Match'), encoding)
+        body = b'' if not_modified else response.encoded(encoding)
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', response.etag(encoding))
+        self.send_header('Cache-Control', response.cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        if not not_modified:
+            self.send_header('Content-type', response.content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if encoding != 'identity':
+                self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_json(self, obj, status: int = 200):
+        """Send a complete JSON response"""
+        body = json.dumps(obj, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _stream_json(self, header: Dict, key: str, rows):
+        """Stream ``header`` as a JSON object whose ``key`` array is written row by row"""
+        try:
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.streaming = True
+            head = json.dumps(header, separators=(',', ':'))
+            buffer = [head[:-1] + (',' if header else '') + f'"{key}":[']
+            first = True
+            for row in rows:
+                buffer.append(('' if first else ',') + json.dumps(row, separators=(',', ':')))
+                first = False
+                if len(buffer) >= 256:
+                    self._write_chunk(''.join(buffer).encode('utf-8'))
+                    buffer = []
+            buffer.append(']}')
+            self._write_chunk(''.join(buffer).encode('utf-8'))
+            self.wfile.write(b'0\r\n\r\n')
+        finally:
+            rows.close()  # Returns the reader connection if the client went away
+    
+    def _stream_body(self, content_type: str, chunks, headers: Optional[Dict[str, str]] = None):
+        """Stream an iterator of byte chunks with chunked transfer encoding"""
+        try:
+            self.send_response(200)
+            self.send_header('Content-type', content_type)
+            self.send_header('Cache-Control', 'no-cache')
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.streaming = True
+            for data in chunks:
+                if data:
+                    self._write_chunk(data)
+            self.wfile.write(b'0\r\n\r\n')
+        finally:
+            chunks.close()  # Returns the reader connection if the client went away
+    
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
     
     def log_message(self, format, *args):
         """Suppress server logs for stealth"""
@@ -392,18 +5305,45 @@ class DashboardHandler(BaseHTTPRequestHandler):
 class WebDashboard:
     """Web-based monitoring dashboard with animated background"""
     
-    def __init__(self, db_manager: DatabaseManager, port: int = 8080):
+    def __init__(self, db_manager: DatabaseManager, port: int = 8080,
+                 recent: Optional[MetricsRingBuffer] = None, events: Optional[EventBus] = None,
+                 alert_manager: Optional[AlertManager] = None,
+                 registry: Optional[CollectorRegistry] = None, writer: Optional[BatchWriter] = None,
+                 status: Optional[Callable[[], Dict[str, Any]]] = None,
+                 fleet: Optional[FleetCollector] = None, bind_address: str = 'localhost', **server_options):
         self.db = db_manager
         self.port = port
+        self.bind_address = bind_address
+        self.recent = recent
+        self.events = events
+        self.alert_manager = alert_manager
+        # Self-metrics sources for /metrics
+        self.registry = registry
+        self.writer = writer
+        # Startup timings and disabled components for /api/status
+        self.status = status
+        # Set on a collector: accepts /api/push and serves /fleet
+        self.fleet = fleet
+        self._page_cache: Optional[Tuple[Any, CachedResponse]] = None
+        self._metrics_cache: Optional[Tuple[Any, CachedResponse]] = None
+        # Passed to DashboardServer (max_workers, max_pending, max_streams, request_timeout)
+        self.server_options = server_options
         self.server = None
     
     def get_dashboard_html(self) -> str:
-        """Generate dashboard HTML with animated background"""
+        """Render the dashboard page from the pre-compiled template"""
         try:
-            metrics = self.db.get_recent_metrics(1)  # Last hour
-            alerts = self.db.get_active_alerts()
+            latest = self.recent.latest() if self.recent is not None else None
+            if latest is not None:
+                # Served from memory; SQLite is only a fallback before the first sample
+                data_points = self.recent.count_since(3600)
+            else:
+                metrics = self.db.get_recent_metrics(1)  # Last hour
+                latest = metrics[0] if metrics else None
+                data_points = len(metrics)
+            alerts = self.active_alerts()
             
-            latest_metrics = metrics[0] if metrics else {
+            latest_metrics = latest or {
                 'cpu_percent': 0,
                 'memory_percent': 0,
                 'disk_usage': 0,
@@ -419,327 +5359,394 @@ class WebDashboard:
                 'temperature': None
             }
             alerts = []
+            data_points = 0
         
-        return f'''
-<!DOCTYPE html>
-<html>
-<head>
-    <title>🔥 Stealth Monitor Dashboard</title>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <style>
-        body {{ 
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-            margin: 0; 
-            padding: 20px;
-            background: linear-gradient(-45deg, #ee7752, #e73c7e, #23a6d5, #23d5ab);
-            background-size: 400% 400%;
-            animation: gradientBG 15s ease infinite;
-            min-height: 100vh;
-            position: relative;
-            overflow-x: hidden;
-        }}
-        @keyframes gradientBG {{
-            0% {{ background-position: 0% 50%; }}
-            50% {{ background-position: 100% 50%; }}
-            100% {{ background-position: 0% 50%; }}
-        }}
-        body::before {{
-            content: '';
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0, 0, 0, 0.3);
-            z-index: -1;
-            backdrop-filter: blur(2px);
-        }}
-        .container {{ 
-            max-width: 1200px; 
-            margin: 0 auto; 
-            position: relative; 
-            z-index: 1; 
-        }}
-        .header {{ 
-            background: rgba(44, 62, 80, 0.95); 
-            color: white; 
-            padding: 25px; 
-            border-radius: 15px; 
-            backdrop-filter: blur(15px); 
-            border: 2px solid rgba(255,255,255,0.1);
-            box-shadow: 0 12px 40px rgba(0,0,0,0.4);
-            text-align: center;
-            margin-bottom: 25px;
-        }}
-        .header h1 {{
-            margin: 0;
-            font-size: 2.5em;
-            text-shadow: 0 3px 6px rgba(0,0,0,0.5);
-            background: linear-gradient(45deg, #ff6b6b, #4ecdc4, #45b7d1, #96ceb4);
-            background-size: 400% 400%;
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            animation: gradient 3s ease infinite;
-        }}
-        @keyframes gradient {{
-            0%, 100% {{ background-position: 0% 50%; }}
-            50% {{ background-position: 100% 50%; }}
-        }}
-        .metrics {{ 
-            display: grid; 
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); 
-            gap: 25px; 
-            margin: 25px 0; 
-        }}
-        .metric-card {{ 
-            background: rgba(255, 255, 255, 0.95); 
-            padding: 25px; 
-            border-radius: 15px; 
-            box-shadow: 0 12px 40px rgba(0,0,0,0.4); 
-            backdrop-filter: blur(15px);
-            border: 2px solid rgba(255,255,255,0.2);
-            transition: all 0.3s ease;
-            position: relative;
-            overflow: hidden;
-        }}
-        .metric-card::before {{
-            content: '';
-            position: absolute;
-            top: 0;
-            left: -100%;
-            width: 100%;
-            height: 100%;
-            background: linear-gradient(90deg, transparent, rgba(255,255,255,0.3), transparent);
-            transition: left 0.6s;
-        }}
-        .metric-card:hover::before {{
-            left: 100%;
-        }}
-        .metric-card:hover {{
-            transform: translateY(-5px);
-            box-shadow: 0 15px 50px rgba(0,0,0,0.5);
-        }}
-        .metric-card h3 {{
-            margin-top: 0;
-            color: #2c3e50;
-            font-size: 1.2em;
-        }}
-        .metric-value {{ 
-            font-size: 2.5em; 
-            font-weight: bold; 
-            color: #3498db; 
-            text-shadow: 0 3px 6px rgba(0,0,0,0.3);
-            margin: 10px 0;
-        }}
-        .alerts {{ 
-            background: rgba(255, 255, 255, 0.95); 
-            padding: 25px; 
-            border-radius: 15px; 
-            margin: 25px 0; 
-            backdrop-filter: blur(15px);
-            border: 2px solid rgba(255,255,255,0.2);
-            box-shadow: 0 12px 40px rgba(0,0,0,0.4);
-        }}
-        .alert {{ 
-            padding: 15px; 
-            margin: 10px 0; 
-            border-radius: 8px; 
-            animation: pulse 2s infinite;
-        }}
-        @keyframes pulse {{
-            0%, 100% {{ opacity: 1; }}
-            50% {{ opacity: 0.8; }}
-        }}
-        .alert.WARNING {{ 
-            background: rgba(243, 156, 18, 0.9); 
-            color: white; 
-            border-left: 5px solid #f39c12;
-        }}
-        .alert.CRITICAL {{ 
-            background: rgba(231, 76, 60, 0.9); 
-            color: white; 
-            border-left: 5px solid #e74c3c;
-        }}
-        .status {{ 
-            display: inline-block; 
-            padding: 8px 15px; 
-            border-radius: 20px; 
-            color: white; 
-            font-weight: bold;
-            text-transform: uppercase;
-            font-size: 0.8em;
-            letter-spacing: 1px;
-        }}
-        .status.good {{ 
-            background: linear-gradient(45deg, #27ae60, #2ecc71); 
-            box-shadow: 0 4px 15px rgba(46, 204, 113, 0.4);
-        }}
-        .status.warning {{ 
-            background: linear-gradient(45deg, #f39c12, #e67e22); 
-            box-shadow: 0 4px 15px rgba(243, 156, 18, 0.4);
-        }}
-        .status.critical {{ 
-            background: linear-gradient(45deg, #e74c3c, #c0392b); 
-            box-shadow: 0 4px 15px rgba(231, 76, 60, 0.4);
-            animation: criticalBlink 1s infinite;
-        }}
-        @keyframes criticalBlink {{
-            0%, 100% {{ opacity: 1; }}
-            50% {{ opacity: 0.7; }}
-        }}
-        .stealth-info {{
-            background: rgba(255, 255, 255, 0.95); 
-            padding: 20px; 
-            border-radius: 15px; 
-            backdrop-filter: blur(15px); 
-            border: 2px solid rgba(255,255,255,0.2); 
-            box-shadow: 0 12px 40px rgba(0,0,0,0.4);
-            text-align: center;
-            margin-top: 25px;
-        }}
-        .stealth-badge {{
-            display: inline-block;
-            background: linear-gradient(45deg, #8e44ad, #9b59b6);
-            color: white;
-            padding: 10px 20px;
-            border-radius: 25px;
-            font-weight: bold;
-            margin: 10px;
-            box-shadow: 0 4px 15px rgba(142, 68, 173, 0.4);
-        }}
-        @media (max-width: 768px) {{
-            .metrics {{ grid-template-columns: 1fr; }}
-            .header h1 {{ font-size: 2em; }}
-            .metric-value {{ font-size: 2em; }}
-        }}
-    </style>
-    <script>
-        // Auto-refresh every 15 seconds for stealth mode
-        setTimeout(function(){{ location.reload(); }}, 15000);
-        
-        // Add some dynamic effects
-        document.addEventListener('DOMContentLoaded', function() {{
-            const cards = document.querySelectorAll('.metric-card');
-            cards.forEach((card, index) => {{
-                card.style.animationDelay = (index * 0.1) + 's';
-                card.style.animation = 'fadeInUp 0.6s ease forwards';
-            }});
-        }});
-        
-        const style = document.createElement('style');
-        style.textContent = `
-            @keyframes fadeInUp {{
-                from {{
-                    opacity: 0;
-                    transform: translateY(30px);
-                }}
-                to {{
-                    opacity: 1;
-                    transform: translateY(0);
-                }}
-            }}
-        `;
-        document.head.appendChild(style);
-    </script>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🔥 STEALTH MONITOR 🔥</h1>
-            <p>🕵️ Silent System Surveillance • Last update: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>
-            <div class="stealth-badge">🔒 HIDDEN MODE ACTIVE</div>
-            <div class="stealth-badge">🌐 Dashboard: localhost:{self.port}</div>
-        </div>
+        latest_object = self.recent.latest_metrics() if self.recent is not None else None
+        cpu_cores = " · ".join(f"{p:.0f}%" for p in latest_object.cpu_per_core) if latest_object else ""
+        cpu = latest_metrics.get('cpu_percent', 0) or 0
+        memory = latest_metrics.get('memory_percent', 0) or 0
+        disk = latest_metrics.get('disk_usage', 0) or 0
+        # The sample time rather than the render time, so cached pages stay truthful
+        timestamp = latest_metrics.get('timestamp')
+        last_update = (str(timestamp).replace('T', ' ')[:19] if timestamp
+                       else datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
         
-        <div class="metrics">
-            <div class="metric-card">
-                <h3>🖥️ CPU Usage</h3>
-                <div class="metric-value">{latest_metrics.get('cpu_percent', 0):.1f}%</div>
-                <span class="status {'good' if latest_metrics.get('cpu_percent', 0) < 50 else 'warning' if latest_metrics.get('cpu_percent', 0) < 80 else 'critical'}">
-                    {'Normal' if latest_metrics.get('cpu_percent', 0) < 50 else 'High' if latest_metrics.get('cpu_percent', 0) < 80 else 'Critical'}
-                </span>
-            </div>
-            
-            <div class="metric-card">
-                <h3>🧠 Memory Usage</h3>
-                <div class="metric-value">{latest_metrics.get('memory_percent', 0):.1f}%</div>
-                <span class="status {'good' if latest_metrics.get('memory_percent', 0) < 70 else 'warning' if latest_metrics.get('memory_percent', 0) < 85 else 'critical'}">
-                    {'Normal' if latest_metrics.get('memory_percent', 0) < 70 else 'High' if latest_metrics.get('memory_percent', 0) < 85 else 'Critical'}
-                </span>
-            </div>
-            
-            <div class="metric-card">
-                <h3>💾 Disk Usage</h3>
-                <div class="metric-value">{latest_metrics.get('disk_usage', 0):.1f}%</div>
-                <span class="status {'good' if latest_metrics.get('disk_usage', 0) < 80 else 'warning' if latest_metrics.get('disk_usage', 0) < 90 else 'critical'}">
-                    {'Normal' if latest_metrics.get('disk_usage', 0) < 80 else 'High' if latest_metrics.get('disk_usage', 0) < 90 else 'Critical'}
-                </span>
-            </div>
-            
-            <div class="metric-card">
-                <h3>⚙️ Active Processes</h3>
-                <div class="metric-value">{latest_metrics.get('processes_count', 0)}</div>
-                <span class="status good">Running</span>
-            </div>
-        </div>
+        return DASHBOARD_TEMPLATE.substitute(
+            css_url=_static_url('dashboard.css'),
+            js_url=_static_url('dashboard.js'),
+            last_update=last_update,
+            port=self.port,
+            cpu_value=f"{cpu:.1f}%",
+            cpu_status=_status_html('cpu-status', cpu, 50, 80),
+            cpu_cores=cpu_cores,
+            memory_value=f"{memory:.1f}%",
+            memory_status=_status_html('memory-status', memory, 70, 85),
+            disk_value=f"{disk:.1f}%",
+            disk_status=_status_html('disk-status', disk, 80, 90),
+            disks=self._format_disks(latest_object),
+            processes_count=latest_metrics.get('processes_count', 0),
+            net_recv=_format_rate(latest_metrics.get('network_recv_rate')),
+            net_sent=_format_rate(latest_metrics.get('network_sent_rate')),
+            network_chart=self._network_chart(),
+            processes=self._format_processes(latest_object.top_processes if latest_object else []),
+            alerts_count=len(alerts),
+            alerts=self._format_alerts(alerts),
+            data_points=data_points,
+        )
+    
+    def dashboard_response(self) -> "CachedResponse":
+        """The rendered dashboard, re-rendered only when the data version changes"""
+        version = self.data_version()
+        cached = self._page_cache
+        if version is not None and cached is not None and cached[0] == version:
+            return cached[1]
+        response = CachedResponse(self.get_dashboard_html().encode('utf-8'), 'text/html; charset=utf-8')
+        self._page_cache = (version, response)
+        return response
+    
+    def metrics_response(self) -> "CachedResponse":
+        """The /metrics exposition, rebuilt only when the data or a collector run changes it"""
+        version = self.data_version()
+        if version is not None and self.registry is not None:
+            version += (sum(s.runs for s in list(self.registry.stats.values())),)
+        cached = self._metrics_cache
+        if version is not None and cached is not None and cached[0] == version:
+            return cached[1]
+        response = CachedResponse(self.openmetrics().encode('utf-8'), OPENMETRICS_CONTENT_TYPE)
+        self._metrics_cache = (version, response)
+        return response
+    
+    def data_version(self) -> Optional[Tuple[int, int, int]]:
+        """Changes whenever anything shown on the page changes; None if unknown"""
+        if self.recent is None or self.alert_manager is None or self.recent.latest() is None:
+            return None
+        return (self.recent.version, self.alert_manager.version, self.port)
+    
+    def active_alerts(self) -> List[Dict]:
+        """Active alerts, from memory when the alert manager is available"""
+        if self.alert_manager is not None:
+            return self.alert_manager.active_alerts()
+        return self.db.get_active_alerts()
+    
+    def api_latest(self) -> Dict:
+        """Latest sample for /api/latest"""
+        latest = self.recent.latest_metrics() if self.recent is not None else None
+        if latest is not None:
+            return asdict(latest)
+        metrics = self.db.get_recent_metrics(1, resolution='raw')
+        return metrics[0] if metrics else {}
+    
+    def api_alerts(self) -> Dict:
+        """Active alerts for /api/alerts"""
+        return {'alerts': self.active_alerts()}
+    
+    def api_status(self) -> Dict:
+        """Startup timings and disabled components for /api/status"""
+        return self.status() if self.status is not None else {}
+    
+    def api_alert_history(self, params: Dict[str, str]) -> Dict:
+        """Alert transitions for /api/alerts/history (hours, default 24; optional id)"""
+        try:
+            hours = float(params.get('hours', 24))
+        except ValueError as e:
+            raise ApiError(f"Invalid parameter: {e}")
+        return {'history': self.db.get_alert_history(hours, params.get('id'))}
+    
+    def openmetrics(self) -> str:
+        """OpenMetrics exposition for /metrics, built from in-memory state only"""
+        families: Dict[str, Dict[str, Tuple[Dict[str, str], Any]]] = {}
+        samples = self.registry.latest() if self.registry is not None else []
+        for sample in samples:
+            families.setdefault(sample.metric, {})[_labels_key(sample.labels)] = (sample.labels, sample.value)
+        latest = self.recent.latest() if self.recent is not None else None
+        if not samples and latest is not None:
+            # No registry: headline values of the latest snapshot
+            for column in METRIC_COLUMNS:
+                families[column] = {'{}': ({}, latest.get(column))}
         
-        <div class="alerts">
-            <h2>🚨 Security Alerts ({len(alerts)})</h2>
-            {self._format_alerts(alerts)}
-        </div>
+        output = [(name, 'counter' if name in COUNTER_METRICS else 'gauge', '', list(points.values()))
+                  for name, points in sorted(families.items())]
+        if latest is not None:
+            output.append(('last_sample_timestamp_seconds', 'gauge', 'Time of the latest snapshot',
+                           [({}, latest['ts'] / 1000)]))
+        output.append(('alert_active', 'gauge', 'Active alerts',
+                       [({'alert': a['id'], 'level': a['level']}, 1) for a in self.active_alerts()]))
+        if self.alert_manager is not None:
+            output.append(('alert_pending', 'gauge', 'Alerts waiting out their for-duration',
+                           [({'alert': a.id, 'level': a.level}, 1) for a in self.alert_manager.pending_alerts()]))
+        if self.registry is not None:
+            stats = sorted(self.registry.stats.items())
+            output += [
+                ('collector_runs', 'counter', 'Collector runs',
+                 [({'collector': name}, s.runs) for name, s in stats]),
+                ('collector_errors', 'counter', 'Collector runs that raised',
+                 [({'collector': name}, s.errors) for name, s in stats]),
+                ('collector_samples', 'counter', 'Samples produced',
+                 [({'collector': name}, s.samples) for name, s in stats]),
+                ('collector_duration_seconds', 'gauge', 'Duration of the last run',
+                 [({'collector': name}, s.last_duration) for name, s in stats]),
+                ('collector_busy_seconds', 'counter', 'Time spent collecting',
+                 [({'collector': name}, s.total_duration) for name, s in stats]),
+            ]
+        if self.status is not None:
+            status = self.status()
+            output += [
+                ('startup_seconds', 'gauge', 'Seconds from module import to the end of each startup phase',
+                 [({'phase': phase}, seconds) for phase, seconds in sorted(status['startup'].items())]),
+                ('component_disabled', 'gauge', 'Components switched off by a missing dependency',
+                 [({'component': name, 'reason': reason}, 1)
+                  for name, reason in sorted(status['disabled'].items())]),
+            ]
+        if self.writer is not None:
+            output += [
+                ('writer_queue_items', 'gauge', 'Batches waiting to be written',
+                 [({}, self.writer.queue.qsize())]),
+                ('writer_written', 'counter', 'Items committed to the database', [({}, self.writer.written)]),
+                ('writer_dropped', 'counter', 'Items dropped because the queue was full',
+                 [({}, self.writer.dropped)]),
+                ('writer_failed_flushes', 'counter', 'Flushes that failed and were retried',
+                 [({}, self.writer.failed_flushes)]),
+            ]
+            push = self.writer.forward
+            if push is not None:
+                output += [
+                    ('push_sent', 'counter', 'Payloads delivered to the collector', [({}, push.sent)]),
+                    ('push_failures', 'counter', 'Failed push attempts', [({}, push.failures)]),
+                    ('push_rejected', 'counter', 'Payloads refused by the collector', [({}, push.rejected)]),
+                    ('push_spool_files', 'gauge', 'Payloads waiting in the spool', [({}, push.spooled)]),
+                    ('push_spool_bytes', 'gauge', 'Size of the spool', [({}, push.spooled_bytes)]),
+                    ('push_spool_dropped', 'counter', 'Spooled payloads dropped by the size cap',
+                     [({}, push.dropped)]),
+                ]
+        if self.fleet is not None:
+            output += [
+                ('fleet_host_up', 'gauge', 'Whether a host pushed within its stale limit',
+                 [({'host': h['host']}, int(h['status'] == 'up')) for h in self.fleet.hosts()]),
+                ('fleet_pushes_received', 'counter', 'Pushes stored', [({}, self.fleet.received)]),
+                ('fleet_pushes_rejected', 'counter', 'Pushes refused', [({}, self.fleet.rejected)]),
+                ('fleet_rows_stored', 'counter', 'Metric rows, samples and alerts stored from pushes',
+                 [({}, self.fleet.rows)]),
+            ]
+        return render_openmetrics(output)
+    
+    def api_metrics(self, params: Dict[str, str]):
+        """Range query for /api/metrics; returns (header, row iterator)
+
+        Parameters: from/to (epoch, ISO or relative like -6h; default last
+        hour), step (seconds), points (target count, default 500, used when no
+        step is given), columns (comma separated) and method ('bucket' for
+        avg/min/max buckets, 'lttb' for one column, 'raw' for no downsampling).
+        """
+        now = _to_epoch_ms(datetime.now())
+        try:
+            end = _parse_time(params.get('to'), now)
+            start = _parse_time(params.get('from'), end - 3_600_000)
+            points = int(params.get('points', 500))
+            step = int(float(params['step']) * 1000) if params.get('step') else None
+        except ValueError as e:
+            raise ApiError(f"Invalid parameter: {e}")
+        if end <= start or points < 1:
+            raise ApiError("Empty range")
         
-        <div class="stealth-info">
-            <h2>🕵️ Stealth Operation Status</h2>
-            <p><strong>📊 Data Points Collected:</strong> {len(metrics) if 'metrics' in locals() else 0}</p>
-            <p><strong>🔄 Auto-Refresh:</strong> Every 15 seconds</p>
-            <p><strong>🛑 Stop Monitor:</strong> Press F12 key</p>
-            <p><strong>📸 Screenshots:</strong> Captured every 60 seconds</p>
-            <div class="stealth-badge">🔥 FULLY OPERATIONAL</div>
-        </div>
-    </div>
-</body>
-</html>
-        '''
+        columns = [c for c in params.get('columns', '').split(',') if c] or list(METRIC_COLUMNS)
+        unknown = [c for c in columns if c not in METRIC_COLUMNS]
+        if unknown:
+            raise ApiError(f"Unknown columns: {', '.join(unknown)}")
+        
+        method = params.get('method', 'bucket')
+        if method == 'raw':
+            step = None
+        elif method == 'lttb':
+            if len(columns) != 1:
+                raise ApiError("lttb needs exactly one column")
+            # Read at up to 4x the target density, then keep the visually important points
+            rows = self.db.iter_metrics(start, end, step or (end - start) // (points * 4) or None, columns)
+            tier, step_ms = next(rows)
+            column = columns[0]
+            series = [(row['ts'], row[column]) for row in rows if row[column] is not None]
+            header = {'from': start, 'to': end, 'resolution': tier, 'step': step_ms,
+                      'method': 'lttb', 'columns': columns}
+            return header, ({'ts': int(x), column: y} for x, y in lttb(series, points))
+        elif method == 'bucket':
+            step = step or max(1, -(-(end - start) // points))
+        else:
+            raise ApiError(f"Unknown method: {method}")
+        
+        rows = self.db.iter_metrics(start, end, step, columns)
+        tier, step_ms = next(rows)
+        header = {'from': start, 'to': end, 'resolution': tier, 'step': step_ms,
+                  'method': method, 'columns': columns}
+        return header, rows
+    
+    def api_export(self, params: Dict[str, str]):
+        """Streaming export for /api/export; returns (info, byte chunks)
+
+        Parameters: format (csv, jsonl or parquet; default csv), from/to
+        (default the last 24 hours), step (seconds; avg/min/max buckets),
+        columns (comma separated) and host (rows pushed by that agent).
+        """
+        fmt = params.get('format', 'csv')
+        if fmt == 'parquet' and not pa.available():
+            raise ApiError(f"Parquet export needs pyarrow: {pa.reason}", 501)
+        now = _to_epoch_ms(datetime.now())
+        try:
+            end = _parse_time(params.get('to'), now)
+            start = _parse_time(params.get('from'), end - 86_400_000)
+            step = int(float(params['step']) * 1000) if params.get('step') else None
+            columns = [c for c in params.get('columns', '').split(',') if c] or None
+            return export_metrics(self.db, fmt, start, end, step, columns, params.get('host'))
+        except ValueError as e:
+            raise ApiError(f"Invalid parameter: {e}")
+    
+    def api_fleet(self) -> Dict:
+        """Every pushing host with its latest values for /api/fleet"""
+        return {'hosts': self.fleet.hosts()}
+    
+    def api_fleet_alerts(self, params: Dict[str, str]) -> Dict:
+        """Active alerts across the fleet for /api/fleet/alerts (optional host)"""
+        return {'alerts': self.db.get_fleet_alerts(params.get('host'))}
+    
+    def api_fleet_metrics(self, params: Dict[str, str]):
+        """One host's pushed rows for /api/fleet/metrics; returns (header, row iterator)
+
+        Parameters: host (required), from/to, step, points and columns as for
+        /api/metrics; rows are avg/min/max buckets unless step is 0.
+        """
+        host = params.get('host')
+        if not host:
+            raise ApiError("host is required")
+        now = _to_epoch_ms(datetime.now())
+        try:
+            end = _parse_time(params.get('to'), now)
+            start = _parse_time(params.get('from'), end - 3_600_000)
+            points = int(params.get('points', 500))
+            step = int(float(params['step']) * 1000) if params.get('step') else None
+        except ValueError as e:
+            raise ApiError(f"Invalid parameter: {e}")
+        if end <= start or points < 1:
+            raise ApiError("Empty range")
+        columns = [c for c in params.get('columns', '').split(',') if c] or list(METRIC_COLUMNS)
+        unknown = [c for c in columns if c not in METRIC_COLUMNS]
+        if unknown:
+            raise ApiError(f"Unknown columns: {', '.join(unknown)}")
+        if step is None:
+            step = max(1, -(-(end - start) // points))
+        header = {'host': host, 'from': start, 'to': end, 'step': step or None, 'columns': columns}
+        return header, self.db.iter_fleet_metrics(host, start, end, step, columns)
+    
+    def get_fleet_html(self) -> str:
+        """Render the fleet overview page"""
+        hosts = self.fleet.hosts()
+        alerts = [dict(a, message=f"{a['host']}: {a['message']}") for a in self.db.get_fleet_alerts()]
+        rows = "".join(
+            f"<tr><td><a href=\"/api/fleet/metrics?host={urllib.parse.quote(h['host'])}&amp;from=-6h\">"
+            f"{html_escape(h['host'])}</a></td>"
+            f"<td><span class=\"status {'good' if h['status'] == 'up' else 'critical'}\">{h['status']}</span></td>"
+            + "".join(f"<td>{'n/a' if h[c] is None else f'{h[c]:.1f}%'}</td>"
+                      for c in ('cpu_percent', 'memory_percent', 'disk_usage'))
+            + f"<td>{_format_rate(h['network_recv_rate'])}</td><td>{_format_rate(h['network_sent_rate'])}</td>"
+            f"<td>{h['alerts']}</td><td>{h['last_seen_timestamp'][11:19]}</td></tr>"
+            for h in hosts)
+        table = ("<table><tr><th>Host</th><th>Status</th><th>CPU</th><th>Memory</th><th>Disk</th>"
+                 f"<th>⬇ Recv</th><th>⬆ Sent</th><th>Alerts</th><th>Last seen</th></tr>{rows}</table>"
+                 if hosts else "<p>⏳ Waiting for the first agent push</p>")
+        return FLEET_TEMPLATE.substitute(
+            refresh=10,
+            css_url=_static_url('dashboard.css'),
+            hosts_up=sum(h['status'] == 'up' for h in hosts),
+            hosts_total=len(hosts),
+            # The latest push rather than the render time, so unchanged pages keep their ETag
+            last_update=max((h['last_seen_timestamp'] for h in hosts), default="never")[:19].replace('T', ' '),
+            hosts=table,
+            alerts_count=len(alerts),
+            alerts=self._format_alerts(alerts),
+        )
+    
+    def fleet_response(self) -> "CachedResponse":
+        """The fleet page, rendered per request"""
+        return CachedResponse(self.get_fleet_html().encode('utf-8'), 'text/html; charset=utf-8')
+    
+    def _network_chart(self, width: int = 220, height: int = 50) -> str:
+        """Inline SVG sparkline of the last hour of network throughput"""
+        if self.recent is None:
+            return ""
+        columns = self.recent.columns(3600)
+        series = [(columns['network_recv_rate'], '#3498db'), (columns['network_sent_rate'], '#e67e22')]
+        peak = max([v for values, _ in series for v in values if v is not None] or [0])
+        if not peak:
+            return ""
+        lines = []
+        for values, color in series:
+            # One point per pixel column is plenty for a sparkline
+            step = max(1, len(values) // width)
+            values = [v or 0 for v in values[::step]]
+            if len(values) < 2:
+                continue
+            points = " ".join(f"{i * width / (len(values) - 1):.1f},{height - v / peak * height:.1f}"
+                              for i, v in enumerate(values))
+            lines.append(f'<polyline fill="none" stroke="{color}" stroke-width="1.5" points="{points}"/>')
+        return (f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+                f'{"".join(lines)}</svg>')
+    
+    def _format_disks(self, metrics: Optional[SystemMetrics]) -> str:
+        """Per-mount usage and per-device IO lines for the disk card"""
+        if metrics is None:
+            return ""
+        lines = [f"{html_escape(mount)} {percent:.0f}%" for mount, percent in sorted(metrics.disks.items())]
+        for device, io in sorted(metrics.disk_io.items()):
+            line = (f"{html_escape(device)}: ⬇ {_format_rate(io.get('read_rate'))} "
+                    f"⬆ {_format_rate(io.get('write_rate'))}")
+            if io.get('busy_percent') is not None:
+                line += f" · {io['busy_percent']:.0f}% busy"
+            lines.append(line)
+        return "".join(f"<p><small>{line}</small></p>" for line in lines)
+    
+    def _format_processes(self, processes):
+        """Format the top-N process table"""
+        if not processes:
+            return "<p>⏳ Waiting for the process collector</p>"
+        rows = "".join(
+            f"<tr><td>{html_escape(str(p['name']))} <small>(&times;{p.get('instances', 1):.0f})</small></td>"
+            f"<td>{p.get('cpu_percent', 0) or 0:.1f}%</td>"
+            f"<td>{_format_bytes(p.get('rss_bytes'))}</td>"
+            f"<td>{_format_rate(p.get('read_rate'))}</td>"
+            f"<td>{_format_rate(p.get('write_rate'))}</td>"
+            f"<td>{p.get('open_files', 'n/a')}</td></tr>"
+            for p in processes)
+        return ("<table><tr><th>Process</th><th>CPU</th><th>Memory</th><th>Read</th>"
+                f"<th>Write</th><th>Open files</th></tr>{rows}</table>")
     
     def _format_alerts(self, alerts):
         """Format alerts for HTML display"""
         if not alerts:
             return "<p>✅ No security threats detected</p>"
         
-        html = ""
-        for alert in alerts:
-            html += f'''
-            <div class="alert {alert['level']}">
-                <strong>🚨 {alert['level']}</strong>: {alert['message']}
-                <small> - {alert['timestamp']}</small>
-            </div>
-            '''
-        return html
+        return "".join(
+            f'<div class="alert {html_escape(str(alert["level"]))}">'
+            f'<strong>🚨 {html_escape(str(alert["level"]))}</strong>: {html_escape(str(alert["message"]))}'
+            f'<small> - {html_escape(str(alert["timestamp"]))}</small></div>'
+            for alert in alerts)
     
     def find_free_port(self, start_port=8080, max_port=8100):
         """Find a free port to use"""
         for port in range(start_port, max_port):
             try:
                 with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.bind(('localhost', port))
+                    s.bind((self.bind_address, port))
                     return port
             except OSError:
                 continue
         return start_port  # Fallback
     
-    def start_server(self):
-        """Start web dashboard server silently"""
-        try:
-            # Find a free port
-            self.port = self.find_free_port(self.port)
-            
-            # Create handler with database reference
-            def create_handler(*args, **kwargs):
-                return DashboardHandler(*args, db_manager=self.db, **kwargs)
-            
-            # Create and start server
-            self.server = HTTPServer(('localhost', self.port), create_handler)
+    def bind(self) -> Optional[DashboardServer]:
+        """Create the server on a free port (without serving yet)"""
+        # Find a free port, then try alternative ports if binding still fails
+        for port in [self.find_free_port(self.port), 8081, 8082, 8083, 9000, 9001]:
+            try:
+                self.port = port
+                self.server = DashboardServer((self.bind_address, self.port), self, **self.server_options)
+            except OSError:
+                continue
             
             # Write port info to a hidden file for reference
             try:
@@ -747,79 +5754,314 @@ class WebDashboard:
                     f.write(str(self.port))
             except:
                 pass
-            
+            return self.server
+        return None
+    
+    def start_server(self):
+        """Start web dashboard server silently"""
+        if self.bind() is not None:
             self.server.serve_forever()
+    
+    def stop_server(self):
+        """Stop serving and release the socket and worker pool"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+class AsyncRuntime:
+    """Runs the monitor's periodic work as tasks on one asyncio event loop
+
+    Collectors, snapshot ticks (with alert evaluation), batch flushes,
+    retention, notification delivery and pushes to a collector (the
+    writer's ``forward``) are periodic tasks, each started at
+    a random phase so a fleet of agents does not fire in lockstep. Blocking
+    psutil and SQLite calls go to a small bounded executor. The dashboard's
+    accept loop is a reader on the same loop, while requests are still
+    served by its own worker pool. stop() cancels every task at once.
+    """
+    
+    def __init__(self, system_monitor: SystemMonitor, writer: Optional[BatchWriter] = None,
+                 retention: Optional[RetentionEngine] = None, dashboard: Optional[WebDashboard] = None,
+                 notifier: Optional[NotificationDispatcher] = None, max_workers: int = 4,
+                 jitter: float = 0.1):
+        self.system_monitor = system_monitor
+        self.writer = writer
+        self.retention = retention
+        self.dashboard = dashboard
+        self.notifier = notifier
+        self.max_workers = max_workers
+        self.jitter = jitter
+        # Extra (name, interval, blocking callable) jobs, e.g. screenshots
+        self.jobs: List[Tuple[str, float, Callable[[], Any]]] = []
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.ready_at: Optional[float] = None
+        self.ready = threading.Event()
+        self._stopping: Optional[asyncio.Event] = None
+        self._stop_requested = False
+        self._flush_now: Optional[asyncio.Event] = None
+    
+    def add_job(self, name: str, interval: float, job: Callable[[], Any]):
+        """Run a blocking callable every ``interval`` seconds on the executor"""
+        self.jobs.append((name, interval, job))
+    
+    def run_forever(self):
+        """Run in the calling thread until stop()"""
+        # A selector loop on every platform, since the dashboard socket is watched with add_reader
+        loop = asyncio.SelectorEventLoop()
+        try:
+            loop.run_until_complete(self.run())
+        finally:
+            loop.close()
+    
+    def stop(self):
+        """Ask the runtime to stop; safe from any thread or a signal handler"""
+        self._stop_requested = True
+        if self.loop is not None and self._stopping is not None:
+            try:
+                self.loop.call_soon_threadsafe(self._stopping.set)
+            except RuntimeError:
+                pass  # Loop already closed
+    
+    def _blocking(self, func: Callable, *args):
+        return self.loop.run_in_executor(self.executor, func, *args)
+    
+    async def run(self):
+        """Start every task, wait for stop(), then cancel them all"""
+        self.loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._flush_now = asyncio.Event()
+        if self._stop_requested:
+            return
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="monitor")
+        monitor = self.system_monitor
+        monitor.running = True
+        tasks = []
+        server = None
+        try:
+            if self.dashboard is not None:
+                server = self.dashboard.bind()
+                if server is not None:
+                    server.socket.setblocking(False)
+                    self.loop.add_reader(server.socket, self._accept, server)
+            if monitor.alert_manager.anomaly is not None:
+                tasks.append(self.loop.create_task(self._backfill()))
+            tasks.append(self.loop.create_task(self._start_collection(tasks)))
+            if self.writer is not None:
+                tasks.append(self.loop.create_task(self._flush_loop()))
+            if self.retention is not None:
+                self.retention.running = True
+                tasks.append(self._every(self.retention.interval,
+                                         lambda: self._blocking(self.retention.run_once, None, True)))
+            if self.notifier is not None:
+                tasks.append(self._every(self.notifier.batch_window,
+                                         lambda: self._blocking(self.notifier.process)))
+            push = self.writer.forward if self.writer is not None else None
+            if push is not None:
+                tasks.append(self._every(push.interval, lambda: self._blocking(push.deliver)))
+            for _, interval, job in self.jobs:
+                tasks.append(self._every(interval, functools.partial(self._blocking, job)))
+            self.ready_at = time.perf_counter()
+            self.ready.set()
             
-        except Exception as e:
-            # Try alternative ports if main port fails
-            for alt_port in [8081, 8082, 8083, 9000, 9001]:
-                try:
-                    self.port = alt_port
-                    def create_handler(*args, **kwargs):
-                        return DashboardHandler(*args, db_manager=self.db, **kwargs)
-                    
-                    self.server = HTTPServer(('localhost', self.port), create_handler)
-                    
-                    try:
-                        with open('.monitor_port', 'w') as f:
-                            f.write(str(self.port))
-                    except:
-                        pass
-                    
-                    self.server.serve_forever()
-                    break
-                except:
-                    continue
+            await self._stopping.wait()
+        finally:
+            monitor.running = False
+            if self.retention is not None:
+                self.retention.running = False
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if server is not None:
+                self.loop.remove_reader(server.socket)
+                server.server_close()
+                self.dashboard.server = None
+            # Running jobs finish (retention gives up at its next batch); queued ones are dropped
+            self.executor.shutdown(wait=True, cancel_futures=True)
+    
+    async def _start_collection(self, tasks: List["asyncio.Task"]):
+        """One pass up front so the first snapshot is never empty, then the periodic tasks
+
+        This runs as a task, so the dashboard already answers while slow
+        collectors finish their first pass.
+        """
+        monitor = self.system_monitor
+        try:
+            monitor.record_samples(await self._blocking(monitor.registry.run_all))
+        except Exception:
+            pass  # Silent operation
+        for collector in monitor.registry:
+            tasks.append(self._every(collector.interval, functools.partial(self._collect, collector),
+                                     delay=collector.interval))
+        tasks.append(self._every(monitor.interval, self._tick))
+    
+    def _every(self, interval: float, job: Callable[[], Any], delay: float = 0.0) -> "asyncio.Task":
+        return self.loop.create_task(self._periodic(interval, job, delay))
+    
+    async def _periodic(self, interval: float, job: Callable[[], Any], delay: float):
+        """Await ``job()`` every ``interval`` seconds on the loop's monotonic clock"""
+        loop = self.loop
+        next_run = loop.time() + delay + random.uniform(0, self.jitter * interval)
+        while True:
+            await asyncio.sleep(max(0.0, next_run - loop.time()))
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass  # Silent operation
+            next_run += interval
+            if next_run <= loop.time():
+                # Fell behind (suspend, stalled disk): skip missed runs instead of bursting
+                next_run += math.ceil((loop.time() - next_run) / interval) * interval
+    
+    async def _collect(self, collector: Collector):
+        samples = await self._blocking(self.system_monitor.registry.run_collector, collector)
+        self.system_monitor.record_samples(samples)
+        self._check_flush()
+    
+    async def _tick(self):
+        self.system_monitor.tick()
+        self._check_flush()
+    
+    def _check_flush(self):
+        if self.writer is not None and self.writer.queue.qsize() >= self.writer.batch_size:
+            self._flush_now.set()
+    
+    async def _flush_loop(self):
+        """Flush every ``flush_interval`` seconds, or early once a batch is full"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.writer.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self._blocking(self.writer.flush)
+            except Exception:
+                pass  # Silent operation
+    
+    async def _backfill(self):
+        try:
+            await self._blocking(self.system_monitor.alert_manager.anomaly.backfill, self.system_monitor.db)
+        except Exception:
+            pass  # Silent operation
+    
+    def _accept(self, server: DashboardServer):
+        try:
+            request, client_address = server.get_request()
+        except OSError:
+            return  # Spurious wakeup or closed socket
+        server.process_request(request, client_address)
+
+def _load_notifier(db_manager: DatabaseManager) -> Optional[NotificationDispatcher]:
+    """Dispatcher from NOTIFICATIONS_FILE when it exists and parses"""
+    if os.path.exists(NOTIFICATIONS_FILE):
+        try:
+            return NotificationDispatcher.from_file(db_manager)
+        except:
+            pass  # Silent operation
+    return None
 
 class SilentMonitor:
-    """Main silent monitoring system"""
+    """Main silent monitoring system
+
+    Screenshots and input activity only import their GUI packages when
+    enabled; a component whose dependency is missing is left out and the
+    reason is kept in ``disabled``.
+    """
     
-    def __init__(self):
+    def __init__(self, screenshots: bool = True, input_activity: bool = True):
+        self.screenshots = screenshots
+        self.input_activity = input_activity
+        self.disabled: Dict[str, str] = {}
+        # Seconds since STARTUP_T0 at which each startup phase finished
+        self.startup: Dict[str, float] = {'import': IMPORT_SECONDS}
         self.db = DatabaseManager()
-        self.system_monitor = SystemMonitor(self.db)
+        self.writer = BatchWriter(self.db)
+        self.retention = RetentionEngine(self.db)
+        self.notifier = _load_notifier(self.db)
+        self.system_monitor = SystemMonitor(self.db, self.writer, notifier=self.notifier)
         self.activity_monitor = ActivityMonitor(self.db)
-        self.web_dashboard = WebDashboard(self.db)
+        self.web_dashboard = WebDashboard(self.db, recent=self.system_monitor.recent,
+                                          events=self.system_monitor.events,
+                                          alert_manager=self.system_monitor.alert_manager,
+                                          registry=self.system_monitor.registry, writer=self.writer,
+                                          status=self.status)
+        self.runtime = AsyncRuntime(self.system_monitor, self.writer, self.retention,
+                                    self.web_dashboard, self.notifier)
+        self._runtime_thread: Optional[threading.Thread] = None
         self.running = False
+        self.startup['init'] = time.perf_counter() - STARTUP_T0
+    
+    def status(self) -> Dict[str, Any]:
+        """Startup timings and every disabled component with its reason"""
+        disabled = dict(self.disabled)
+        disabled.update({f"collector:{name}": reason
+                         for name, reason in self.system_monitor.registry.disabled.items()})
+        return {'startup': _startup_phases(self.startup, self.runtime), 'disabled': disabled}
+    
+    def _enabled(self, component: str, wanted: bool, *modules: LazyModule) -> bool:
+        """Whether an optional component runs; records why when it cannot"""
+        if not wanted:
+            return False
+        reason = missing_dependency(*modules)
+        if reason is not None:
+            self.disabled[component] = reason
+            return False
+        return True
+    
+    def report_startup(self, path: str = '.monitor_status'):
+        """Append startup timings and disabled components to the status file"""
+        status = self.status()
+        lines = ["Startup: " + ", ".join(f"{phase} {seconds:.2f}s"
+                                         for phase, seconds in status['startup'].items())]
+        lines += [f"Disabled {name}: {reason}" for name, reason in sorted(status['disabled'].items())]
+        try:
+            with open(path, 'a') as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError:
+            pass
     
     def start(self):
         """Start all monitoring components silently"""
         self.running = True
-        self.system_monitor.running = True
         self.activity_monitor.running = True
+        if self._enabled('screenshots', self.screenshots, pyautogui):
+            self.runtime.add_job('screenshots', self.activity_monitor.screenshot_interval,
+                                 self.activity_monitor.take_screenshot)
         
-        # Start all monitoring threads
-        threads = [
-            threading.Thread(target=self.system_monitor.monitor_loop, daemon=True),
-            threading.Thread(target=self.activity_monitor.screenshot_loop, daemon=True),
-            threading.Thread(target=self.web_dashboard.start_server, daemon=True)
-        ]
-        
-        for thread in threads:
-            thread.start()
-        
-        # Give the web server time to start
-        time.sleep(2)
+        # Everything periodic, and the dashboard, runs on one event loop thread
+        self._runtime_thread = threading.Thread(target=self.runtime.run_forever, daemon=True)
+        self._runtime_thread.start()
+        input_activity = self._enabled('input_activity', self.input_activity, mouse, keyboard)
+        self.runtime.ready.wait(10)
+        self.report_startup()
         
         # Setup input listeners
-        try:
-            mouse_listener = mouse.Listener(
-                on_click=self.activity_monitor.on_mouse_click,
-                on_scroll=self.activity_monitor.on_mouse_scroll
-            )
-            keyboard_listener = keyboard.Listener(
-                on_press=self.activity_monitor.on_key_press,
-                on_release=self.activity_monitor.on_key_release
-            )
-            
-            # Start listeners
-            mouse_listener.start()
-            keyboard_listener.start()
-            
-            # Keep running until F12 is pressed
-            keyboard_listener.join()
-            
-        except Exception as e:
-            # If input monitoring fails, just keep the system monitor running
+        if input_activity:
+            try:
+                mouse_listener = mouse.Listener(
+                    on_click=self.activity_monitor.on_mouse_click,
+                    on_scroll=self.activity_monitor.on_mouse_scroll
+                )
+                keyboard_listener = keyboard.Listener(
+                    on_press=self.activity_monitor.on_key_press,
+                    on_release=self.activity_monitor.on_key_release
+                )
+                
+                # Start listeners
+                mouse_listener.start()
+                keyboard_listener.start()
+                
+                # Keep running until F12 is pressed
+                keyboard_listener.join()
+            except Exception as e:
+                self.disabled['input_activity'] = f"{type(e).__name__}: {e}"
+                input_activity = False
+        
+        if not input_activity:
+            # Without input monitoring, just keep the system monitor running
             try:
                 while self.running:
                     time.sleep(1)
@@ -832,17 +6074,116 @@ class SilentMonitor:
     def stop(self):
         """Stop all monitoring silently"""
         self.running = False
-        self.system_monitor.running = False
         self.activity_monitor.running = False
+        self.runtime.stop()
+        if self._runtime_thread is not None:
+            self._runtime_thread.join(10)
         
-        if self.web_dashboard.server:
-            try:
-                self.web_dashboard.server.shutdown()
-            except:
-                pass
+        # Save pending notifications and flush queued samples before closing the database
+        try:
+            if self.notifier is not None:
+                self.notifier.stop()
+        except:
+            pass
+        try:
+            self.writer.stop()
+        except:
+            pass
+        self.db.close()
+
+class MetricsAgent:
+    """Headless metrics-only mode: collectors, alerting and storage
+
+    Runs SystemMonitor (with its AlertManager), the batch writer and
+    retention, plus notifications when configured. No GUI package is
+    imported and no activity is recorded; the dashboard and /metrics are
+    served only when a port is given. With ``push`` (a PushClient) every
+    batch is also shipped to a central collector.
+    """
+    
+    def __init__(self, db_path: str = "monitor.db", interval: float = 10.0, port: Optional[int] = None,
+                 history_size: int = 360, anomaly_detection: bool = False,
+                 db_config: Optional[DatabaseConfig] = None, push: Optional[PushClient] = None):
+        self.db = DatabaseManager(db_path, config=db_config)
+        self.push = push
+        self.writer = BatchWriter(self.db, forward=push)
+        self.retention = RetentionEngine(self.db)
+        self.notifier = _load_notifier(self.db)
+        self.system_monitor = SystemMonitor(self.db, self.writer, history_size=history_size,
+                                            interval=interval, anomaly_detection=anomaly_detection,
+                                            notifier=self.notifier)
+        self.web_dashboard = None
+        if port is not None:
+            self.web_dashboard = WebDashboard(self.db, port=port, recent=self.system_monitor.recent,
+                                              events=self.system_monitor.events,
+                                              alert_manager=self.system_monitor.alert_manager,
+                                              registry=self.system_monitor.registry, writer=self.writer,
+                                              status=self.status)
+        self.runtime = AsyncRuntime(self.system_monitor, self.writer, self.retention,
+                                    self.web_dashboard, self.notifier)
+        self.startup: Dict[str, float] = {'import': IMPORT_SECONDS}
+        self._thread: Optional[threading.Thread] = None
+    
+    def status(self) -> Dict[str, Any]:
+        """Startup timings and collectors disabled by a missing dependency"""
+        return {'startup': _startup_phases(self.startup, self.runtime),
+                'disabled': {f"collector:{name}": reason
+                             for name, reason in self.system_monitor.registry.disabled.items()}}
+    
+    def start(self):
+        """Run the agent on a background thread"""
+        self._thread = threading.Thread(target=self.runtime.run_forever, daemon=True)
+        self._thread.start()
+    
+    def run(self):
+        """Run until SIGTERM or SIGINT, then flush and close"""
+        _stop_on_signals(self.runtime.stop)
+        self.runtime.run_forever()
+        self.stop()
+    
+    def stop(self):
+        """Stop every task, then flush queued samples and save pending notifications"""
+        self.runtime.stop()
+        if self._thread is not None:
+            self._thread.join(10)
+            self._thread = None
+        try:
+            if self.notifier is not None:
+                self.notifier.stop()
+        except:
+            pass
+        try:
+            self.writer.stop()
+        except:
+            pass
+        try:
+            # After the writer, which forwards its last batch
+            if self.push is not None:
+                self.push.stop()
+        except:
+            pass
+        self.db.close()
+
+def _stop_on_signals(callback: Callable[[], Any]):
+    """Call ``callback`` on SIGTERM/SIGINT (only callable from the main thread)"""
+    for name in ('SIGTERM', 'SIGINT'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), lambda signum, frame: callback())
+
+def _startup_phases(startup: Dict[str, float], runtime: AsyncRuntime) -> Dict[str, float]:
+    """Recorded startup phases plus 'ready' once the runtime's tasks are running"""
+    phases = dict(startup)
+    if runtime.ready_at is not None:
+        phases['ready'] = runtime.ready_at - STARTUP_T0
+    return phases
+
+# Time spent importing this module (stdlib only; optional packages load later)
+IMPORT_SECONDS = time.perf_counter() - STARTUP_T0
 
-def main():
-    """Main entry point for silent operation"""
+def run_silent():
+    """Legacy mode: every component, silently, until F12"""
+    sys.stdout = NullWriter()
+    sys.stderr = NullWriter()
     try:
         # Create a simple status file to show it's running
         with open('.monitor_status', 'w') as f:
@@ -868,5 +6209,213 @@ def main():
         except:
             pass
 
+def _db_config(args: argparse.Namespace, **overrides) -> DatabaseConfig:
+    return DatabaseConfig(metrics_backend=args.backend, **overrides)
+
+def _read_only_db(args: argparse.Namespace) -> Optional[DatabaseManager]:
+    """The database opened read-only, or None after printing why it cannot be"""
+    try:
+        return DatabaseManager(args.db, read_only=True)
+    except (OSError, sqlite3.DatabaseError) as e:
+        print(f"{args.command}: {e}", file=sys.stderr)
+        return None
+
+def cmd_agent(args: argparse.Namespace) -> int:
+    """Headless collection, alerting and storage"""
+    push = None
+    if args.push:
+        push = PushClient(args.push, str(Path(args.db).with_suffix('.spool')), host=args.hostname,
+                          token=args.push_token, interval=args.push_interval, samples=args.push_samples)
+    agent = MetricsAgent(args.db, interval=args.interval, port=args.port, history_size=args.history,
+                         anomaly_detection=args.anomaly,
+                         # Small page cache and reader pool keep the footprint down
+                         db_config=_db_config(args, cache_size_kb=2048, read_pool_size=2), push=push)
+    agent.run()
+    return 0
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    """Dashboard and API over an existing database, without collecting"""
+    db = _read_only_db(args)
+    if db is None:
+        return 1
+    dashboard = WebDashboard(db, port=args.port)
+    stopped = threading.Event()
+    _stop_on_signals(stopped.set)
+    threading.Thread(target=dashboard.start_server, daemon=True).start()
+    stopped.wait()
+    if dashboard.server:
+        dashboard.stop_server()
+    db.close()
+    return 0
+
+def cmd_collector(args: argparse.Namespace) -> int:
+    """Receive agent pushes and serve the fleet dashboard and API"""
+    db = DatabaseManager(args.db, config=_db_config(args))
+    fleet = FleetCollector(db, token=args.token)
+    # Pushes are short; a longer accept queue absorbs agents that start together
+    dashboard = WebDashboard(db, port=args.port, fleet=fleet, bind_address=args.bind,
+                             max_workers=32, max_pending=256)
+    retention = RetentionEngine(db)
+    retention.running = True
+    stopped = threading.Event()
+    _stop_on_signals(stopped.set)
+    threading.Thread(target=dashboard.start_server, daemon=True).start()
+    threading.Thread(target=retention.retention_loop, daemon=True).start()
+    stopped.wait()
+    retention.running = False
+    if dashboard.server:
+        dashboard.stop_server()
+    db.close()
+    return 0
+
+def cmd_export(args: argparse.Namespace) -> int:
+    """Stream stored metrics to CSV, JSON Lines or Parquet"""
+    fmt = args.format
+    if fmt is None:
+        suffix = Path(args.output).suffix.lstrip('.') if args.output else ''
+        fmt = suffix if suffix in EXPORT_FORMATS else 'csv'
+    db = _read_only_db(args)
+    if db is None:
+        return 1
+    try:
+        try:
+            end = _parse_time(args.to, _to_epoch_ms(datetime.now()))
+            start = _parse_time(args.from_, end - 86_400_000)
+            columns = [c for c in args.columns.split(',') if c] if args.columns else None
+            info, chunks = export_metrics(db, fmt, start, end, int(args.step * 1000) if args.step else None,
+                                          columns, args.host, args.chunk_rows)
+        except ValueError as e:
+            print(f"export: {e}", file=sys.stderr)
+            return 2
+        if args.output in (None, '-'):
+            for data in chunks:
+                sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+        else:
+            # Written aside and renamed, so a failed export never leaves a truncated file
+            tmp = args.output + '.tmp'
+            try:
+                with open(tmp, 'wb') as f:
+                    for data in chunks:
+                        f.write(data)
+                os.replace(tmp, args.output)
+            except BaseException:
+                with suppress(FileNotFoundError):
+                    os.remove(tmp)
+                raise
+            print(f"{args.output}: {fmt}, {info['resolution']} resolution, "
+                  f"{os.path.getsize(args.output)} bytes", file=sys.stderr)
+    except BrokenPipeError:
+        pass  # Output piped into head and friends
+    finally:
+        db.close()
+    return 0
+
+def cmd_query(args: argparse.Namespace) -> int:
+    """Print stored metrics or alerts"""
+    db = _read_only_db(args)
+    if db is None:
+        return 1
+    try:
+        if args.what == 'alerts':
+            if args.history:
+                rows = db.get_alert_history(args.hours)
+                columns = ['timestamp', 'alert_id', 'state', 'level', 'value', 'message']
+            else:
+                rows = db.get_active_alerts()
+                columns = ['timestamp', 'id', 'level', 'message']
+        else:
+            columns = [c for c in args.columns.split(',') if c] if args.columns else list(METRIC_COLUMNS)
+            unknown = [c for c in columns if c not in METRIC_COLUMNS]
+            if unknown:
+                print(f"unknown column(s): {', '.join(unknown)}", file=sys.stderr)
+                return 2
+            end_ms = _to_epoch_ms(datetime.now())
+            rows = db.iter_metrics(end_ms - int(args.hours * 3_600_000), end_ms,
+                                   int(args.step * 1000) if args.step else None, columns)
+            next(rows)  # (tier, step) header
+            rows = (dict(row, timestamp=_from_epoch_ms(row['ts'])) for row in rows)
+            columns = ['timestamp'] + columns
+        
+        for row in rows:
+            if args.json:
+                print(json.dumps(row))
+            else:
+                print("\t".join("" if row.get(c) is None else str(row.get(c)) for c in columns))
+    except BrokenPipeError:
+        pass  # Output piped into head and friends
+    finally:
+        db.close()
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="System monitor. Without a command runs the silent desktop monitor.")
+    storage = argparse.ArgumentParser(add_help=False)
+    storage.add_argument('--db', default="monitor.db", help="database path (default: monitor.db)")
+    # Only for commands that write; readers use the backend recorded in the database
+    layout = argparse.ArgumentParser(add_help=False)
+    layout.add_argument('--backend', choices=('sqlite', 'chunks'), default='sqlite',
+                        help="raw metrics storage (default: sqlite)")
+    commands = parser.add_subparsers(dest='command')
+    
+    agent = commands.add_parser('agent', parents=[storage, layout], help=cmd_agent.__doc__)
+    agent.add_argument('--interval', type=float, default=10.0, help="snapshot interval in seconds")
+    agent.add_argument('--port', type=int, help="serve the dashboard and /metrics on this port")
+    agent.add_argument('--history', type=int, default=360, help="snapshots kept in memory")
+    agent.add_argument('--anomaly', action='store_true', help="enable anomaly detection")
+    agent.add_argument('--push', metavar='URL', help="also push to a collector, e.g. http://host:8080/api/push")
+    agent.add_argument('--push-token', default=os.environ.get('MONITOR_PUSH_TOKEN'),
+                       help="collector token (default: $MONITOR_PUSH_TOKEN)")
+    agent.add_argument('--push-interval', type=float, default=10.0, help="seconds between pushes")
+    agent.add_argument('--push-samples', action='store_true',
+                       help="push every collector sample, not just snapshots and alerts")
+    agent.add_argument('--hostname', help="host label sent to the collector (default: this host's name)")
+    agent.set_defaults(func=cmd_agent)
+    
+    collector = commands.add_parser('collector', parents=[storage, layout], help=cmd_collector.__doc__)
+    collector.add_argument('--port', type=int, default=8080)
+    collector.add_argument('--bind', default='localhost',
+                           help="listen address; 0.0.0.0 accepts remote agents (default: localhost)")
+    collector.add_argument('--token', default=os.environ.get('MONITOR_PUSH_TOKEN'),
+                           help="token agents must send (default: $MONITOR_PUSH_TOKEN)")
+    collector.set_defaults(func=cmd_collector)
+    
+    serve = commands.add_parser('serve', parents=[storage], help=cmd_serve.__doc__)
+    serve.add_argument('--port', type=int, default=8080)
+    serve.set_defaults(func=cmd_serve)
+    
+    export = commands.add_parser('export', parents=[storage], help=cmd_export.__doc__)
+    export.add_argument('--format', choices=sorted(EXPORT_FORMATS),
+                        help="default: from the output file suffix, else csv")
+    export.add_argument('-o', '--output', help="file to write (default: stdout)")
+    export.add_argument('--from', dest='from_', metavar='TIME',
+                        help="epoch, ISO 8601 or relative like --from=-90d (default: 24 hours before --to)")
+    export.add_argument('--to', metavar='TIME', help="end of the range (default: now)")
+    export.add_argument('--step', type=float, help="bucket size in seconds: avg/min/max per column")
+    export.add_argument('--columns', help="comma separated metric columns")
+    export.add_argument('--host', help="rows pushed by this agent (collector databases)")
+    export.add_argument('--chunk-rows', type=int, default=50_000,
+                        help="rows per Parquet row group (default: 50000)")
+    export.set_defaults(func=cmd_export)
+    
+    query = commands.add_parser('query', parents=[storage], help=cmd_query.__doc__)
+    query.add_argument('what', nargs='?', choices=('metrics', 'alerts'), default='metrics')
+    query.add_argument('--hours', type=float, default=1.0, help="how far back (default: 1)")
+    query.add_argument('--step', type=float, help="bucket size in seconds (metrics)")
+    query.add_argument('--columns', help="comma separated metric columns")
+    query.add_argument('--history', action='store_true', help="alert transitions instead of active alerts")
+    query.add_argument('--json', action='store_true', help="one JSON object per line")
+    query.set_defaults(func=cmd_query)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point; no command keeps the legacy silent mode"""
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        run_silent()
+        return 0
+    return args.func(args)
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
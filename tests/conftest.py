@@ -0,0 +1,26 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# advanced_monitor.py is a single module at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def serve(tmp_path, monkeypatch):
+    """Serve a WebDashboard on a free port: ``serve(dashboard)`` returns (host, port)"""
+    monkeypatch.chdir(tmp_path)  # bind() writes .monitor_port
+    started = []
+
+    def start(dashboard):
+        dashboard.port = 0
+        server = dashboard.bind()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append(dashboard)
+        return server.server_address[:2]
+
+    yield start
+    for dashboard in started:
+        dashboard.stop_server()
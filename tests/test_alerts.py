@@ -0,0 +1,106 @@
+import pytest
+
+import advanced_monitor as am
+
+START = 1_700_000_000_000
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'))
+    yield db
+    db.close()
+
+
+def manager(db):
+    rules = am.RuleEngine([am.AlertRule.from_dict({
+        'name': 'cpu_high', 'metric': 'cpu_percent', 'threshold': 80, 'clear': 70, 'for': '30s',
+        'message': 'CPU {value:.0f}%'})])
+    return am.AlertManager(db, rules=rules)
+
+
+def tick(alerts, seconds, cpu):
+    ts = START + int(seconds * 1000)
+    alerts.observe([am.Sample('cpu_percent', cpu, {}, ts)])
+    alerts.check_alerts(am.SystemMetrics(timestamp=am._from_epoch_ms(ts), cpu_percent=cpu, memory_percent=0,
+                                         disk_usage=0, network_sent=0, network_recv=0, processes_count=0))
+
+
+def history(db):
+    return [(row['state'], row['value']) for row in reversed(db.get_alert_history(10**6))]
+
+
+def test_breach_is_pending_until_it_lasts_for_the_for_duration(db):
+    alerts = manager(db)
+    tick(alerts, 0, 90)
+    tick(alerts, 20, 95)
+    assert [s.id for s in alerts.pending_alerts()] == ['cpu_high']
+    assert alerts.active_alerts() == []
+    tick(alerts, 30, 92)
+    assert alerts.pending_alerts() == []
+    assert [a['message'] for a in alerts.active_alerts()] == ['CPU 92%']
+    assert [a['id'] for a in db.get_active_alerts()] == ['cpu_high']
+    tick(alerts, 40, 99)
+    assert history(db) == [('firing', 92)]
+
+
+def test_short_breach_never_fires(db):
+    alerts = manager(db)
+    tick(alerts, 0, 90)
+    tick(alerts, 10, 50)
+    tick(alerts, 20, 90)
+    assert alerts.pending_alerts()[0].since_ms == START + 20_000
+    assert history(db) == []
+
+
+def test_firing_alert_holds_until_the_clear_level(db):
+    alerts = manager(db)
+    for seconds in (0, 30):
+        tick(alerts, seconds, 90)
+    tick(alerts, 40, 75)  # Below the threshold but above clear
+    assert [a['id'] for a in alerts.active_alerts()] == ['cpu_high']
+    version = alerts.version
+    tick(alerts, 50, 65)
+    assert alerts.active_alerts() == []
+    assert alerts.version == version + 1
+    assert db.get_active_alerts() == []
+    assert history(db) == [('firing', 90), ('resolved', 65)]
+
+
+def test_alert_resolves_when_its_series_stops_reporting(db):
+    alerts = manager(db)
+    for seconds in (0, 30):
+        tick(alerts, seconds, 90)
+    ts = START + 400_000
+    alerts.check_alerts(am.SystemMetrics(timestamp=am._from_epoch_ms(ts), cpu_percent=0, memory_percent=0,
+                                         disk_usage=0, network_sent=0, network_recv=0, processes_count=0))
+    assert alerts.active_alerts() == []
+    assert [state for state, _ in history(db)] == ['firing', 'resolved']
+
+
+def test_firing_alerts_survive_a_restart(db):
+    alerts = manager(db)
+    for seconds in (0, 30):
+        tick(alerts, seconds, 90)
+
+    restarted = manager(db)
+    assert restarted.states['cpu_high'].state == 'firing'
+    tick(restarted, 40, 85)  # Still breached: no second firing transition
+    tick(restarted, 50, 60)
+    assert history(db) == [('firing', 90), ('resolved', 60)]
+
+
+def test_restored_alerts_wait_one_window_for_their_series(db):
+    alerts = manager(db)
+    for seconds in (0, 30):
+        tick(alerts, seconds, 90)
+
+    restarted = manager(db)
+    for seconds in (40, 300, 340):  # No cpu samples since the restart
+        restarted.check_alerts(am.SystemMetrics(timestamp=am._from_epoch_ms(START + seconds * 1000),
+                                                cpu_percent=0, memory_percent=0, disk_usage=0,
+                                                network_sent=0, network_recv=0, processes_count=0))
+        if seconds == 300:
+            assert [a['id'] for a in restarted.active_alerts()] == ['cpu_high']
+    assert restarted.active_alerts() == []
+    assert [state for state, _ in history(db)] == ['firing', 'resolved']
@@ -0,0 +1,68 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import advanced_monitor as am
+
+STEP = 60_000  # one sample a minute
+WEEK = 7 * 24 * 3_600_000
+
+
+def monday():
+    """Epoch ms of local midnight on a Monday, a few weeks back"""
+    day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(weeks=3)
+    return am._to_epoch_ms(day - timedelta(days=day.weekday()))
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'))
+    yield db
+    db.close()
+
+
+def run(db, values):
+    """Feed (ts, cpu) pairs through an AlertManager; returns the anomaly transitions"""
+    alerts = am.AlertManager(db, rules=am.RuleEngine([]), anomaly=am.AnomalyDetector(metrics=('cpu_percent',)))
+    for ts, cpu in values:
+        alerts.observe([am.Sample('cpu_percent', cpu, {}, ts)])
+        alerts.check_alerts(am.SystemMetrics(timestamp=am._from_epoch_ms(ts), cpu_percent=cpu, memory_percent=0,
+                                             disk_usage=0, network_sent=0, network_recv=0, processes_count=0))
+    return [(row['state'], row['ts']) for row in reversed(db.get_alert_history(10**6))]
+
+
+def test_gradual_drift_fires_against_last_weeks_baseline(db):
+    start, noise = monday(), random.Random(1)
+    steady = [(start + i * STEP, 20 + noise.uniform(-1, 1)) for i in range(WEEK // STEP)]
+    # A leak adding 1% an hour: too slow for the recent baseline alone to flag
+    drift = [(start + WEEK + i * STEP, 20 + i / 60 + noise.uniform(-1, 1)) for i in range(24 * 60)]
+    transitions = run(db, steady + drift)
+    assert [state for state, _ in transitions] == ['firing']
+    assert transitions[0][1] > start + WEEK
+
+
+def test_a_repeating_weekly_pattern_does_not_fire_in_its_second_week(db):
+    start, noise = monday(), random.Random(2)
+    values = []
+    for i in range(2 * WEEK // STEP):
+        ts = start + i * STEP
+        busy = 9 <= datetime.fromtimestamp(ts / 1000).hour < 17
+        values.append((ts, (80 if busy else 20) + noise.uniform(-2, 2)))
+    assert [ts for _, ts in run(db, values) if ts >= start + WEEK] == []
+
+
+@pytest.mark.parametrize('vectorised', [True, False])
+def test_backfill_seeds_the_baseline_from_stored_samples(db, monkeypatch, vectorised):
+    if not vectorised:
+        monkeypatch.setattr(am.np, 'available', lambda: False)
+    now = am._to_epoch_ms(datetime.now())
+    db.write_batch([], [], [am.Sample('cpu_percent', 50.0 + (i % 2), {}, now - i * 60_000) for i in range(120)])
+    detector = am.AnomalyDetector(metrics=('cpu_percent',))
+    detector.backfill(db)
+    detector.observe([am.Sample('cpu_percent', 51.0, {}, now + 60_000)])
+    [(alert, z)] = detector.evaluate(now + 60_000)
+    assert abs(z) < 1  # scored straight away: no warmup left
+    detector.observe([am.Sample('cpu_percent', 90.0, {}, now + 120_000)])
+    [(alert, z)] = detector.evaluate(now + 120_000)
+    assert z > detector.z_threshold and alert.id == 'anomaly:cpu_percent'
@@ -0,0 +1,87 @@
+import gzip
+import http.client
+import zlib
+
+import pytest
+
+import advanced_monitor as am
+
+BODY = b'<html>' + b'metrics ' * 200 + b'</html>'
+
+
+@pytest.mark.parametrize('accept_encoding, encoding', [
+    (None, 'identity'),
+    ('gzip, deflate', 'gzip'),
+    ('deflate', 'deflate'),
+    ('gzip;q=0, deflate;q=0.5', 'deflate'),
+    ('*', 'gzip'),
+    ('br, identity', 'identity'),
+])
+def test_negotiate_picks_the_preferred_accepted_coding(accept_encoding, encoding):
+    assert am.CachedResponse(BODY, 'text/html').negotiate(accept_encoding) == encoding
+
+
+def test_small_bodies_are_not_compressed():
+    assert am.CachedResponse(b'{}', 'application/json').negotiate('gzip') == 'identity'
+
+
+def test_encoded_variants_round_trip_and_have_their_own_etag():
+    response = am.CachedResponse(BODY, 'text/html')
+    assert gzip.decompress(response.encoded('gzip')) == BODY
+    assert zlib.decompress(response.encoded('deflate')) == BODY
+    assert len({response.etag(), response.etag('gzip'), response.etag('deflate')}) == 3
+    assert response.matches(f'"x", W/{response.etag("gzip")}', 'gzip')
+    assert not response.matches(response.etag(), 'gzip')
+    assert response.matches('*')
+
+
+def snapshot(ts, cpu):
+    return am.SystemMetrics(timestamp=am._from_epoch_ms(ts), cpu_percent=cpu, memory_percent=40.0,
+                            disk_usage=63.0, network_sent=0, network_recv=0, processes_count=1)
+
+
+@pytest.fixture
+def page(tmp_path, serve):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'))
+    recent = am.MetricsRingBuffer(10)
+    recent.append(snapshot(1_700_000_000_000, 12.5))
+    dashboard = am.WebDashboard(db, recent=recent, alert_manager=am.AlertManager(db))
+    conn = http.client.HTTPConnection(*serve(dashboard), timeout=5)
+
+    def get(**headers):
+        conn.request('GET', '/', headers=headers)
+        response = conn.getresponse()
+        return response, response.read()
+
+    yield dashboard, get
+    conn.close()
+    db.close()
+
+
+def test_if_none_match_gets_a_bodyless_304(page):
+    dashboard, get = page
+    response, body = get()
+    etag = response.getheader('ETag')
+    assert response.status == 200 and body
+    response, body = get(**{'If-None-Match': etag})
+    assert (response.status, body, response.getheader('ETag')) == (304, b'', etag)
+
+
+def test_etag_changes_with_the_data_version(page):
+    dashboard, get = page
+    etag = get()[0].getheader('ETag')
+    assert get()[0].getheader('ETag') == etag
+    dashboard.recent.append(snapshot(1_700_000_010_000, 99.0))
+    response, body = get(**{'If-None-Match': etag})
+    assert response.status == 200
+    assert response.getheader('ETag') != etag
+
+
+@pytest.mark.parametrize('accept_encoding, decompress', [('gzip', gzip.decompress), ('deflate', zlib.decompress)])
+def test_compressed_responses_vary_on_accept_encoding(page, accept_encoding, decompress):
+    dashboard, get = page
+    plain = get()[1]
+    response, body = get(**{'Accept-Encoding': accept_encoding})
+    assert response.getheader('Content-Encoding') == accept_encoding
+    assert response.getheader('Vary') == 'Accept-Encoding'
+    assert decompress(body) == plain
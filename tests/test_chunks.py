@@ -0,0 +1,194 @@
+import os
+import random
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import advanced_monitor as am
+
+
+CODEC_CASES = {
+    'floats with one decimal': [round(random.Random(1).uniform(0, 100), 1) for _ in range(200)],
+    'noisy floats': [random.Random(2).random() * 1e6 for _ in range(200)],
+    'integers': [10**9 + i * 4096 for i in range(200)],
+    'timestamps with jitter': [1_700_000_000_000 + i * 10_000 + (i * 7) % 5 for i in range(200)],
+    'nulls mixed in': [1.5, None, 2.25, None, None, 3.0],
+    'all null': [None, None, None],
+    'single value': [42.0],
+    'extremes': [-1.5, 0.0, 1e300, 5e-324, -1e-300, float('inf')],
+}
+
+
+@pytest.mark.parametrize('values', CODEC_CASES.values(), ids=CODEC_CASES.keys())
+def test_codec_round_trip(values):
+    encoding, places, flags, payload = am._encode_column(values)
+    decoded = am._decode_column(payload, len(values), encoding, places, flags)
+    assert decoded == values
+    assert [type(v) for v in decoded] == [type(v) for v in values]
+
+
+def test_codec_stores_nan_as_null_like_sqlite():
+    encoding, places, flags, payload = am._encode_column([float('nan'), 1.0])
+    assert am._decode_column(payload, 2, encoding, places, flags) == [None, 1.0]
+
+
+def rows(start, stop, step=1):
+    return [(ts, (float(ts), ts % 7)) for ts in range(start, stop, step)]
+
+
+def open_store(path, **kwargs):
+    return am.ChunkStore(str(path), columns=('value', 'count'), chunk_rows=10, **kwargs)
+
+
+def test_store_seals_full_heads_and_replays_the_head_log(tmp_path):
+    store = open_store(tmp_path)
+    store.append(rows(1000, 1025))
+    assert store.stats()['chunks'] == 1
+    store.append(rows(1025, 1028))
+    store.close()
+
+    store = open_store(tmp_path)
+    assert list(store.scan(0, 2000)) == rows(1000, 1028)
+    assert list(store.scan(0, 2000, ['count'])) == [(ts, (ts % 7,)) for ts in range(1000, 1028)]
+    store.close()
+
+
+def test_store_keeps_late_rows_in_an_overflow_head(tmp_path):
+    store = open_store(tmp_path)
+    store.append(rows(1000, 1010))
+    store.append([(1003, (3.5, 0)), (1020, (20.0, 0))])
+    store.close()
+
+    store = open_store(tmp_path)
+    scanned = list(store.scan(0, 2000))
+    assert (1003, (3.5, 0)) in scanned and (1020, (20.0, 0)) in scanned
+    assert len(scanned) == 12
+    assert [ts for ts, _ in scanned] == sorted(ts for ts, _ in scanned)
+    store.close()
+
+
+def test_late_rows_are_sealed_at_the_normal_chunk_size(tmp_path):
+    store = open_store(tmp_path)
+    store.append(rows(1000, 1010))
+    for ts in range(500, 509):
+        store.append([(ts, (float(ts), 0))])
+    assert (store.stats()['chunks'], store.stats()['overflow_rows']) == (1, 9)
+    store.append([(509, (509.0, 0))])
+    assert (store.stats()['chunks'], store.stats()['overflow_rows']) == (2, 0)
+    assert [ts for ts, _ in store.scan(0, 1003)] == list(range(500, 510)) + [1000, 1001, 1002]
+
+
+def test_an_overflow_chunk_sealed_before_a_crash_is_not_replayed_twice(tmp_path):
+    store = open_store(tmp_path)
+    store.append(rows(1000, 1010))
+    store.append(rows(500, 503))
+    log = (tmp_path / store.OVERFLOW_FILE).read_bytes()
+    store.flush()
+    store.close()
+    (tmp_path / store.OVERFLOW_FILE).write_bytes(log)  # as if the log was never truncated
+
+    store = open_store(tmp_path)
+    assert list(store.scan(0, 2000)) == rows(500, 503) + rows(1000, 1010)
+    store.close()
+
+
+def test_rounding_is_opt_in(tmp_path):
+    store = am.ChunkStore(str(tmp_path / 'exact'), columns=('rate',))
+    store.append([(1, (123.456789,))])
+    assert list(store.scan(0, 10)) == [(1, (123.456789,))]
+    store = am.ChunkStore(str(tmp_path / 'rounded'), columns=('rate',), decimals={'rate': 1})
+    store.append([(1, (123.456789,))])
+    assert list(store.scan(0, 10)) == [(1, (123.5,))]
+
+
+def test_aggregate_buckets(tmp_path):
+    store = open_store(tmp_path)
+    store.append(rows(0, 20))
+    buckets = list(store.aggregate(0, 20, 10, ['value']))
+    assert [(b, n, mins, maxs, avgs) for b, n, mins, maxs, avgs, _ in buckets] == [
+        (0, 10, [0.0], [9.0], [4.5]), (10, 10, [10.0], [19.0], [14.5])]
+
+
+def test_read_only_store_changes_nothing_and_follows_the_writer(tmp_path):
+    writer = open_store(tmp_path)
+    writer.append(rows(1000, 1015))
+    files = {name: (tmp_path / name).read_bytes() for name in os.listdir(tmp_path)}
+
+    reader = open_store(tmp_path, read_only=True)
+    assert {name: (tmp_path / name).read_bytes() for name in os.listdir(tmp_path)} == files
+    assert list(reader.scan(0, 2000)) == rows(1000, 1015)
+    with pytest.raises(OSError):
+        reader.append(rows(2000, 2001))
+
+    writer.append(rows(1015, 1030))
+    assert list(reader.scan(0, 2000)) == rows(1000, 1030)
+    writer.prune(1020)
+    assert next(reader.scan(0, 2000))[0] == 1015
+
+
+def snapshot(ts):
+    return am.SystemMetrics(timestamp=am._from_epoch_ms(ts), cpu_percent=12.5, memory_percent=40.0,
+                            disk_usage=63.0, network_sent=1000, network_recv=2000, processes_count=300)
+
+
+def test_read_only_database_uses_the_recorded_backend(tmp_path):
+    path = str(tmp_path / 'monitor.db')
+    writer = am.DatabaseManager(path, config=am.DatabaseConfig(metrics_backend='chunks'))
+    start = am._to_epoch_ms(datetime.now()) - 60_000
+    writer.write_batch([snapshot(start + i * 10_000) for i in range(5)], [])
+    before = sorted(os.listdir(tmp_path))
+
+    reader = am.DatabaseManager(path, read_only=True)
+    assert reader.config.metrics_backend == 'chunks'
+    rows = list(reader.iter_metrics(start, start + 60_000))[1:]
+    assert [row['cpu_percent'] for row in rows] == [12.5] * 5
+    with pytest.raises(sqlite3.OperationalError):
+        reader.insert_activity('test', 'write')
+    assert sorted(os.listdir(tmp_path)) == before
+    reader.close()
+    writer.close()
+
+
+def test_read_only_database_must_exist(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        am.DatabaseManager(str(tmp_path / 'missing.db'), read_only=True)
+    assert not (tmp_path / 'missing.db').exists()
+
+
+def test_a_failed_chunk_append_retries_only_the_metrics(tmp_path, monkeypatch):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'), config=am.DatabaseConfig(metrics_backend='chunks'))
+    writer = am.BatchWriter(db)
+    start = am._to_epoch_ms(datetime.now()) - 60_000
+    writer.insert_metrics(snapshot(start))
+    alert = am.Alert(id='cpu_high', level='WARNING', message='hot', timestamp=am._from_epoch_ms(start))
+    writer.insert_alert(alert)
+    append = db.chunks.append
+    monkeypatch.setattr(db.chunks, 'append', lambda rows: (_ for _ in ()).throw(OSError('disk full')))
+    assert writer.flush() == 1
+    assert [kind for kind, _ in writer._pending] == ['metrics']
+
+    monkeypatch.setattr(db.chunks, 'append', append)
+    assert writer.flush() == 1
+    db.write_batch([], [alert])  # a whole batch written twice
+    assert len(db.get_alert_history(1)) == 1
+    assert [ts for ts, _ in db.chunks.scan(0, start + 1)] == [start]
+    db.close()
+
+
+def test_moving_to_chunks_skips_rows_a_crash_left_in_both_places(tmp_path):
+    path = str(tmp_path / 'monitor.db')
+    db = am.DatabaseManager(path)
+    start = am._to_epoch_ms(datetime.now()) - 60_000
+    db.write_batch([snapshot(start + i * 10_000) for i in range(5)], [])
+    db.close()
+    with sqlite3.connect(path) as conn:
+        moved = conn.execute(f'SELECT ts, {", ".join(am.METRIC_COLUMNS)} FROM metrics ORDER BY ts LIMIT 3').fetchall()
+    # Appended to the store before a crash, while their DELETE never committed
+    store = am.ChunkStore(str(tmp_path / 'monitor.chunks'))
+    store.append([(row[0], row[1:]) for row in moved])
+    store.close()
+
+    db = am.DatabaseManager(path, config=am.DatabaseConfig(metrics_backend='chunks'))
+    assert [ts for ts, _ in db.chunks.scan(0, start + 60_000)] == [start + i * 10_000 for i in range(5)]
+    db.close()
@@ -0,0 +1,44 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import advanced_monitor as am
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'monitor.db')
+    db = am.DatabaseManager(path)
+    now = am._to_epoch_ms(datetime.now())
+    db.write_batch([am.SystemMetrics(timestamp=am._from_epoch_ms(now - 300_000 + i * 60_000), cpu_percent=float(i),
+                                     memory_percent=50.0, disk_usage=60.0, network_sent=0, network_recv=0,
+                                     processes_count=100)
+                    for i in range(5)], [])
+    db.close()
+    return path
+
+
+def test_query_prints_json_lines(db_path, capsys):
+    assert am.main(['query', '--db', db_path, '--columns', 'cpu_percent,memory_percent', '--json']) == 0
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(row['cpu_percent'], row['memory_percent']) for row in rows] == [(float(i), 50.0) for i in range(5)]
+    assert all(datetime.fromisoformat(row['timestamp']) for row in rows)
+
+
+def test_query_prints_tab_separated_rows(db_path, capsys):
+    assert am.main(['query', '--db', db_path, '--columns', 'cpu_percent']) == 0
+    assert [line.split('\t')[1] for line in capsys.readouterr().out.splitlines()] == [
+        str(float(i)) for i in range(5)]
+
+
+def test_unknown_column_is_a_usage_error(db_path, capsys):
+    assert am.main(['query', '--db', db_path, '--columns', 'cpu_percent,bogus']) == 2
+    assert 'bogus' in capsys.readouterr().err
+
+
+def test_missing_database_fails_without_creating_it(tmp_path, capsys):
+    path = tmp_path / 'missing.db'
+    assert am.main(['query', '--db', str(path)]) == 1
+    assert capsys.readouterr().err.startswith('query: ')
+    assert not path.exists()
@@ -0,0 +1,37 @@
+import pytest
+
+import advanced_monitor as am
+
+
+class CountingCollector(am.Collector):
+    name = "counting"
+    interval = 1.0
+
+    def __init__(self, interval=None):
+        super().__init__(interval)
+        self.runs = 0
+
+    def collect(self):
+        self.runs += 1
+        return [am.Sample("runs", self.runs)]
+
+
+@pytest.mark.parametrize('now, next_run', [(0.0, 1.0), (0.5, 1.0), (1.0, 2.0), (2.0, 3.0), (2.5, 3.0)])
+def test_due_collector_runs_once_and_is_rescheduled_after_now(now, next_run):
+    registry = am.CollectorRegistry()
+    collector = CountingCollector()
+    registry.register(collector, start=0)
+    registry.run_pending(now=now)
+    assert collector.runs == 1
+    registry.run_pending(now=now)
+    assert collector.runs == 1
+    registry.run_pending(now=next_run)
+    assert collector.runs == 2
+
+
+def test_collector_without_collect_cannot_be_created():
+    class Incomplete(am.Collector):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
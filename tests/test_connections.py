@@ -0,0 +1,82 @@
+import sqlite3
+import threading
+
+import pytest
+
+import advanced_monitor as am
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'), config=am.DatabaseConfig(read_pool_size=2))
+    with db._writer() as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+    yield db
+    db.close()
+
+
+def test_writer_is_long_lived_and_uses_wal(db):
+    with db._writer() as first:
+        pass
+    with db._writer() as second:
+        assert second is first
+        assert second.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+
+def test_readers_are_pooled_up_to_the_configured_size(db):
+    with db._reader() as a, db._reader() as b:
+        assert a is not b
+    with db._reader() as again:
+        assert again in (a, b)
+    assert db._readers_created == 2
+
+
+def test_readers_cannot_write(db):
+    with db._reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute('INSERT INTO t VALUES (1)')
+
+
+def test_a_failed_write_is_rolled_back(db):
+    with pytest.raises(RuntimeError):
+        with db._writer() as conn:
+            conn.execute('INSERT INTO t VALUES (1)')
+            raise RuntimeError
+    with db._reader() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+
+
+def test_concurrent_writes_are_serialized(db):
+    def write(i):
+        for j in range(50):
+            with db._writer() as conn:
+                conn.execute('INSERT INTO t VALUES (?)', (i * 50 + j,))
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with db._reader() as conn:
+        assert conn.execute('SELECT COUNT(DISTINCT x) FROM t').fetchone()[0] == 200
+
+
+def test_in_memory_databases_read_through_the_writer():
+    db = am.DatabaseManager(':memory:')
+    with db._writer() as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.execute('INSERT INTO t VALUES (1)')
+    with db._reader() as conn:
+        assert conn.execute('SELECT x FROM t').fetchall() == [(1,)]
+    db.close()
+
+
+def test_close_releases_every_connection(db):
+    with db._reader() as reader:
+        pass
+    with db._writer() as writer:
+        pass
+    db.close()
+    assert db._readers_created == 0
+    for conn in (reader, writer):
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
@@ -0,0 +1,45 @@
+import time
+from collections import namedtuple
+
+import advanced_monitor as am
+
+CpuTimes = namedtuple('scputimes', 'user system idle iowait guest')
+
+
+def test_busy_percent_is_the_busy_share_of_elapsed_time():
+    prev = CpuTimes(user=100, system=50, idle=800, iowait=50, guest=0)
+    cur = CpuTimes(user=130, system=60, idle=850, iowait=60, guest=0)
+    assert am.CpuSampler._busy_percent(prev, cur) == 40.0
+
+
+def test_busy_percent_ignores_guest_time_already_counted_in_user():
+    prev = CpuTimes(user=100, system=0, idle=100, iowait=0, guest=50)
+    cur = CpuTimes(user=150, system=0, idle=150, iowait=0, guest=100)
+    assert am.CpuSampler._busy_percent(prev, cur) == 50.0
+
+
+def test_busy_percent_is_zero_when_no_time_elapsed():
+    times = CpuTimes(user=1, system=1, idle=1, iowait=0, guest=0)
+    assert am.CpuSampler._busy_percent(times, times) == 0.0
+
+
+def test_sample_does_not_block():
+    sampler = am.CpuSampler()
+    started = time.monotonic()
+    total, per_core = sampler.sample()
+    assert time.monotonic() - started < 0.1
+    assert 0.0 <= total <= 100.0
+    assert all(0.0 <= core <= 100.0 for core in per_core)
+
+
+def test_sample_skips_per_core_values_when_the_cpu_count_changes(monkeypatch):
+    first = [CpuTimes(10, 0, 10, 0, 0)] * 2
+    second = [CpuTimes(20, 0, 20, 0, 0)] * 3
+    readings = iter([first, second])
+
+    def cpu_times(percpu=False):
+        return next(readings) if percpu else CpuTimes(10, 0, 10, 0, 0)
+
+    monkeypatch.setattr(am.psutil, 'cpu_times', cpu_times)
+    sampler = am.CpuSampler()
+    assert sampler.sample() == (0.0, [])
@@ -0,0 +1,42 @@
+from collections import namedtuple
+
+import pytest
+
+import advanced_monitor as am
+
+Partition = namedtuple('sdiskpart', 'device mountpoint fstype opts')
+DiskIO = namedtuple('sdiskio', 'read_count write_count read_bytes write_bytes busy_time')
+
+
+def test_partitions_are_filtered_by_fstype_and_mountpoint(monkeypatch):
+    parts = [
+        Partition('/dev/sda1', '/', 'ext4', 'rw'),
+        Partition('/dev/sda1', '/', 'ext4', 'rw'),  # bind mount listed twice
+        Partition('/dev/sdb1', '/data', 'xfs', 'rw'),
+        Partition('tmpfs', '/run', 'tmpfs', 'rw'),
+        Partition('/dev/loop0', '/snap/core/1', 'squashfs', 'ro'),
+        Partition('/dev/sdc1', '/var/lib/docker/volumes', 'ext4', 'rw'),
+    ]
+    monkeypatch.setattr(am.psutil, 'disk_partitions', lambda all=False: parts)
+    assert [p.mountpoint for p in am.DiskCollector().partitions()] == ['/', '/data']
+    assert [p.mountpoint for p in am.DiskCollector(fstypes=['xfs']).partitions()] == ['/data']
+    everything = am.DiskCollector(exclude_fstypes=[], exclude_mountpoints=())
+    assert len(everything.partitions()) == 5
+
+
+def test_disk_io_rates_are_per_device(monkeypatch):
+    readings = iter([
+        {'sda': DiskIO(10, 20, 1_000, 2_000, 100), 'loop0': DiskIO(0, 0, 0, 0, 0)},
+        {'sda': DiskIO(30, 60, 5_000, 10_000, 1_100), 'loop0': DiskIO(9, 9, 9, 9, 9),
+         'sdb': DiskIO(1, 1, 1, 1, 1)},
+    ])
+    monkeypatch.setattr(am.psutil, 'disk_io_counters', lambda perdisk=False: next(readings))
+    collector = am.DiskIOCollector()
+    collector._last_time -= 2.0
+    samples = {(s.metric, s.labels['device']): s.value for s in collector.collect()}
+    assert {device for _, device in samples} == {'sda'}  # loop devices excluded, sdb new
+    assert samples['disk_read_rate', 'sda'] == pytest.approx(2_000, rel=0.01)
+    assert samples['disk_write_rate', 'sda'] == pytest.approx(4_000, rel=0.01)
+    assert samples['disk_read_iops', 'sda'] == pytest.approx(10, rel=0.01)
+    assert samples['disk_write_iops', 'sda'] == pytest.approx(20, rel=0.01)
+    assert samples['disk_busy_percent', 'sda'] == pytest.approx(50, rel=0.01)
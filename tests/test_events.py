@@ -0,0 +1,67 @@
+import socket
+
+import pytest
+
+import advanced_monitor as am
+
+
+def test_every_subscriber_gets_each_event_until_it_unsubscribes():
+    bus = am.EventBus()
+    first, second = bus.subscribe(), bus.subscribe()
+    bus.publish('metrics', {'cpu_percent': 1.0})
+    bus.unsubscribe(second)
+    bus.publish('alerts', {'alerts': []})
+    assert [first.get_nowait() for _ in range(2)] == [('metrics', {'cpu_percent': 1.0}), ('alerts', {'alerts': []})]
+    assert second.get_nowait() == ('metrics', {'cpu_percent': 1.0})
+    assert second.empty()
+    assert bus.subscriber_count == 1
+
+
+def test_a_slow_subscriber_loses_its_oldest_events_without_blocking():
+    bus = am.EventBus(max_queue=3)
+    slow = bus.subscribe()
+    for i in range(5):
+        bus.publish('metrics', i)
+    assert [slow.get_nowait()[1] for _ in range(3)] == [2, 3, 4]
+
+
+def read_until(sock, marker, limit=1 << 16):
+    data = b''
+    while marker not in data and len(data) < limit:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+@pytest.fixture
+def stream(tmp_path, serve, monkeypatch):
+    monkeypatch.setattr(am.DashboardHandler._stream_events, '__defaults__', (0.2,))  # keepalive
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'))
+    recent = am.MetricsRingBuffer(10)
+    recent.append(am.SystemMetrics(timestamp=am._from_epoch_ms(1_700_000_000_000), cpu_percent=12.5,
+                                   memory_percent=40.0, disk_usage=63.0, network_sent=0, network_recv=0,
+                                   processes_count=1))
+    dashboard = am.WebDashboard(db, recent=recent, events=am.EventBus())
+    sock = socket.create_connection(serve(dashboard), timeout=5)
+    sock.sendall(b'GET /events HTTP/1.1\r\nHost: test\r\n\r\n')
+    yield dashboard, sock
+    sock.close()
+    db.close()
+
+
+def test_events_stream_sends_the_latest_sample_then_published_events(stream):
+    dashboard, sock = stream
+    head = read_until(sock, b'}\n\n')
+    assert head.startswith(b'HTTP/1.1 200')
+    assert b'Content-type: text/event-stream' in head
+    assert b'\r\n\r\nretry: 5000\n\nevent: metrics\ndata: {' in head
+    dashboard.events.publish('alerts', {'alerts': []})
+    assert b'event: alerts\ndata: {"alerts":[]}\n\n' in read_until(sock, b'event: alerts\ndata: {"alerts":[]}\n\n')
+
+
+def test_idle_events_stream_sends_heartbeats(stream):
+    dashboard, sock = stream
+    read_until(sock, b'event: metrics')
+    assert b': keepalive\n\n' in read_until(sock, b': keepalive\n\n')
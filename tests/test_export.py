@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import advanced_monitor as am
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'),
+                            config=am.DatabaseConfig(read_pool_size=1, busy_timeout_ms=200))
+    now = am._to_epoch_ms(datetime.now())
+    db.write_batch([am.SystemMetrics(timestamp=am._from_epoch_ms(now - 600_000 + i * 10_000), cpu_percent=float(i),
+                                     memory_percent=50.0, disk_usage=60.0, network_sent=0, network_recv=0,
+                                     processes_count=100)
+                    for i in range(60)], [])
+    db.now = now
+    yield db
+    db.close()
+
+
+def test_csv_and_jsonl_exports_carry_every_row(db):
+    _, chunks = am.export_metrics(db, 'csv', db.now - 600_000, db.now, columns=['cpu_percent'])
+    table = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+    assert table[0] == ['ts', 'timestamp', 'cpu_percent']
+    assert [float(row[2]) for row in table[1:]] == [float(i) for i in range(60)]
+
+    info, chunks = am.export_metrics(db, 'jsonl', db.now - 600_000, db.now, 60_000, ['cpu_percent'])
+    rows = [json.loads(line) for line in b''.join(chunks).decode('utf-8').splitlines()]
+    assert info['columns'] == ['cpu_percent', 'cpu_percent_min', 'cpu_percent_max']
+    assert sum(row['cpu_percent'] * 6 for row in rows) == pytest.approx(sum(range(60)), rel=0.2)
+
+
+def test_bad_export_arguments_raise_before_reading(db):
+    for fmt, columns, start in (('xml', None, 0), ('csv', ['nope'], 0), ('csv', None, db.now)):
+        with pytest.raises(ValueError):
+            am.export_metrics(db, fmt, start, db.now, columns=columns)
+
+
+def test_open_export_does_not_hold_a_pooled_reader(db):
+    rows = db.iter_metrics(db.now - 600_000, db.now, chunk_size=1, dedicated=True)
+    next(rows)
+    assert next(rows)['cpu_percent'] == 0.0
+    # The export's cursor is open, and the only pooled reader is still free for the dashboard
+    assert db.get_active_alerts() == []
+    rows.close()
+
+
+def test_waiting_for_a_pooled_reader_times_out(db):
+    rows = db.iter_metrics(db.now - 600_000, db.now, chunk_size=1)
+    next(rows)
+    next(rows)
+    with pytest.raises(sqlite3.OperationalError):
+        db.get_active_alerts()
+    rows.close()
+    assert db.get_active_alerts() == []
+
+
+def test_export_to_a_missing_directory_reports_the_real_error(db, tmp_path):
+    db.close()
+    with pytest.raises(FileNotFoundError, match='missing'):
+        am.main(['export', '--db', str(tmp_path / 'monitor.db'), '-o', str(tmp_path / 'missing' / 'out.csv')])
+
+
+def test_export_writes_the_file_through_an_atomic_rename(db, tmp_path, monkeypatch):
+    db.close()
+    out = tmp_path / 'out.jsonl'
+    assert am.main(['export', '--db', str(tmp_path / 'monitor.db'), '-o', str(out), '--from=-1h',
+                    '--columns', 'cpu_percent']) == 0
+    assert len(out.read_text().splitlines()) == 60
+    assert not (tmp_path / 'out.jsonl.tmp').exists()
+
+    export_metrics = am.export_metrics
+
+    def failing(*args, **kwargs):
+        info, chunks = export_metrics(*args, **kwargs)
+
+        def broken():
+            yield next(chunks)
+            raise OSError('disk full')
+        return info, broken()
+
+    monkeypatch.setattr(am, 'export_metrics', failing)
+    with pytest.raises(OSError, match='disk full'):
+        am.main(['export', '--db', str(tmp_path / 'monitor.db'), '-o', str(out), '--from=-1h'])
+    assert len(out.read_text().splitlines()) == 60  # the earlier export is untouched
+    assert not (tmp_path / 'out.jsonl.tmp').exists()
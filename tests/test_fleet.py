@@ -0,0 +1,163 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import advanced_monitor as am
+
+TS = 1_700_000_000_000
+
+
+@pytest.fixture
+def fleet(tmp_path):
+    db = am.DatabaseManager(str(tmp_path / 'collector.db'))
+    yield am.FleetCollector(db, token='secret', max_body=4096, max_payload=64 << 10)
+    db.close()
+
+
+def payload(**overrides):
+    data = {'host': 'web-1', 'interval': 10, 'columns': ['cpu_percent', 'memory_percent', 'bogus'],
+            'metrics': [[TS, 12.5, 40.0, 1], [TS + 10_000, 13.5, None, 2]],
+            'alerts': [{'id': 'cpu_high', 'level': 'WARNING', 'message': 'hot', 'ts': TS, 'value': 95.0}],
+            'samples': [['disk_mount_usage_percent', {'mountpoint': '/'}, TS, 63.0]]}
+    data.update(overrides)
+    return json.dumps(data).encode('utf-8')
+
+
+def ingest(fleet, body, encoding=None, token='secret'):
+    return fleet.ingest(body, encoding, f'Bearer {token}', '10.0.0.5')
+
+
+def test_valid_push_is_stored(fleet):
+    assert ingest(fleet, gzip.compress(payload()), 'gzip') == 4
+    assert (fleet.received, fleet.rejected, fleet.rows) == (1, 0, 4)
+    rows = list(fleet.db.iter_fleet_metrics('web-1', TS, TS + 60_000, columns=['cpu_percent', 'memory_percent']))
+    assert rows == [{'ts': TS, 'cpu_percent': 12.5, 'memory_percent': 40.0},
+                    {'ts': TS + 10_000, 'cpu_percent': 13.5, 'memory_percent': None}]
+    assert [a['id'] for a in fleet.db.get_fleet_alerts('web-1')] == ['cpu_high']
+
+
+def test_resent_push_leaves_no_duplicates(fleet):
+    ingest(fleet, payload())
+    ingest(fleet, payload())
+    assert len(list(fleet.db.iter_fleet_metrics('web-1', TS, TS + 60_000))) == 2
+    assert len(fleet.db.get_alert_history(10**6)) == 1
+
+
+@pytest.mark.parametrize('authorization', [None, 'Bearer wrong', 'Basic secret', 'secret'])
+def test_push_without_the_token_is_unauthorized(fleet, authorization):
+    with pytest.raises(am.ApiError) as e:
+        fleet.ingest(payload(), None, authorization)
+    assert e.value.status == 401
+    assert fleet.rejected == 1
+
+
+@pytest.mark.parametrize('authorization, length, status', [
+    ('Bearer wrong', 10, 401),
+    ('Bearer secret', -1, 400),
+    ('Bearer secret', 4097, 413),
+])
+def test_admit_checks_headers_before_the_body_is_read(fleet, authorization, length, status):
+    with pytest.raises(am.ApiError) as e:
+        fleet.admit(authorization, length)
+    assert e.value.status == status
+    assert fleet.rejected == 1
+    fleet.admit('Bearer secret', 4096)
+
+
+def test_decompressed_size_is_capped(fleet):
+    bomb = gzip.compress(b' ' * (1 << 20))
+    assert len(bomb) <= fleet.max_body
+    with pytest.raises(am.ApiError) as e:
+        ingest(fleet, bomb, 'gzip')
+    assert e.value.status == 413
+
+
+@pytest.mark.parametrize('body, encoding, status', [
+    (b'not json', None, 400),
+    (b'\x1f\x8bnot gzip', 'gzip', 400),
+    (b'{}', 'br', 415),
+    (payload(host='../etc'), None, 400),
+    (payload(host=''), None, 400),
+    (payload(metrics=[[TS, 1.0]]), None, 400),
+    (payload(metrics=[[-5, 1.0, 2.0, 3]]), None, 400),
+    (payload(metrics=[[TS, 'high', 2.0, 3]]), None, 400),
+    (payload(metrics=[[TS, True, 2.0, 3]]), None, 400),
+    (payload(alerts=[{'id': 'x', 'level': 'WARNING', 'ts': TS}]), None, 400),
+    (payload(samples=[['m', {}, 'yesterday', 1.0]]), None, 400),
+    (b'[1, 2]', None, 400),
+])
+def test_invalid_pushes_are_rejected_and_nothing_is_stored(fleet, body, encoding, status):
+    with pytest.raises(am.ApiError) as e:
+        ingest(fleet, body, encoding)
+    assert e.value.status == status
+    assert fleet.db.get_fleet_hosts() == []
+
+
+def test_an_older_push_replayed_later_does_not_revive_a_resolved_alert(fleet):
+    resolved = {'id': 'cpu_high', 'level': 'WARNING', 'message': 'ok', 'ts': TS + 20_000, 'value': 50.0,
+                'resolved': True}
+    ingest(fleet, payload(alerts=[resolved]))
+    ingest(fleet, payload())  # the firing batch, resent from a spool
+    assert fleet.db.get_fleet_alerts('web-1') == []
+    assert [a['state'] for a in fleet.db.get_alert_history(10**6)] == ['resolved', 'firing']
+
+
+@pytest.fixture
+def collector():
+    """A stand-in collector answering each POST with the next queued status"""
+    received, statuses = [], []
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            received.append(json.loads(gzip.decompress(body))['metrics'][0][0])
+            self.send_response(statuses.pop(0) if statuses else 200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/api/push', received, statuses
+    server.shutdown()
+    server.server_close()
+
+
+def push_client(tmp_path, url, ts):
+    client = am.PushClient(url, str(tmp_path / 'spool'), host='web-1', timeout=2)
+    client.submit([am.SystemMetrics(timestamp=am._from_epoch_ms(ts), cpu_percent=1.0, memory_percent=2.0,
+                                    disk_usage=3.0, network_sent=0, network_recv=0, processes_count=1)], [], [])
+    return client
+
+
+def test_the_spool_is_drained_before_a_fresh_payload(tmp_path, collector):
+    url, received, statuses = collector
+    push_client(tmp_path, url, TS).stop()  # spooled by an earlier run
+    client = push_client(tmp_path, url, TS + 10_000)
+    assert client.deliver() == 2
+    assert received == [TS, TS + 10_000]
+    assert (client.sent, client.spooled) == (2, 0)
+
+
+def test_a_rejected_payload_is_dropped_and_not_counted_as_sent(tmp_path, collector):
+    url, received, statuses = collector
+    statuses.append(413)
+    client = push_client(tmp_path, url, TS)
+    assert client.deliver() == 0
+    assert (client.sent, client.rejected, client.failures, client.spooled) == (0, 1, 0, 0)
+
+
+def test_a_failed_push_is_spooled_for_the_next_pass(tmp_path, collector):
+    url, received, statuses = collector
+    statuses.append(503)
+    client = push_client(tmp_path, url, TS)
+    assert client.deliver() == 0
+    assert (client.failures, client.spooled) == (1, 1)
+    client._retry_at = 0.0
+    assert client.deliver() == 1
+    assert received == [TS, TS]
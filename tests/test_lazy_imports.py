@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import advanced_monitor as am
+
+
+def test_importing_the_module_loads_no_optional_packages():
+    code = ("import sys, advanced_monitor; "
+            "print(sorted(m for m in ('pyautogui', 'pynput', 'numpy', 'pyarrow', 'psutil') if m in sys.modules))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == '[]'
+
+
+def test_lazy_module_imports_on_first_use():
+    json = am.LazyModule('json')
+    assert json._module is None
+    assert json.dumps([1]) == '[1]'
+    assert json.available() and json.reason is None
+
+
+def test_missing_module_reports_why_and_stays_missing():
+    missing = am.LazyModule('no_such_module_for_tests')
+    assert not missing.available()
+    assert 'no_such_module_for_tests unavailable (ModuleNotFoundError' in missing.reason
+    with pytest.raises(ImportError):
+        missing.anything
+    assert am.missing_dependency(am.LazyModule('json'), missing) == missing.reason
+    assert am.missing_dependency(am.LazyModule('json')) is None
+
+
+class NeedsMissing(am.Collector):
+    name = "needs_missing"
+    requires = (am.LazyModule('no_such_module_for_tests'),)
+
+    def collect(self):
+        return []
+
+
+def test_collectors_with_missing_dependencies_are_disabled():
+    registry = am.CollectorRegistry()
+    assert not registry.register_if_available(NeedsMissing)
+    assert 'no_such_module_for_tests' in registry.disabled['needs_missing']
@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+import advanced_monitor as am
+
+
+# Layout written by the original monitor, before schema_version existed
+V1_SCHEMA = '''
+CREATE TABLE metrics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    cpu_percent REAL,
+    memory_percent REAL,
+    disk_usage REAL,
+    network_sent INTEGER,
+    network_recv INTEGER,
+    processes_count INTEGER,
+    temperature REAL
+);
+CREATE TABLE activity_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    type TEXT NOT NULL,
+    description TEXT NOT NULL
+);
+CREATE TABLE alerts (
+    id TEXT PRIMARY KEY,
+    level TEXT NOT NULL,
+    message TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    resolved INTEGER DEFAULT 0
+);
+'''
+
+V1_METRICS = [(f'2024-03-01T12:00:{i:02d}', 10.0 + i, 50.0, 70.5, 1000 * i, 2000 * i, 250 + i, None)
+              for i in range(0, 60, 10)]
+
+
+@pytest.fixture
+def v1_db(tmp_path):
+    path = str(tmp_path / 'monitor.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(V1_SCHEMA)
+    conn.executemany('''
+        INSERT INTO metrics (timestamp, cpu_percent, memory_percent, disk_usage,
+                             network_sent, network_recv, processes_count, temperature)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', V1_METRICS)
+    conn.execute("INSERT INTO alerts VALUES ('cpu_high', 'WARNING', 'High CPU', '2024-03-01T12:00:30', 0)")
+    conn.execute("INSERT INTO activity_logs (timestamp, type, description) "
+                 "VALUES ('2024-03-01T12:00:00', 'start', 'monitor started')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_v1_database_is_migrated_and_backfilled(v1_db):
+    db = am.DatabaseManager(v1_db)
+    db._migration_thread.join(10)
+    db.close()
+
+    conn = sqlite3.connect(v1_db)
+    assert conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] == am.SCHEMA_VERSION
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert not tables & {'metrics_v1', 'alerts_v1'}
+    assert {table for _, table, _ in am.ROLLUP_TIERS} <= tables
+
+    rows = conn.execute('''
+        SELECT ts, cpu_percent, memory_percent, disk_usage, network_sent, network_recv,
+               processes_count, temperature, network_sent_rate
+        FROM metrics ORDER BY ts
+    ''').fetchall()
+    assert rows == [(am._to_epoch_ms(ts),) + tuple(values) + (None,) for ts, *values in V1_METRICS]
+    assert conn.execute('SELECT id, level, message, ts, resolved FROM alerts').fetchall() == [
+        ('cpu_high', 'WARNING', 'High CPU', am._to_epoch_ms('2024-03-01T12:00:30'), 0)]
+    assert conn.execute('SELECT COUNT(*) FROM activity_logs').fetchone()[0] == 1
+    assert dict(conn.execute('SELECT key, value FROM meta'))['metrics_backend'] == 'sqlite'
+    conn.close()
+
+
+def test_migrated_database_reopens_unchanged(v1_db):
+    db = am.DatabaseManager(v1_db)
+    db._migration_thread.join(10)
+    db.close()
+    db = am.DatabaseManager(v1_db)
+    assert db._migration_thread is None
+    assert [a['id'] for a in db.get_active_alerts()] == ['cpu_high']
+    db.close()
+
+
+def test_read_only_open_refuses_an_unmigrated_database(v1_db):
+    with pytest.raises(sqlite3.DatabaseError, match='schema v1'):
+        am.DatabaseManager(v1_db, read_only=True)
+    conn = sqlite3.connect(v1_db)
+    assert conn.execute('SELECT COUNT(*) FROM metrics').fetchone()[0] == len(V1_METRICS)
+    conn.close()
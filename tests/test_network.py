@@ -0,0 +1,34 @@
+from collections import namedtuple
+
+import pytest
+
+import advanced_monitor as am
+
+NetIO = namedtuple('snetio', 'bytes_sent bytes_recv packets_sent packets_recv')
+
+
+@pytest.mark.parametrize('prev, cur, expected', [
+    (100, 250, 150),
+    (2 ** 32 - 10, 5, 15),  # 32-bit wrap
+    (2 ** 64 - 10, 5, 15),  # 64-bit wrap
+    (5_000, 40, 40),  # interface reset
+    (2 ** 33, 40, 40),  # far from a limit, so a reset
+])
+def test_counter_delta(prev, cur, expected):
+    assert am._counter_delta(prev, cur) == expected
+
+
+def test_tracker_reports_per_interface_rates(monkeypatch):
+    readings = iter([
+        {'eth0': NetIO(2 ** 32 - 100, 1_000, 10, 10), 'lo': NetIO(0, 0, 0, 0)},
+        {'eth0': NetIO(100, 3_000, 14, 30), 'lo': NetIO(500, 500, 5, 5), 'wlan0': NetIO(1, 1, 1, 1)},
+    ])
+    monkeypatch.setattr(am.psutil, 'net_io_counters', lambda pernic=False: next(readings))
+    tracker = am.NetworkRateTracker()
+    tracker._last_time -= 2.0
+    rates = tracker.sample()
+    assert set(rates) == {'eth0', 'lo'}  # wlan0 has no baseline yet
+    assert rates['eth0']['bytes_sent'] == pytest.approx(100, rel=0.01)
+    assert rates['eth0']['bytes_recv'] == pytest.approx(1_000, rel=0.01)
+    assert rates['eth0']['packets_recv'] == pytest.approx(10, rel=0.01)
+    assert am.NetworkRateTracker.is_loopback('lo') and not am.NetworkRateTracker.is_loopback('eth0')
@@ -0,0 +1,69 @@
+import pytest
+
+import advanced_monitor as am
+
+
+class RecordingSink(am.NotificationSink):
+    type = "recording"
+
+    def __init__(self, name=None, fail=0):
+        super().__init__(name)
+        self.batches = []
+        self.fail = fail
+
+    def send(self, batch):
+        if self.fail:
+            self.fail -= 1
+            raise OSError("unreachable")
+        self.batches.append(batch)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'))
+    yield db
+    db.close()
+
+
+def alert(alert_id, timestamp, resolved=False, value=None):
+    return am.Alert(alert_id, 'WARNING', f'{alert_id} changed', timestamp, resolved=resolved, value=value)
+
+
+def test_fired_and_resolved_within_one_window_reports_both(db):
+    sink = RecordingSink()
+    dispatcher = am.NotificationDispatcher(db, [sink])
+    dispatcher.process([alert('cpu', 't1', value=95), alert('cpu', 't2', resolved=True, value=60),
+                        alert('disk', 't3', value=91)])
+    [batch] = sink.batches
+    cpu, disk = batch['alerts']
+    assert (cpu['state'], cpu['timestamp'], cpu['fired_at'], cpu['transitions']) == ('resolved', 't2', 't1', 2)
+    assert (disk['state'], disk['transitions']) == ('firing', 1) and 'fired_at' not in disk
+    assert am.NotificationSink.summary(batch).endswith("1 firing, 1 resolved (1 fired and resolved)")
+    assert am.NotificationSink.text(batch).splitlines()[0] == "t2 RESOLVED WARNING cpu: cpu changed (fired t1)"
+
+
+def test_refiring_alert_reports_its_latest_state(db):
+    sink = RecordingSink()
+    dispatcher = am.NotificationDispatcher(db, [sink])
+    dispatcher.process([alert('cpu', 't1'), alert('cpu', 't2', resolved=True), alert('cpu', 't3')])
+    [entry] = sink.batches[0]['alerts']
+    assert (entry['state'], entry['timestamp'], entry['transitions']) == ('firing', 't3', 3)
+    assert 'fired_at' not in entry
+
+
+def test_failed_delivery_is_retried_from_the_outbox(db):
+    sink = RecordingSink(fail=1)
+    dispatcher = am.NotificationDispatcher(db, [sink], base_delay=0.001)
+    dispatcher.process([alert('cpu', 't1')])
+    assert sink.batches == [] and dispatcher.failures == 1
+    assert dispatcher.deliver_due(am._to_epoch_ms('2999-01-01T00:00:00')) == 1
+    assert [a['id'] for a in sink.batches[0]['alerts']] == ['cpu']
+    assert db.outbox_due(am._to_epoch_ms('2999-01-01T00:00:00')) == []
+
+
+def test_sink_without_send_cannot_be_created():
+    class Incomplete(am.NotificationSink):
+        type = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,72 @@
+import http.client
+
+import pytest
+
+import advanced_monitor as am
+
+
+class NetworkCollector(am.Collector):
+    name = "fake_network"
+    interval = 10.0
+    requires = ()
+
+    def collect(self):
+        return [am.Sample('network_sent', 1234), am.Sample('cpu_core_percent', 12.5, {'core': '0'})]
+
+
+def test_render_openmetrics_names_counters_and_ends_with_eof():
+    text = am.render_openmetrics([
+        ('network_sent', 'counter', 'Bytes sent', [({}, 1234)]),
+        ('cpu_core_percent', 'gauge', '', [({'core': '0'}, 12.5), ({'core': '1'}, None)]),
+        ('weird-name', 'gauge', '', [({'path': 'C:\\ "x"'}, float('nan'))]),
+    ])
+    assert text.splitlines() == [
+        '# TYPE monitor_network_sent counter',
+        '# HELP monitor_network_sent Bytes sent',
+        'monitor_network_sent_total 1234',
+        '# TYPE monitor_cpu_core_percent gauge',
+        'monitor_cpu_core_percent{core="0"} 12.5',
+        '# TYPE monitor_weird_name gauge',
+        'monitor_weird_name{path="C:\\\\ \\"x\\""} NaN',
+        '# EOF',
+    ]
+    assert text.endswith('# EOF\n')
+
+
+@pytest.fixture
+def dashboard(tmp_path):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'))
+    registry = am.CollectorRegistry()
+    registry.register(NetworkCollector())
+    registry.run_all()
+    recent = am.MetricsRingBuffer(10)
+    recent.append(am.SystemMetrics(timestamp=am._from_epoch_ms(1_700_000_000_000), cpu_percent=12.5,
+                                   memory_percent=40.0, disk_usage=63.0, network_sent=1234, network_recv=0,
+                                   processes_count=1))
+    yield am.WebDashboard(db, recent=recent, alert_manager=am.AlertManager(db), registry=registry)
+    db.close()
+
+
+def test_metrics_endpoint_serves_the_exposition(dashboard, serve):
+    conn = http.client.HTTPConnection(*serve(dashboard), timeout=5)
+    conn.request('GET', '/metrics')
+    response = conn.getresponse()
+    text = response.read().decode('utf-8')
+    assert response.getheader('Content-Type') == am.OPENMETRICS_CONTENT_TYPE
+    assert '# TYPE monitor_network_sent counter\nmonitor_network_sent_total 1234\n' in text
+    assert 'monitor_cpu_core_percent{core="0"} 12.5\n' in text
+    assert 'monitor_collector_runs_total{collector="fake_network"} 1\n' in text
+    assert text.endswith('# EOF\n')
+    conn.close()
+
+
+def test_metrics_response_is_rebuilt_only_when_the_data_changes(dashboard):
+    first = dashboard.metrics_response()
+    assert dashboard.metrics_response() is first
+    dashboard.registry.run_all()
+    second = dashboard.metrics_response()
+    assert second is not first and 'collector="fake_network"} 2\n' in second.body.decode('utf-8')
+    dashboard.recent.append(am.SystemMetrics(timestamp=am._from_epoch_ms(1_700_000_010_000), cpu_percent=1.0,
+                                             memory_percent=40.0, disk_usage=63.0, network_sent=2000,
+                                             network_recv=0, processes_count=1))
+    assert dashboard.metrics_response() is not second
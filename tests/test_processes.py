@@ -0,0 +1,22 @@
+import subprocess
+import sys
+
+import advanced_monitor as am
+
+
+def test_processes_are_summed_by_name():
+    children = [subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']) for _ in range(3)]
+    try:
+        name = am.psutil.Process(children[0].pid).name()
+        collector = am.ProcessCollector(top_n=10_000)
+        collector.collect()
+        samples = collector.collect()
+    finally:
+        for child in children:
+            child.kill()
+            child.wait()
+    assert all(set(s.labels) == {'name'} for s in samples)
+    assert len({(s.metric, s.labels['name']) for s in samples}) == len(samples)
+    instances = {s.labels['name']: s.value for s in samples if s.metric == 'process_instances'}
+    assert instances[name] >= 3
+    assert any(s.metric == 'process_cpu_percent' and s.labels['name'] == name for s in samples)
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+import advanced_monitor as am
+
+
+@pytest.fixture(params=['sqlite', 'chunks'])
+def db(tmp_path, request):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'), config=am.DatabaseConfig(metrics_backend=request.param))
+    yield db
+    db.close()
+
+
+def fill(db, start, end, step=10_000):
+    db.write_batch([am.SystemMetrics(timestamp=am._from_epoch_ms(ts), cpu_percent=9.0 * (ts // step % 2),
+                                     memory_percent=50.0, disk_usage=60.0, network_sent=0, network_recv=0,
+                                     processes_count=100)
+                    for ts in range(start, end, step)], [])
+
+
+def test_fresh_database_answers_rollup_sized_queries_from_raw(db):
+    now = am._to_epoch_ms(datetime.now())
+    fill(db, now - 300_000, now)
+    rows = db.iter_metrics(now - 300_000, now, 60_000, ['cpu_percent'])
+    assert next(rows) == ('1m', 60_000)
+    rows = list(rows)
+    assert len(rows) >= 5
+    assert now - rows[-1]['ts'] < 60_000 + 10_000
+
+
+@pytest.mark.parametrize('step', [120_000, None])
+def test_rollup_queries_include_the_unsettled_tail(db, step):
+    now = am._to_epoch_ms(datetime.now())
+    fill(db, now - 3 * 3_600_000, now)
+    while db.rollup_step('1m', now - 90_000, 1000):
+        pass
+    db.retention.raw_hours = 0.5  # Force the 1m tier for an unstepped hour
+    tier, step_ms = next(db.iter_metrics(now - 3_600_000, now, step))
+    rows = list(db.iter_metrics(now - 3_600_000, now, step, ['cpu_percent']))[1:]
+    assert tier == '1m'
+    assert now - rows[-1]['ts'] < (step_ms or 60_000) + 10_000
+    assert [row['ts'] for row in rows] == sorted({row['ts'] for row in rows})
+    assert all(set(row) == ({'ts', 'cpu_percent'} if step is None else
+                            {'ts', 'cpu_percent', 'cpu_percent_min', 'cpu_percent_max'}) for row in rows)
+    assert all(row['cpu_percent'] == pytest.approx(4.5) for row in rows[1:-1])
+
+
+def test_recent_metrics_include_buckets_past_the_watermark(db):
+    now = am._to_epoch_ms(datetime.now())
+    fill(db, now - 24 * 3_600_000, now, 30_000)
+    while db.rollup_step('1m', now - 90_000, 5000):
+        pass
+    rows = db.get_recent_metrics(24)
+    assert {row['resolution'] for row in rows} == {'1m'}
+    assert now - rows[0]['ts'] < 60_000 + 30_000  # Current bucket, however the samples fall
+    assert [row['ts'] for row in rows] == sorted({row['ts'] for row in rows}, reverse=True)
+    assert rows[0]['cpu_percent_avg'] == rows[0]['cpu_percent']
+
+
+def test_coarse_tiers_aggregate_their_tail_from_finer_tiers(db):
+    now = am._to_epoch_ms(datetime.now())
+    fill(db, now - 6 * 3_600_000, now)
+    while db.rollup_step('1m', now - 90_000, 5000):
+        pass
+    rows = db.get_recent_metrics(6, resolution='1h')
+    assert {row['resolution'] for row in rows} == {'1h'}
+    assert now - rows[0]['ts'] < 3_600_000
+    assert all(row['cpu_percent'] == pytest.approx(4.5) for row in rows[1:-1])
+    assert all(row['cpu_percent_min'] == 0.0 and row['cpu_percent_max'] == 9.0 for row in rows)
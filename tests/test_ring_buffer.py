@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import advanced_monitor as am
+
+
+def snapshot(ts, cpu):
+    return am.SystemMetrics(timestamp=am._from_epoch_ms(ts), cpu_percent=cpu, memory_percent=40.0,
+                            disk_usage=63.0, network_sent=1000, network_recv=2000, processes_count=300)
+
+
+def test_buffer_keeps_only_the_newest_samples():
+    buffer = am.MetricsRingBuffer(capacity=3)
+    now = am._to_epoch_ms(datetime.now())
+    assert buffer.latest() is None and buffer.since() == []
+    for i in range(5):
+        buffer.append(snapshot(now - (4 - i) * 1000, float(i)))
+    assert len(buffer) == 3 and buffer.version == 5
+    assert [row['cpu_percent'] for row in buffer.since()] == [4.0, 3.0, 2.0]
+    assert buffer.latest()['cpu_percent'] == 4.0
+    assert buffer.latest_metrics().cpu_percent == 4.0
+    assert isinstance(buffer.latest()['processes_count'], int)
+
+
+def test_recent_queries_stop_at_the_cutoff():
+    buffer = am.MetricsRingBuffer(capacity=100)
+    now = am._to_epoch_ms(datetime.now())
+    for i in range(10):
+        buffer.append(snapshot(now - (9 - i) * 60_000, float(i)))
+    assert buffer.count_since(150) == 3
+    assert [row['cpu_percent'] for row in buffer.since(150)] == [9.0, 8.0, 7.0]
+    columns = buffer.columns(150)
+    assert columns['cpu_percent'] == [7.0, 8.0, 9.0]  # oldest first
+    assert columns['ts'] == sorted(columns['ts'])
+    assert buffer.count_since() == 10
+
+
+def test_missing_values_read_back_as_none():
+    buffer = am.MetricsRingBuffer(capacity=2)
+    metrics = snapshot(am._to_epoch_ms(datetime.now()), 1.0)
+    metrics.disk_usage = None
+    buffer.append(metrics)
+    assert buffer.latest()['disk_usage'] is None
+    assert buffer.columns()['disk_usage'] == [None]
@@ -0,0 +1,88 @@
+import pytest
+
+import advanced_monitor as am
+
+
+def engine(**rule):
+    rule.setdefault('name', 'test')
+    rule.setdefault('metric', 'cpu_percent')
+    rule.setdefault('threshold', 80)
+    return am.RuleEngine([am.AlertRule.from_dict(rule)])
+
+
+def feed(rules, values, start=0, step=10_000, metric='cpu_percent', labels=None):
+    rules.observe([am.Sample(metric, value, labels or {}, start + i * step) for i, value in enumerate(values)])
+    return start + (len(values) - 1) * step
+
+
+def values(rules, now_ms):
+    return {alert_id: value for alert_id, _, _, value in rules.evaluate(now_ms)}
+
+
+def test_avg_over_window_drops_expired_samples():
+    rules = engine(function='avg', window='30s')
+    now = feed(rules, [100, 100, 100, 10, 20, 30])
+    assert values(rules, now) == {'test': pytest.approx(20.0)}
+    # Only the newest sample is left inside the window 25s later
+    assert values(rules, now + 25_000) == {'test': pytest.approx(30.0)}
+
+
+def test_min_and_max_windows():
+    samples = [5, 9, 1, 7, 3]
+    high = engine(function='max', window='1m')
+    low = engine(function='min', window='1m')
+    feed(high, samples)
+    now = feed(low, samples)
+    assert values(high, now) == {'test': 9}
+    assert values(low, now) == {'test': 1}
+    # Only the last two samples are left
+    assert values(high, now + 45_000) == {'test': 7}
+    assert values(low, now + 45_000) == {'test': 3}
+
+
+def test_quantile_window_is_within_its_accuracy():
+    rules = engine(function='p90', window='10m')
+    now = feed(rules, list(range(1, 101)), step=1000)
+    assert values(rules, now)['test'] == pytest.approx(90, rel=0.02)
+
+
+def test_rate_window_is_change_per_second():
+    rules = engine(metric='network_sent', function='rate', window='1m')
+    now = feed(rules, [1000, 3000, 5000], metric='network_sent')
+    assert values(rules, now) == {'test': pytest.approx(200.0)}
+
+
+def test_series_that_go_quiet_stop_reporting():
+    rules = engine(function='last', window='30s')
+    now = feed(rules, [50])
+    assert 'test' in values(rules, now)
+    assert values(rules, now + 31_000) == {}
+
+
+def test_absent_counts_seconds_since_the_last_sample():
+    rules = engine(function='absent', window='2m', threshold=120)
+    now = feed(rules, [1, 2])
+    assert values(rules, now + 90_000) == {'test': pytest.approx(90.0)}
+
+
+def test_one_alert_per_matching_series():
+    rules = engine(metric='disk_mount_usage_percent', id='disk:{mountpoint}',
+                   exclude={'mountpoint': ['/']})
+    for mount, value in (('/', 95), ('/data', 91), ('/home', 40)):
+        feed(rules, [value], metric='disk_mount_usage_percent', labels={'mountpoint': mount})
+    assert values(rules, 0) == {'disk:/data': 91, 'disk:/home': 40}
+
+
+def test_breach_uses_the_clear_level_while_firing():
+    rule = am.AlertRule.from_dict({'name': 'cpu', 'metric': 'cpu_percent', 'threshold': 80, 'clear': 70})
+    assert not rule.breached(75, firing=False)
+    assert rule.breached(75, firing=True)
+    assert not rule.breached(65, firing=True)
+    assert not rule.breached(None, firing=True)
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        am.AlertRule.from_dict({'name': 'x', 'metric': 'cpu_percent', 'threshold': 1, 'function': 'median'})
+    with pytest.raises(ValueError):
+        am.AlertRule.from_dict({'name': 'x', 'metric': 'cpu_percent', 'threshold': 1, 'op': '>='})
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import advanced_monitor as am
+
+
+def test_periodic_skips_missed_runs_instead_of_bursting():
+    runtime = am.AsyncRuntime(None, jitter=0)
+    starts = []
+
+    async def job():
+        starts.append(runtime.loop.time())
+        if len(starts) == 1:
+            await asyncio.sleep(0.35)  # Stalls past three runs
+
+    async def main():
+        runtime.loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(runtime._periodic(0.1, job, 0.0))
+        await asyncio.sleep(0.65)
+        task.cancel()
+
+    asyncio.run(main())
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert 4 <= len(starts) <= 5
+    assert gaps[0] >= 0.35 and all(gap >= 0.08 for gap in gaps)
+
+
+def test_flush_loop_flushes_early_once_a_batch_is_full(tmp_path):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'))
+    writer = am.BatchWriter(db, batch_size=2, flush_interval=60)
+    runtime = am.AsyncRuntime(None, writer)
+
+    async def main():
+        runtime.loop = asyncio.get_running_loop()
+        runtime.executor = ThreadPoolExecutor(max_workers=1)
+        runtime._flush_now = asyncio.Event()
+        task = asyncio.ensure_future(runtime._flush_loop())
+        for _ in range(2):
+            writer.insert_alert(am.Alert(id='cpu_high', level='WARNING', message='hot',
+                                         timestamp=am._from_epoch_ms(1_700_000_000_000)))
+        runtime._check_flush()
+        deadline = time.monotonic() + 2
+        while writer.written < 2 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        runtime.executor.shutdown()
+
+    asyncio.run(main())
+    assert writer.written == 2
+    db.close()
+
+
+class BlockingCollector(am.Collector):
+    name = "blocking"
+    interval = 3600.0
+    requires = ()
+
+    def __init__(self, release):
+        super().__init__()
+        self.release = release
+
+    def collect(self):
+        self.release.wait(5)
+        return []
+
+
+@pytest.fixture
+def runtime(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the dashboard writes .monitor_port
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'))
+    monitor = am.SystemMonitor(db)
+    release = threading.Event()
+    monitor.registry.register(BlockingCollector(release))
+    dashboard = am.WebDashboard(db, port=0, recent=monitor.recent, registry=monitor.registry)
+    runtime = am.AsyncRuntime(monitor, dashboard=dashboard)
+    thread = threading.Thread(target=runtime.run_forever, daemon=True)
+    thread.start()
+    yield runtime, release, thread
+    release.set()
+    runtime.stop()
+    thread.join(10)
+    db.close()
+
+
+def test_dashboard_is_ready_before_the_first_collector_pass(runtime):
+    runtime, release, thread = runtime
+    assert runtime.ready.wait(2)
+    assert not release.is_set()
+    assert runtime.dashboard.server is not None
+
+
+def test_stop_from_another_thread_cancels_tasks_and_shuts_the_executor_down(runtime):
+    runtime, release, thread = runtime
+    assert runtime.ready.wait(2)
+    release.set()
+    runtime.stop()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert not runtime.system_monitor.running
+    assert runtime.executor._shutdown
+    assert runtime.dashboard.server is None
@@ -0,0 +1,57 @@
+import http.client
+import socket
+import time
+
+import pytest
+
+import advanced_monitor as am
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'))
+    yield db
+    db.close()
+
+
+def test_keep_alive_connections_are_reused(db, serve):
+    conn = http.client.HTTPConnection(*serve(am.WebDashboard(db)), timeout=5)
+    conn.request('GET', '/api/alerts')
+    first = conn.getresponse()
+    first.read()
+    sock = conn.sock
+    conn.request('GET', '/api/alerts')
+    second = conn.getresponse()
+    assert (first.status, second.status) == (200, 200)
+    assert second.read() == b'{"alerts":[]}'
+    assert conn.sock is sock
+    conn.close()
+
+
+def test_a_slow_client_does_not_block_other_requests(db, serve):
+    address = serve(am.WebDashboard(db, max_workers=2))
+    slow = socket.create_connection(address, timeout=5)
+    slow.sendall(b'GET /api/alerts HTTP/1.1\r\nHost: te')  # and nothing more
+    started = time.monotonic()
+    conn = http.client.HTTPConnection(*address, timeout=5)
+    conn.request('GET', '/api/alerts')
+    assert conn.getresponse().status == 200
+    assert time.monotonic() - started < 1
+    conn.close()
+    slow.close()
+
+
+def test_connections_beyond_the_pool_and_queue_get_503(db, serve):
+    address = serve(am.WebDashboard(db, max_workers=1, max_pending=1))
+    held = [socket.create_connection(address, timeout=5) for _ in range(2)]
+    for sock in held:
+        sock.sendall(b'GET /api/alerts HTTP/1.1\r\n')  # holds the worker, then the queue slot
+    time.sleep(0.2)
+    conn = http.client.HTTPConnection(*address, timeout=5)
+    conn.request('GET', '/api/alerts')
+    response = conn.getresponse()
+    assert response.status == 503
+    assert response.getheader('Retry-After') == '1'
+    conn.close()
+    for sock in held:
+        sock.close()
@@ -0,0 +1,61 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import advanced_monitor as am
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = am.DatabaseManager(str(tmp_path / 'monitor.db'))
+    yield db
+    db.close()
+
+
+def alert(i):
+    return am.Alert(id=f'alert_{i}', level='WARNING', message=str(i),
+                    timestamp=datetime(2023, 11, 14, 22, 13, i).isoformat())
+
+
+@pytest.mark.parametrize('policy, kept', [('drop_oldest', [2, 3, 4]), ('drop_newest', [0, 1, 2])])
+def test_a_full_queue_drops_by_policy(db, policy, kept):
+    writer = am.BatchWriter(db, max_queue=3, drop_policy=policy)
+    for i in range(5):
+        writer.insert_alert(alert(i))
+    assert writer.dropped == 2
+    assert [int(obj.message) for _, obj in writer._drain(10)] == kept
+
+
+def test_unknown_drop_policy_is_rejected(db):
+    with pytest.raises(ValueError):
+        am.BatchWriter(db, drop_policy='ignore')
+
+
+def test_a_failed_flush_keeps_at_most_a_queue_of_pending_rows(db, monkeypatch):
+    writer = am.BatchWriter(db, max_queue=3)
+    write_batch = db.write_batch
+    monkeypatch.setattr(db, 'write_batch', lambda *args: (_ for _ in ()).throw(sqlite3.OperationalError('locked')))
+    for i in range(3):
+        writer.insert_alert(alert(i))
+    assert writer.flush() == 0
+    for i in range(3, 5):
+        writer.insert_alert(alert(i))
+    assert writer.flush() == 0
+    assert [int(obj.message) for _, obj in writer._pending] == [2, 3, 4]
+    assert (writer.failed_flushes, writer.dropped) == (2, 2)
+
+    monkeypatch.setattr(db, 'write_batch', write_batch)
+    assert writer.flush() == 3
+    assert writer._pending == []
+    assert sorted(row['id'] for row in db.get_active_alerts()) == ['alert_2', 'alert_3', 'alert_4']
+
+
+def test_stop_flushes_what_is_still_queued(db):
+    writer = am.BatchWriter(db, flush_interval=60)
+    writer.start()
+    for i in range(3):
+        writer.insert_alert(alert(i))
+    writer.stop()
+    assert writer.written == 3
+    assert len(db.get_active_alerts()) == 3